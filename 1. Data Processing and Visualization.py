@@ -1,102 +1,802 @@
 import requests
-import json
+from requests.adapters import HTTPAdapter
+import matplotlib
+matplotlib.use("Agg")  # Headless backend: charts are only written to files
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 import numpy as np
+from scipy import sparse
+from scipy.optimize import least_squares
+import asyncio
+import collections
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+import sys
+import websockets
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        # Tokens are refilled continuously at `rate` per second up to `capacity`
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        # Block until enough tokens are available, then consume them
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
 
 class DeribitAPI:
-    def __init__(self):
-        # Base URL for Deribit's public API
-        self.base_url = "https://deribit.com/api/v2/public"
+    def __init__(self, base_url="https://deribit.com/api/v2/public", max_workers=16,
+                 requests_per_second=20, burst=100, retries=3, timeout=10):
+        # Base URL for Deribit's public API (can point to a local stub server for testing)
+        self.base_url = base_url
+
+        # Keep-alive session shared by all worker threads, with one pooled connection per worker
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Deribit refills 10,000 credits/s and charges 500 credits per public request with a
+        # 50,000 credit pool, i.e. 20 requests/s sustained with bursts of up to 100 requests
+        self.rate_limiter = TokenBucket(requests_per_second, burst)
+        self.max_workers = max_workers
+        self.retries = retries
+        self.timeout = timeout
+
+    def _get(self, method, params):
+        # Rate-limited GET on the shared session, returning the JSON-RPC "result" field
+        self.rate_limiter.acquire()
+        response = self.session.get(f"{self.base_url}/{method}", params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["result"]
 
     def get_instruments(self, currency="BTC", kind="option"):
         # Endpoint to retrieve all BTC options
-        endpoint = f"{self.base_url}/get_instruments"
         params = {
             "currency": currency,
             "kind": kind
         }
-        response = requests.get(endpoint, params=params)
-        return response.json()["result"]
+        return self._get("get_instruments", params)
 
     def get_order_book(self, instrument_name):
         # Endpoint to retrieve the order book for instrument
-        endpoint = f"{self.base_url}/get_order_book"
         params = {
             "instrument_name": instrument_name
         }
-        response = requests.get(endpoint, params=params)
-        return response.json()["result"]
+        return self._get("get_order_book", params)
 
-def get_implied_volatilities(instruments):
+    def get_book_summary_by_currency(self, currency="BTC", kind="option"):
+        # Endpoint to retrieve the book summary (including mark IV) of every instrument of a currency
+        params = {
+            "currency": currency,
+            "kind": kind
+        }
+        return self._get("get_book_summary_by_currency", params)
+
+    def _get_order_book_with_retry(self, instrument_name):
+        # Retry a single instrument with exponential backoff so one failure does not abort the run
+        for attempt in range(self.retries):
+            try:
+                return self.get_order_book(instrument_name)
+            except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                if attempt == self.retries - 1:
+                    print(f"Failed to fetch order book for {instrument_name} after {self.retries} attempts: {e}")
+                    return None
+                time.sleep(0.5 * 2 ** attempt)
+
+    def get_order_books(self, instrument_names):
+        # Fetch order books concurrently with at most `max_workers` requests in flight
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            order_books = executor.map(self._get_order_book_with_retry, instrument_names)
+            return dict(zip(instrument_names, order_books))
+
+def get_implied_volatilities(instruments, api=None):
     # Function to get implied volatilities for each instrument
-    api = DeribitAPI()
+    api = api or DeribitAPI()
     iv_data = []
     time_now=int(time.time())*1000  # Get current time in milliseconds
 
-    # Loop through each instrument to get its implied volatility
+    # Fetch all order books concurrently, then collect the implied volatility of each instrument
+    order_books = api.get_order_books([instrument["instrument_name"] for instrument in instruments])
     for instrument in instruments:
-        order_book = api.get_order_book(instrument["instrument_name"])
+        order_book = order_books[instrument["instrument_name"]]
+        if order_book is None:
+            # Instruments that failed all retries are left out of the surface
+            continue
         iv_data.append({
             "instrument_name": instrument["instrument_name"],
             "time_to_expiration": instrument["expiration_timestamp"]-time_now,
             "strike": instrument["strike"],
-            "implied_volatility": order_book["mark_iv"]
+            "implied_volatility": order_book["mark_iv"],
+            "underlying_price": order_book["underlying_price"]
         })
     return iv_data
 
-def visualize_iv_surface(iv_data):
-    # Function to visualize the implied volatility surface
-    expirations = sorted(list(set(data["time_to_expiration"] for data in iv_data)))
-    strikes = sorted(list(set(data["strike"] for data in iv_data)))
+def get_implied_volatilities_bulk(instruments, currency="BTC", api=None):
+    # Function to get implied volatilities for all instruments of a currency with a single summary request
+    api = api or DeribitAPI()
+    time_now=int(time.time())*1000  # Get current time in milliseconds
 
-    # Create meshgrid of expirations and strikes
-    X, Y = np.meshgrid(expirations, strikes)
-    Z = np.zeros_like(X, dtype=float)
+    summaries = api.get_book_summary_by_currency(currency)
+    summary_names = np.array([summary["instrument_name"] for summary in summaries], dtype=str)
+    summary_ivs = np.array([summary.get("mark_iv") for summary in summaries], dtype=float)
+    summary_underlyings = np.array([summary.get("underlying_price") for summary in summaries], dtype=float)
+    instrument_names = np.array([instrument["instrument_name"] for instrument in instruments], dtype=str)
 
-    # Populate Z values with implied volatilities
-    for data in iv_data:
-        i = expirations.index(data["time_to_expiration"])
-        j = strikes.index(data["strike"])
-        Z[j, i] = data["implied_volatility"]
+    # Join summaries to instrument metadata: sort the summary names once and binary-search every instrument name
+    implied_volatilities = np.full(len(instruments), np.nan)
+    underlying_prices = np.full(len(instruments), np.nan)
+    if len(summary_names) > 0:
+        order = np.argsort(summary_names)
+        positions = order[np.minimum(np.searchsorted(summary_names, instrument_names, sorter=order), len(order) - 1)]
+        found = summary_names[positions] == instrument_names
+        implied_volatilities[found] = summary_ivs[positions[found]]
+        underlying_prices[found] = summary_underlyings[positions[found]]
 
-    # Plot the original implied vol surface
+    # Fall back to per-instrument order books for anything missing from the bulk result
+    missing = np.flatnonzero(np.isnan(implied_volatilities))
+    if len(missing) > 0:
+        order_books = api.get_order_books([instruments[i]["instrument_name"] for i in missing])
+        for i in missing:
+            order_book = order_books[instruments[i]["instrument_name"]]
+            if order_book is not None:
+                implied_volatilities[i] = order_book["mark_iv"]
+                underlying_prices[i] = order_book["underlying_price"]
+
+    iv_data = []
+    for instrument, implied_volatility, underlying_price in zip(instruments, implied_volatilities.tolist(), underlying_prices.tolist()):
+        if np.isnan(implied_volatility):
+            # Instruments missing from both paths are left out of the surface
+            continue
+        iv_data.append({
+            "instrument_name": instrument["instrument_name"],
+            "time_to_expiration": instrument["expiration_timestamp"]-time_now,
+            "strike": instrument["strike"],
+            "implied_volatility": implied_volatility,
+            "underlying_price": underlying_price
+        })
+    return iv_data
+
+def iv_data_to_columns(iv_data):
+    # Function to convert the list of iv_data records into columnar NumPy arrays
+    columns = {
+        "instrument_name": np.array([data["instrument_name"] for data in iv_data], dtype=str),
+        "time_to_expiration": np.array([data["time_to_expiration"] for data in iv_data], dtype=np.int64),
+        "strike": np.array([data["strike"] for data in iv_data], dtype=float),
+        "implied_volatility": np.array([data["implied_volatility"] for data in iv_data], dtype=float)
+    }
+    # Snapshots saved before the underlying price was recorded do not carry it
+    if iv_data and all("underlying_price" in data for data in iv_data):
+        columns["underlying_price"] = np.array([data["underlying_price"] for data in iv_data], dtype=float)
+    return columns
+
+class IVSurfaceGrid:
+    def __init__(self, expirations, strikes, expiry_index, strike_index, implied_volatility):
+        # Sorted grid axes
+        self.expirations = expirations
+        self.strikes = strikes
+
+        # Observed cells only: (strike, expiry) grid coordinates and their implied volatility
+        self.expiry_index = expiry_index
+        self.strike_index = strike_index
+        self.implied_volatility = implied_volatility
+
+    @property
+    def shape(self):
+        return len(self.strikes), len(self.expirations)
+
+    @property
+    def values(self):
+        # Dense (strike x expiry) grid where cells without a quote are NaN rather than 0
+        values = np.full(self.shape, np.nan)
+        values[self.strike_index, self.expiry_index] = self.implied_volatility
+        return values
+
+    @property
+    def mask(self):
+        # True where the grid cell holds an observed quote
+        mask = np.zeros(self.shape, dtype=bool)
+        mask[self.strike_index, self.expiry_index] = True
+        return mask
+
+    def meshgrid(self):
+        return np.meshgrid(self.expirations, self.strikes)
+
+    def to_sparse(self):
+        # Compressed (strike x expiry) matrix holding only observed cells, for wide strike ladders
+        return sparse.csr_matrix((self.implied_volatility, (self.strike_index, self.expiry_index)), shape=self.shape)
+
+def build_iv_surface(columns):
+    # Function to index columnar iv_data onto a (strike x expiry) grid without Python-level lookups
+    expirations, expiry_index = np.unique(columns["time_to_expiration"], return_inverse=True)
+    strikes, strike_index = np.unique(columns["strike"], return_inverse=True)
+
+    # Calls and puts share a cell; keep the last quote per cell, as the original grid fill did
+    cell = strike_index * len(expirations) + expiry_index
+    _, last_in_reversed = np.unique(cell[::-1], return_index=True)
+    keep = len(cell) - 1 - last_in_reversed
+    return IVSurfaceGrid(expirations, strikes, expiry_index[keep], strike_index[keep],
+                         columns["implied_volatility"][keep])
+
+MILLISECONDS_PER_YEAR = 365 * 24 * 60 * 60 * 1000
+
+def svi_total_variance(params, log_moneyness):
+    # Raw SVI total implied variance w(k) = a + b * (rho * (k - m) + sqrt((k - m)^2 + sigma^2))
+    a, b, rho, m, sigma = np.moveaxis(np.asarray(params), -1, 0)
+    return a + b * (rho * (log_moneyness - m) + np.sqrt((log_moneyness - m) ** 2 + sigma ** 2))
+
+def _calendar_grid(log_moneyness, previous_range):
+    # Log-moneyness points where a slice is checked against the previous expiry: the overlap of both quoted ranges,
+    # since extrapolated wings of the previous fit say nothing about the market and would distort this slice
+    if previous_range is None:
+        return None
+    low, high = max(log_moneyness.min(), previous_range[0]), min(log_moneyness.max(), previous_range[1])
+    return np.linspace(low, high, 101) if low < high else None
+
+def fit_svi_slice(log_moneyness, total_variance, previous_params=None, initial_params=None, previous_range=None,
+                  penalty=1e3, tolerance=1e-8):
+    # Fit raw SVI to one expiry, penalising negative variance, Roger Lee's wing bound b * (1 + |rho|) <= 2
+    # and calendar arbitrage against the previous (shorter) expiry where both slices were quoted (`previous_range`)
+    k_grid = None if previous_params is None else _calendar_grid(log_moneyness, previous_range)
+    previous_variance = None if k_grid is None else svi_total_variance(previous_params, k_grid)
+
+    def calendar_violation(params):
+        return np.maximum(0.0, previous_variance - svi_total_variance(params, k_grid))
+
+    def residuals(params, weight):
+        a, b, rho, m, sigma = params
+        fit_error = svi_total_variance(params, log_moneyness) - total_variance
+        constraints = [min(0.0, a + b * sigma * np.sqrt(1 - rho ** 2)), max(0.0, b * (1 + abs(rho)) - 2)]
+        calendar = [] if k_grid is None else calendar_violation(params)
+        return np.concatenate([fit_error, weight * np.array(constraints), weight * np.asarray(calendar)])
+
+    # Warm-start from the slice's last fit when refitting, otherwise try both a neutral start and the previous expiry
+    lower = [-total_variance.max(), 0.0, -0.999, -1.0, 1e-4]
+    upper = [total_variance.max(), 2.0, 0.999, 1.0, 2.0]
+    starts = [initial_params] if initial_params is not None else [
+        p for p in ([0.5 * total_variance.min(), 0.1, -0.3, 0.0, 0.1], previous_params) if p is not None]
+    fits = [least_squares(residuals, np.clip(x0, lower, upper), bounds=(lower, upper), args=(penalty,)) for x0 in starts]
+    fit = min(fits, key=lambda f: f.cost)
+
+    # The penalty is soft, so tighten it until the slice no longer crosses the previous one on the overlap
+    weight = penalty
+    while k_grid is not None and calendar_violation(fit.x).max() > tolerance and weight < penalty * 1e6:
+        weight *= 100
+        fit = least_squares(residuals, fit.x, bounds=(lower, upper), args=(weight,))
+    return fit.x
+
+class SVISurface:
+    def __init__(self, times, forwards, params):
+        # Fitted slices sorted by year fraction, each with its forward and raw SVI parameters (a, b, rho, m, sigma)
+        self.times = np.asarray(times, dtype=float)
+        self.forwards = np.asarray(forwards, dtype=float)
+        self.params = np.asarray(params, dtype=float)
+
+    def to_dict(self):
+        return {"times": self.times.tolist(), "forwards": self.forwards.tolist(), "params": self.params.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["times"], data["forwards"], data["params"])
+
+    def evaluate(self, strikes, time_to_expiration):
+        # Batched implied volatility (in %) at arbitrary strikes and times to expiration (in milliseconds)
+        strikes, time_to_expiration = np.broadcast_arrays(np.asarray(strikes, dtype=float), np.asarray(time_to_expiration, dtype=float))
+        t = np.maximum(time_to_expiration / MILLISECONDS_PER_YEAR, 1e-8)
+        log_moneyness = np.log(strikes / np.interp(t, self.times, self.forwards))
+
+        # Interpolate total variance linearly in time between the bracketing slices, which keeps the surface free of
+        # calendar arbitrage wherever the slices are ordered (fit_svi_slice enforces it over their common quoted
+        # range), and extrapolate with flat volatility outside the fitted expiries
+        upper = np.minimum(np.searchsorted(self.times, t), len(self.times) - 1)
+        lower = np.maximum(upper - 1, 0)
+        span = self.times[upper] - self.times[lower]
+        weight = np.clip((t - self.times[lower]) / np.where(span > 0, span, 1.0), 0.0, 1.0)
+        weight = np.where(span > 0, weight, 1.0)
+        variance_lower = svi_total_variance(self.params[lower], log_moneyness)
+        variance_upper = svi_total_variance(self.params[upper], log_moneyness)
+        total_variance = variance_lower + weight * (variance_upper - variance_lower)
+        total_variance *= t / np.clip(t, self.times[0], self.times[-1])
+        return 100 * np.sqrt(np.maximum(total_variance, 0.0) / t)
+
+# Fitted surfaces keyed by (snapshot digest, min_quotes), keeping only the most recently used ones
+SVI_SURFACE_CACHE_SIZE = 32
+_svi_surface_cache = collections.OrderedDict()
+_svi_surface_cache_lock = threading.Lock()
+
+def _snapshot_digest(columns):
+    digest = hashlib.sha1()
+    for name in ("time_to_expiration", "strike", "implied_volatility", "underlying_price"):
+        digest.update(np.ascontiguousarray(columns[name]).tobytes())
+    return digest.hexdigest()
+
+def _svi_slice_inputs(strikes, implied_volatility, underlying_price, t):
+    # Log-moneyness against the slice forward and total implied variance of one expiry
+    forward = np.median(underlying_price)
+    return np.log(strikes / forward), (implied_volatility / 100) ** 2 * t, forward
+
+def fit_iv_surface(columns, min_quotes=3, use_cache=True):
+    # Function to fit an arbitrage-aware SVI slice per expiry to columnar iv_data
+    if "underlying_price" not in columns:
+        raise ValueError("iv_data has no underlying_price; log-moneyness cannot be computed.")
+    key = (_snapshot_digest(columns), min_quotes)
+    if use_cache:
+        with _svi_surface_cache_lock:
+            if key in _svi_surface_cache:
+                _svi_surface_cache.move_to_end(key)
+                return _svi_surface_cache[key]
+
+    valid = (columns["time_to_expiration"] > 0) & (columns["implied_volatility"] > 0)
+    expirations, expiry_index = np.unique(columns["time_to_expiration"][valid], return_inverse=True)
+    strikes = columns["strike"][valid]
+    implied_volatility = columns["implied_volatility"][valid]
+    underlying_price = columns["underlying_price"][valid]
+
+    # Fit slices from the shortest expiry up so each one can be checked against the previous one
+    times, forwards, params, quoted_range = [], [], [], None
+    for i, expiration in enumerate(expirations):
+        in_slice = expiry_index == i
+        if in_slice.sum() < min_quotes:
+            continue
+        t = expiration / MILLISECONDS_PER_YEAR
+        log_moneyness, total_variance, forward = _svi_slice_inputs(
+            strikes[in_slice], implied_volatility[in_slice], underlying_price[in_slice], t)
+        params.append(fit_svi_slice(log_moneyness, total_variance, params[-1] if params else None, previous_range=quoted_range))
+        quoted_range = (log_moneyness.min(), log_moneyness.max())
+        times.append(t)
+        forwards.append(forward)
+    if not params:
+        raise ValueError("Not enough quotes to fit any expiry.")
+
+    surface = SVISurface(times, forwards, params)
+    if use_cache:
+        with _svi_surface_cache_lock:
+            _svi_surface_cache[key] = surface
+            while len(_svi_surface_cache) > SVI_SURFACE_CACHE_SIZE:
+                _svi_surface_cache.popitem(last=False)
+    return surface
+
+class IVSnapshotStore:
+    def __init__(self, root="iv_store"):
+        # Each snapshot is an immutable partition <root>/<currency>/<capture time in ms>/ holding one .npy file per column
+        self.root = root
+
+    def append(self, currency, iv_data, capture_time=None):
+        # Write a new partition; existing partitions are never overwritten
+        capture_time = int(time.time() * 1000) if capture_time is None else int(capture_time)
+        partition = os.path.join(self.root, currency, str(capture_time))
+        if os.path.exists(partition):
+            raise FileExistsError(f"Snapshot {partition} already exists.")
+
+        # Write into a temporary directory and rename it so readers never see a half-written partition
+        staging = partition + ".tmp"
+        os.makedirs(staging, exist_ok=True)
+        for name, values in iv_data_to_columns(iv_data).items():
+            np.save(os.path.join(staging, f"{name}.npy"), values)
+        os.rename(staging, partition)
+        return capture_time
+
+    def capture_times(self, currency, start=None, end=None):
+        # Sorted capture times (in ms) of the snapshots stored for a currency, optionally within [start, end]
+        directory = os.path.join(self.root, currency)
+        if not os.path.isdir(directory):
+            return []
+        capture_times = sorted(int(name) for name in os.listdir(directory) if name.isdigit())
+        return [t for t in capture_times if (start is None or t >= start) and (end is None or t <= end)]
+
+    def read(self, currency, start=None, end=None, mmap_mode="r"):
+        # Yield (capture time, columns) for every snapshot in [start, end], memory-mapping the columns by default
+        for capture_time in self.capture_times(currency, start, end):
+            partition = os.path.join(self.root, currency, str(capture_time))
+            yield capture_time, {
+                name[:-len(".npy")]: np.load(os.path.join(partition, name), mmap_mode=mmap_mode)
+                for name in os.listdir(partition) if name.endswith(".npy")
+            }
+
+    def read_range(self, currency, start=None, end=None):
+        # Concatenate every snapshot in [start, end] into one set of columns with a capture_time column; the columns
+        # are copied into the result anyway, so they are read directly rather than memory-mapped
+        snapshots = list(self.read(currency, start, end, mmap_mode=None))
+        if not snapshots:
+            return {}
+        dtypes = {}
+        for _, snapshot in snapshots:
+            for name, values in snapshot.items():
+                dtypes.setdefault(name, values.dtype)
+
+        # Columns missing from older snapshots (e.g. underlying_price) are NaN-filled so every column stays row-aligned
+        columns = {"capture_time": []}
+        for capture_time, snapshot in snapshots:
+            rows = len(snapshot["strike"])
+            columns["capture_time"].append(np.full(rows, capture_time, dtype=np.int64))
+            for name, dtype in dtypes.items():
+                if name in snapshot:
+                    values = snapshot[name]
+                elif dtype.kind == "f":
+                    values = np.full(rows, np.nan, dtype=dtype)
+                else:
+                    raise ValueError(f"Snapshot {capture_time} has no {name} column and it cannot be NaN-filled.")
+                columns.setdefault(name, []).append(values)
+        return {name: np.concatenate(values) for name, values in columns.items()}
+
+class IVSurfaceStream:
+    def __init__(self, iv_data, currency="BTC", ws_url="wss://www.deribit.com/ws/api/v2", channels=None,
+                 refit_interval=0.5, min_quotes=3, capture_time=None):
+        # Initial snapshot (e.g. from get_implied_volatilities_bulk) that fixes the instruments and grid axes
+        self.columns = iv_data_to_columns(iv_data)
+        if "underlying_price" not in self.columns:
+            raise ValueError("iv_data has no underlying_price; log-moneyness cannot be computed.")
+        capture_time = int(time.time() * 1000) if capture_time is None else capture_time
+        self.expiration_timestamps = self.columns["time_to_expiration"] + capture_time
+        self.row_of = {name: i for i, name in enumerate(self.columns["instrument_name"].tolist())}
+        self.expiries, self.expiry_of_row = np.unique(self.expiration_timestamps, return_inverse=True)
+
+        # Websocket endpoint and channels (mark prices of all options of the currency by default)
+        self.ws_url = ws_url
+        self.channels = channels or [f"markprice.options.{currency.lower()}_usd"]
+        self.refit_interval = refit_interval
+        self.min_quotes = min_quotes
+
+        # Expiries whose quotes changed since the last refit, and the receive time of their oldest pending update
+        self.dirty_expiries = set()
+        self.oldest_pending_update = None
+        self.slice_params = {}
+        self.surface = None
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        self.loop = None
+        self.websocket = None
+
+        # Metrics
+        self.messages_received = 0
+        self.quotes_updated = 0
+        self.malformed_messages = 0
+        self.refit_errors = 0
+        self.last_refit_error = None
+        self.published_at = None
+        self.started_at = None
+        self.update_latencies = collections.deque(maxlen=10000)
+        self.publish_latencies = collections.deque(maxlen=10000)
+
+        self.dirty_expiries.update(range(len(self.expiries)))
+        self.refit()
+
+    def apply_message(self, message, received_at=None):
+        # Update the grid cells of every quote in a subscription notification and mark their expiries dirty
+        received_at = time.perf_counter() if received_at is None else received_at
+        message = json.loads(message) if isinstance(message, (str, bytes)) else message
+        if message.get("method") != "subscription":
+            return 0
+        data = message["params"]["data"]
+        quotes = data if isinstance(data, list) else [data]
+
+        updated = 0
+        with self.lock:
+            self.messages_received += 1
+            for quote in quotes:
+                row = self.row_of.get(quote.get("instrument_name"))
+                if row is None:
+                    continue
+                # Ticker channels report mark_iv in %, markprice channels report iv as a fraction
+                if "mark_iv" in quote:
+                    self.columns["implied_volatility"][row] = quote["mark_iv"]
+                elif "iv" in quote:
+                    self.columns["implied_volatility"][row] = quote["iv"] * 100
+                else:
+                    continue
+                if "underlying_price" in quote:
+                    self.columns["underlying_price"][row] = quote["underlying_price"]
+                self.dirty_expiries.add(int(self.expiry_of_row[row]))
+                updated += 1
+            if updated:
+                self.quotes_updated += updated
+                if self.oldest_pending_update is None:
+                    self.oldest_pending_update = received_at
+            self.update_latencies.append(time.perf_counter() - received_at)
+        return updated
+
+    def refit(self):
+        # Refit only the dirty expiries and publish a new surface
+        now = int(time.time() * 1000)
+        with self.lock:
+            dirty = sorted(self.dirty_expiries)
+            self.dirty_expiries.clear()
+            pending_since = self.oldest_pending_update
+            self.oldest_pending_update = None
+            slices = []
+            for i in dirty:
+                rows = (self.expiry_of_row == i) & (self.columns["implied_volatility"] > 0)
+                slices.append((i, self.columns["strike"][rows], self.columns["implied_volatility"][rows],
+                               self.columns["underlying_price"][rows]))
+        if not dirty:
+            return
+
+        # Fit outside the lock so quote updates are not blocked; a failed fit puts its expiries back for the next refit
+        try:
+            self._fit_slices(slices, now)
+        except Exception:
+            with self.lock:
+                self.dirty_expiries.update(dirty)
+                if pending_since is not None and (self.oldest_pending_update is None or pending_since < self.oldest_pending_update):
+                    self.oldest_pending_update = pending_since
+            raise
+        self.published_at = time.perf_counter()
+        if pending_since is not None:
+            self.publish_latencies.append(self.published_at - pending_since)
+
+    def _fit_slices(self, slices, now):
+        # Refit the given slices, each checked against the shorter live expiry, and publish the live surface
+        for i, strikes, implied_volatility, underlying_price in slices:
+            t = (self.expiries[i] - now) / MILLISECONDS_PER_YEAR
+            if t <= 0 or len(strikes) < self.min_quotes:
+                self.slice_params.pop(i, None)
+                continue
+            log_moneyness, total_variance, forward = _svi_slice_inputs(strikes, implied_volatility, underlying_price, t)
+            previous = max((j for j in self.slice_params if j < i), default=None)
+            previous_params, previous_range = (None, None) if previous is None else self.slice_params[previous][1:]
+            initial_params = self.slice_params[i][1] if i in self.slice_params else None
+            params = fit_svi_slice(log_moneyness, total_variance, previous_params, initial_params, previous_range)
+            self.slice_params[i] = (forward, params, (log_moneyness.min(), log_moneyness.max()))
+
+        live = sorted(i for i in self.slice_params if self.expiries[i] > now)
+        if live:
+            times = (self.expiries[live] - now) / MILLISECONDS_PER_YEAR
+            self.surface = SVISurface(times, [self.slice_params[i][0] for i in live], [self.slice_params[i][1] for i in live])
+
+    def query(self, strikes, time_to_expiration):
+        # Implied volatility (in %) from the latest published surface
+        surface = self.surface
+        if surface is None:
+            raise RuntimeError("No surface has been published yet.")
+        return surface.evaluate(strikes, time_to_expiration)
+
+    def grid(self):
+        # Current quotes on a (strike x expiry) grid, with time to expiration measured from now
+        with self.lock:
+            columns = {name: values.copy() for name, values in self.columns.items()}
+        columns["time_to_expiration"] = self.expiration_timestamps - int(time.time() * 1000)
+        return build_iv_surface(columns)
+
+    def metrics(self):
+        # Throughput and latency (in seconds) of quote updates and surface publication, and the errors skipped so far
+        now = time.perf_counter()
+        elapsed = now - self.started_at if self.started_at else 0.0
+
+        def percentiles(values):
+            values = np.asarray(values)
+            if len(values) == 0:
+                return {}
+            return dict(zip(("p50", "p90", "p99", "max"), np.percentile(values, [50, 90, 99, 100]).tolist()))
+
+        return {
+            "messages_received": self.messages_received,
+            "quotes_updated": self.quotes_updated,
+            "messages_per_second": self.messages_received / elapsed if elapsed else 0.0,
+            "quotes_per_second": self.quotes_updated / elapsed if elapsed else 0.0,
+            "update_latency": percentiles(list(self.update_latencies)),
+            "publish_latency": percentiles(list(self.publish_latencies)),
+            "malformed_messages": self.malformed_messages,
+            "refit_errors": self.refit_errors,
+            "last_refit_error": self.last_refit_error,
+            "seconds_since_publish": now - self.published_at if self.published_at else None
+        }
+
+    async def _consume(self, websocket):
+        async for message in websocket:
+            # Latency is measured from the moment the frame was received; a malformed frame is skipped
+            received_at = time.perf_counter()
+            try:
+                self.apply_message(message, received_at)
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                self.malformed_messages += 1
+                print(f"Skipping malformed websocket message: {e}")
+
+    async def _refit_periodically(self):
+        # A failed refit is reported in metrics() and retried on the next tick, so the surface never silently freezes
+        while self.running:
+            await asyncio.sleep(self.refit_interval)
+            try:
+                await asyncio.to_thread(self.refit)
+            except Exception as e:
+                self.refit_errors += 1
+                self.last_refit_error = repr(e)
+                print(f"Error refitting the IV surface: {e}")
+
+    async def run(self, reconnect_delay=1):
+        # Subscribe and apply notifications until stopped, reconnecting (and resubscribing) on disconnects
+        self.running = True
+        self.started_at = time.perf_counter()
+        self.loop = asyncio.get_running_loop()
+        refit_task = asyncio.create_task(self._refit_periodically())
+        try:
+            while self.running:
+                try:
+                    async with websockets.connect(self.ws_url) as websocket:
+                        self.websocket = websocket
+                        await websocket.send(json.dumps({
+                            "jsonrpc": "2.0",
+                            "id": 1,
+                            "method": "public/subscribe",
+                            "params": {"channels": self.channels}
+                        }))
+                        await self._consume(websocket)
+                except (websockets.exceptions.ConnectionClosed, websockets.exceptions.InvalidHandshake, OSError) as e:
+                    # Disconnects and rejected handshakes (e.g. InvalidStatus) are retried
+                    print(f"Websocket connection lost: {e}. Reconnecting in {reconnect_delay} seconds...")
+                except Exception as e:
+                    print(f"Websocket error: {e}. Reconnecting in {reconnect_delay} seconds...")
+                if self.running:
+                    await asyncio.sleep(reconnect_delay)
+        finally:
+            refit_task.cancel()
+
+    def start(self):
+        # Run the service on a background thread so the query API can be used from the caller's thread
+        self.thread = threading.Thread(target=asyncio.run, args=(self.run(),), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # Close the websocket from the service's event loop so the consumer returns immediately
+        self.running = False
+        if self.loop is not None and self.websocket is not None:
+            asyncio.run_coroutine_threadsafe(self.websocket.close(), self.loop)
+        if self.thread is not None:
+            self.thread.join()
+
+# Chart content hashes of this script (each script keeps its own file)
+CHART_HASH_PATH = "chart_hashes_iv.json"
+
+def _chart_digest(plot_function, args):
+    # Content hash of a chart: its drawing code and input data
+    code = plot_function.__code__
+    digest = hashlib.sha1(code.co_code)
+    digest.update(repr([const for const in code.co_consts if not hasattr(const, "co_code")]).encode())
+    digest.update(pickle.dumps(args, protocol=4))
+    return digest.hexdigest()
+
+def _process_pool(workers, **kwargs):
+    """
+    Process pool whose workers come from a fork server (spawned where there is none) rather than a plain fork.
+    Charts can be rendered while other threads run (the IV surface stream, the fetch pool), and forking a
+    multi-threaded process can deadlock the child on a lock another thread held. Workers import the script afresh,
+    so it must be run as a script or importable.
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(method), **kwargs)
+
+def _render_chart(filename, plot_function, args):
+    fig = plot_function(*args)
+    fig.savefig(filename)
+    plt.close(fig)
+
+class ChartRenderer:
+    # Deferred, headless chart rendering, kept identical in every script that draws charts.
+    # submit() only queues a chart and render() draws the queued charts on a process pool of `workers`
+    # started through _process_pool (fork server or spawn, never a plain fork).
+    # A chart whose file exists and whose content hash matches the one recorded in `hash_path` is skipped;
+    # with hash_path=None every chart is drawn and nothing is recorded.
+    def __init__(self, workers=None, hash_path=CHART_HASH_PATH):
+        self.workers = workers or os.cpu_count()
+        self.hash_path = hash_path
+        self.hashes = {}
+        if hash_path and os.path.exists(hash_path):
+            with open(hash_path) as f:
+                self.hashes = json.load(f)
+        self.jobs = []
+        self.skipped = 0
+
+    def submit(self, filename, plot_function, *args):
+        # Queue a chart unless its file exists and its drawing code and inputs are unchanged
+        key = _chart_digest(plot_function, args)
+        if self.hashes.get(filename) == key and os.path.exists(filename):
+            self.skipped += 1
+            return
+        self.jobs = [job for job in self.jobs if job[0] != filename] + [(filename, plot_function, args, key)]
+
+    def render(self):
+        jobs, self.jobs = self.jobs, []
+        start = time.perf_counter()
+        if self.workers > 1 and len(jobs) > 1:
+            with _process_pool(min(self.workers, len(jobs))) as executor:
+                list(executor.map(_render_chart, *zip(*[job[:3] for job in jobs])))
+        else:
+            for filename, plot_function, args, _ in jobs:
+                _render_chart(filename, plot_function, args)
+        if jobs and self.hash_path:
+            self.hashes.update({job[0]: job[3] for job in jobs})
+            with open(self.hash_path + ".tmp", "w") as f:
+                json.dump(self.hashes, f)
+            os.replace(self.hash_path + ".tmp", self.hash_path)
+        stats = {"rendered": len(jobs), "skipped": self.skipped, "seconds": time.perf_counter() - start}
+        self.skipped = 0
+        return stats
+
+def _plot_iv_surface(X, Y, Z, zlabel, title):
     fig = plt.figure(figsize=(12, 8))
     ax = fig.add_subplot(111, projection='3d')
     ax.plot_surface(X, Y, Z, cmap='viridis')
     ax.set_xlabel('Time to Expiration (in millisecond)')
     ax.set_ylabel('Strike')
-    ax.set_zlabel('Mark Implied Volatility')
-    ax.set_title('Original Mark Implied Volatility Surface')
-    plt.savefig("Original Mark Implied Volatility Surface.png")
-    plt.show()
+    ax.set_zlabel(zlabel)
+    ax.set_title(title)
+    return fig
 
-    # Use Gaussian filter to smooth the implied vol
-    Z_smoothed = gaussian_filter(Z, sigma=1)
-    fig = plt.figure(figsize=(12, 8))
-    ax = fig.add_subplot(111, projection='3d')
-    ax.plot_surface(X, Y, Z_smoothed, cmap='viridis')
-    ax.set_xlabel('Time to Expiration (in millisecond)')
-    ax.set_ylabel('Strike')
-    ax.set_zlabel('Smoothed Mark Implied Volatility')
-    ax.set_title('Smoothed Mark Implied Volatility Surface')
-    plt.savefig("Smoothed Mark Implied Volatility Surface.png")
-    plt.show() 
+def visualize_iv_surface(iv_data, renderer=None):
+    # Function to visualize the implied volatility surface
+    # Charts are drawn before returning, unless a ChartRenderer is passed in to defer them
+    deferred = renderer is not None
+    renderer = renderer or ChartRenderer()
+    columns = iv_data_to_columns(iv_data)
+    surface = build_iv_surface(columns)
+
+    # Create meshgrid of expirations and strikes, missing cells stay NaN and are left out of the plot
+    X, Y = surface.meshgrid()
+    Z = surface.values
+
+    # Plot the original implied vol surface
+    renderer.submit("Original Mark Implied Volatility Surface.png", _plot_iv_surface,
+                    X, Y, Z, 'Mark Implied Volatility', 'Original Mark Implied Volatility Surface')
+
+    # Evaluate the fitted SVI surface on the grid to smooth the implied vol
+    if "underlying_price" not in columns:
+        print("No underlying prices in iv_data, skipping the smoothed surface.")
+    else:
+        Z_smoothed = fit_iv_surface(columns).evaluate(Y, X)
+        renderer.submit("Smoothed Mark Implied Volatility Surface.png", _plot_iv_surface,
+                        X, Y, Z_smoothed, 'Smoothed Mark Implied Volatility', 'Smoothed Mark Implied Volatility Surface')
+
+    if not deferred:
+        stats = renderer.render()
+        print(f"Charts: {stats['rendered']} rendered, {stats['skipped']} unchanged, in {stats['seconds']:.2f}s")
 
 def main():
     # Main function to execute the script
     api = DeribitAPI()
     instruments = api.get_instruments()
-    iv_data = get_implied_volatilities(instruments)
+    iv_data = get_implied_volatilities_bulk(instruments, "BTC", api)
    
-    # Save the results to a JSON file in local drive
-    with open("iv_data.json", "w") as f:
-        json.dump(iv_data, f)
+    # Append the results as a new snapshot to the columnar store in local drive
+    IVSnapshotStore().append("BTC", iv_data)
 
     # Visualize the implied volatility surface
     visualize_iv_surface(iv_data)
 
+def stream(currency="BTC", report_interval=10):
+    # Long-running mode: seed the surface with a snapshot, then keep it updated from the websocket feed
+    api = DeribitAPI()
+    iv_data = get_implied_volatilities_bulk(api.get_instruments(currency), currency, api)
+    service = IVSurfaceStream(iv_data, currency)
+    service.start()
+    try:
+        while True:
+            time.sleep(report_interval)
+            print(f"Surface stream metrics: {service.metrics()}")
+    except KeyboardInterrupt:
+        service.stop()
+        print("Streaming stopped by user.")
+
 if __name__ == "__main__":
-    main()
+    if "--stream" in sys.argv:
+        stream()
+    else:
+        main()
 
@@ -1,10 +1,431 @@
 import time
 import requests
+from requests.adapters import HTTPAdapter
 from web3 import Web3
 import json
+import asyncio
+import multiprocessing
+import os
+import sys
+import websockets
+import eth_abi
+from eth_abi.exceptions import DecodingError
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, NamedTuple, Optional
+
+class SeenTransactionCache:
+    def __init__(self, max_size=100000, ttl=600):
+        # Transaction hashes ordered by the last time they were seen, bounded in size and age (in seconds)
+        self.entries = OrderedDict()
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def seen(self, tx_hash):
+        # Return True if the hash was already seen, otherwise record it and return False
+        now = time.monotonic()
+        self.expire(now)
+        if tx_hash in self.entries:
+            self.entries[tx_hash] = now
+            self.entries.move_to_end(tx_hash)
+            self.hits += 1
+            return True
+        self.misses += 1
+        self.entries[tx_hash] = now
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return False
+
+    def discard(self, tx_hash):
+        # Forget a hash whose processing failed, so the transaction is retried the next time it is seen
+        self.entries.pop(tx_hash, None)
+
+    def expire(self, now=None):
+        # Evict hashes that have not been seen for longer than the TTL
+        now = time.monotonic() if now is None else now
+        while self.entries and now - next(iter(self.entries.values())) > self.ttl:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def retain(self, tx_hashes):
+        # Evict hashes that left the pending block, i.e. transactions that were mined or dropped
+        for tx_hash in [tx_hash for tx_hash in self.entries if tx_hash not in tx_hashes]:
+            del self.entries[tx_hash]
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+def _word(data, pos):
+    # Read one 32-byte ABI word as an unsigned integer
+    if pos + 32 > len(data):
+        raise ValueError("Calldata is shorter than its ABI encoding requires.")
+    return int.from_bytes(data[pos:pos + 32], "big")
+
+def _signed_word(data, pos):
+    # Read one 32-byte ABI word as a two's complement signed integer
+    value = _word(data, pos)
+    return value - (1 << 256) if value >> 255 else value
+
+def _canonical_type(abi_input):
+    # Canonical type used in function signatures, expanding tuples into their component types
+    if abi_input["type"].startswith("tuple"):
+        components = ",".join(_canonical_type(component) for component in abi_input["components"])
+        return f"({components}){abi_input['type'][len('tuple'):]}"
+    return abi_input["type"]
+
+class RouterCalldataDecoder:
+    def __init__(self, router_abi):
+        # Checksummed addresses keyed by their raw 20 bytes; swaps reuse a small set of tokens and recipients
+        self.checksum_addresses = {}
+
+        # Decoding plan per 4-byte selector: (function name, decoder of the argument block)
+        self.plans = {}
+        for item in router_abi:
+            if item.get("type") != "function":
+                continue
+            types = [_canonical_type(abi_input) for abi_input in item["inputs"]]
+            selector = bytes(Web3.keccak(text=f"{item['name']}({','.join(types)})")[:4])
+            try:
+                fields = [(abi_input["name"], *self._compile(abi_input)) for abi_input in item["inputs"]]
+                decode_arguments = self._fields_decoder(fields)
+            except ValueError:
+                # Types without a compiled decoder (e.g. fixed-size arrays) go through eth_abi instead
+                decode_arguments = self._generic_decoder(item["inputs"], types)
+            self.plans[selector] = (item["name"], decode_arguments)
+
+    def _checksum(self, raw_address):
+        address = self.checksum_addresses.get(raw_address)
+        if address is None:
+            address = Web3.to_checksum_address(raw_address)
+            self.checksum_addresses[raw_address] = address
+        return address
+
+    def _compile(self, abi_input):
+        # Returns (decoder, is_dynamic, head_size); dynamic decoders read at the content position the head points to
+        abi_type = abi_input["type"]
+        if abi_type.endswith("]") and not abi_type.endswith("[]"):
+            raise ValueError(f"No compiled decoder for ABI type {abi_type}.")
+        if abi_type.endswith("[]"):
+            decode_element, element_dynamic, element_size = self._compile(dict(abi_input, type=abi_type[:-2]))
+
+            def decode_array(data, pos):
+                length, start = _word(data, pos), pos + 32
+                if element_dynamic:
+                    return [decode_element(data, start + _word(data, start + 32 * i)) for i in range(length)]
+                return [decode_element(data, start + element_size * i) for i in range(length)]
+            return decode_array, True, 32
+        if abi_type == "tuple":
+            fields = [(component["name"], *self._compile(component)) for component in abi_input["components"]]
+            dynamic = any(field_dynamic for _, _, field_dynamic, _ in fields)
+            return self._fields_decoder(fields), dynamic, 32 if dynamic else sum(size for *_, size in fields)
+        # Static words are checked like eth_abi's strict decoding: padding must be empty and values within their type,
+        # so calldata web3 would reject never decodes into a plausible-looking value
+        if abi_type == "address":
+            def decode_address(data, pos):
+                value = _word(data, pos)
+                if value >> 160:
+                    raise ValueError(f"Address at offset {pos} has non-empty padding.")
+                return self._checksum(value.to_bytes(20, "big"))
+            return decode_address, False, 32
+        if abi_type == "bool":
+            def decode_bool(data, pos):
+                value = _word(data, pos)
+                if value > 1:
+                    raise ValueError(f"Bool at offset {pos} is neither 0 nor 1.")
+                return value == 1
+            return decode_bool, False, 32
+        if abi_type.startswith("uint"):
+            bits = int(abi_type[len("uint"):] or 256)
+            if bits == 256:
+                return _word, False, 32
+
+            def decode_uint(data, pos):
+                value = _word(data, pos)
+                if value >> bits:
+                    raise ValueError(f"Value at offset {pos} does not fit in {abi_type}.")
+                return value
+            return decode_uint, False, 32
+        if abi_type.startswith("int"):
+            bound = 1 << (int(abi_type[len("int"):] or 256) - 1)
+            if bound == 1 << 255:
+                return _signed_word, False, 32
+
+            def decode_int(data, pos):
+                value = _signed_word(data, pos)
+                if not -bound <= value < bound:
+                    raise ValueError(f"Value at offset {pos} does not fit in {abi_type}.")
+                return value
+            return decode_int, False, 32
+        if abi_type in ("bytes", "string"):
+            def decode_bytes(data, pos):
+                length = _word(data, pos)
+                end, padded_end = pos + 32 + length, pos + 32 + -(-length // 32) * 32
+                if padded_end > len(data):
+                    raise ValueError("Calldata is shorter than its ABI encoding requires.")
+                if any(data[end:padded_end]):
+                    raise ValueError(f"{abi_type} at offset {pos} has non-empty padding.")
+                value = bytes(data[pos + 32:end])
+                return value.decode("utf-8") if abi_type == "string" else value
+            return decode_bytes, True, 32
+        if abi_type.startswith("bytes"):
+            size = int(abi_type[len("bytes"):])
+            padding = (1 << 8 * (32 - size)) - 1
+
+            def decode_fixed_bytes(data, pos):
+                value = _word(data, pos)
+                if value & padding:
+                    raise ValueError(f"{abi_type} at offset {pos} has non-empty padding.")
+                return value.to_bytes(32, "big")[:size]
+            return decode_fixed_bytes, False, 32
+        raise ValueError(f"No compiled decoder for ABI type {abi_type}.")
+
+    def _fields_decoder(self, fields):
+        # Precompute each field's head offset so a tuple (or argument block) decodes without any type dispatch
+        layout, offset = [], 0
+        for name, decode, dynamic, size in fields:
+            layout.append((name, decode, dynamic, offset))
+            offset += size
+
+        def decode_fields(data, pos):
+            return {
+                name: decode(data, pos + _word(data, pos + field_offset)) if dynamic else decode(data, pos + field_offset)
+                for name, decode, dynamic, field_offset in layout
+            }
+        return decode_fields
+
+    def _generic_decoder(self, abi_inputs, types):
+        def name_values(abi_input, value):
+            # Shape eth_abi's tuples like web3 does: named dicts for tuples and checksummed addresses
+            abi_type = abi_input["type"]
+            if abi_type.endswith("]"):
+                element = dict(abi_input, type=abi_type[:abi_type.rindex("[")])
+                return [name_values(element, v) for v in value]
+            if abi_type == "tuple":
+                return {c["name"]: name_values(c, v) for c, v in zip(abi_input["components"], value)}
+            if abi_type == "address":
+                return self._checksum(bytes.fromhex(value[2:]))
+            return value
+
+        def decode_arguments(data, pos):
+            try:
+                values = eth_abi.decode(types, bytes(data[pos:]))
+            except DecodingError as e:
+                raise ValueError(str(e)) from e
+            return {abi_input["name"]: name_values(abi_input, value) for abi_input, value in zip(abi_inputs, values)}
+        return decode_arguments
+
+    def decode(self, calldata):
+        # Returns (function name, parameters, decoded multicall sub-calls); sub-calls are decoded recursively
+        if isinstance(calldata, str):
+            calldata = bytes.fromhex(calldata[2:] if calldata.startswith("0x") else calldata)
+        data = memoryview(bytes(calldata))
+        plan = self.plans.get(bytes(data[:4]))
+        if plan is None:
+            raise ValueError(f"Unknown function selector 0x{bytes(data[:4]).hex()}.")
+        fn_name, decode_arguments = plan
+        try:
+            params = decode_arguments(data[4:], 0)
+        except (IndexError, OverflowError, TypeError) as e:
+            # Malformed calldata always surfaces as ValueError, like the bounds checks in _word
+            raise ValueError(f"Malformed calldata for {fn_name}: {e}") from e
+
+        sub_calls = []
+        if fn_name == "multicall":
+            for call_data in params["data"]:
+                try:
+                    sub_calls.append(self.decode(call_data))
+                except ValueError as e:
+                    # Keep the undecodable sub-call with its error instead of dropping the whole transaction
+                    sub_calls.append((None, {"data": call_data, "error": str(e)}, []))
+        return fn_name, params, sub_calls
+
+class SwapRecord(NamedTuple):
+    tx_hash: str
+    function: str
+    token_path: List[str]
+    fee_tiers: List[int]
+    amount_in: Optional[int]
+    amount_out: Optional[int]
+    amount_out_minimum: Optional[int]
+    amount_in_maximum: Optional[int]
+    recipient: Optional[str]
+    deadline: Optional[int]
+
+def _parse_swap_path(path, checksum):
+    # Uniswap V3 encoded path: token (20 bytes) followed by repeated fee (3 bytes) + token (20 bytes) hops
+    tokens = [checksum(path[i:i + 20]) for i in range(0, len(path), 23)]
+    fees = [int.from_bytes(path[i + 20:i + 23], "big") for i in range(0, len(path) - 20, 23)]
+    return tokens, fees
+
+def swap_records(decoder, tx_hash, fn_name, params, sub_calls, deadline=None):
+    # Turn a decoded router call (and its multicall sub-calls) into typed swap records
+    if fn_name == "multicall":
+        # SwapRouter02's multicall(uint256 deadline, bytes[] data) carries the deadline for all sub-calls
+        deadline = params.get("deadline", deadline)
+        records = []
+        for sub_fn_name, sub_params, sub_sub_calls in sub_calls:
+            if sub_fn_name is not None:
+                records += swap_records(decoder, tx_hash, sub_fn_name, sub_params, sub_sub_calls, deadline)
+        return records
+    if fn_name not in ("exactInputSingle", "exactOutputSingle", "exactInput", "exactOutput"):
+        return []
+
+    swap = params["params"]
+    if fn_name.endswith("Single"):
+        token_path, fee_tiers = [swap["tokenIn"], swap["tokenOut"]], [swap["fee"]]
+    else:
+        token_path, fee_tiers = _parse_swap_path(swap["path"], decoder._checksum)
+        if fn_name == "exactOutput":
+            # exactOutput paths are encoded from the output token back to the input token
+            token_path, fee_tiers = token_path[::-1], fee_tiers[::-1]
+    return [SwapRecord(
+        tx_hash=tx_hash,
+        function=fn_name,
+        token_path=token_path,
+        fee_tiers=fee_tiers,
+        amount_in=swap.get("amountIn"),
+        amount_out=swap.get("amountOut"),
+        amount_out_minimum=swap.get("amountOutMinimum"),
+        amount_in_maximum=swap.get("amountInMaximum"),
+        recipient=swap.get("recipient"),
+        deadline=swap.get("deadline", deadline)
+    )]
+
+# Decoder built once per worker process from the router ABI passed to the pool initializer
+_worker_decoder = None
+_worker_router_address = None
+
+def _init_decode_worker(router_abi, router_address):
+    global _worker_decoder, _worker_router_address
+    _worker_decoder = RouterCalldataDecoder(router_abi)
+    _worker_router_address = router_address.lower()
+
+def _decode_swap_batch(transactions):
+    # Decode stage: (tx hash, to, input) tuples in, swap records and the number of undecodable transactions out
+    records, errors = [], 0
+    for tx_hash, to, calldata in transactions:
+        if to is None or to.lower() != _worker_router_address:
+            continue
+        try:
+            fn_name, params, sub_calls = _worker_decoder.decode(calldata)
+            records += swap_records(_worker_decoder, tx_hash, fn_name, params, sub_calls)
+        except Exception:
+            # Any failure on one transaction only counts as a decode error, the rest of the batch is kept
+            errors += 1
+    return records, errors
+
+def _hex(value):
+    return value if isinstance(value, str) else "0x" + bytes(value).hex()
+
+class NDJSONSwapSink:
+    def __init__(self, path):
+        # Append-only newline-delimited JSON log of swap records
+        self.file = open(path, "a")
+
+    def write(self, records):
+        for record in records:
+            self.file.write(json.dumps(record._asdict()) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def _process_pool(workers, **kwargs):
+    # Workers come from a fork server (spawned where there is none) rather than a plain fork: the pool is started
+    # while the backfill's fetch threads are running, and forking a multi-threaded process can deadlock the child on
+    # a lock another thread held. Workers import the script afresh, so it must be run as a script or importable.
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(method), **kwargs)
+
+class SwapDecodePipeline:
+    def __init__(self, router_abi, router_address, sink, workers=None, batch_size=256, max_pending_batches=None):
+        # Decode stage: a process pool where every worker holds its own decoder compiled from the router ABI
+        workers = workers or os.cpu_count()
+        self.executor = _process_pool(workers, initializer=_init_decode_worker, initargs=(router_abi, router_address))
+        self.sink = sink
+        self.batch_size = batch_size
+        self.max_pending_batches = max_pending_batches or 2 * workers
+        self.pending = deque()
+
+        # Counters
+        self.transactions_submitted = 0
+        self.batches_submitted = 0
+        self.batches_written = 0
+        self.records_written = 0
+        self.decode_errors = 0
+
+    def submit(self, transactions):
+        # Ingest stage: batch transactions into the pool, waiting on the sink when too many batches are in flight
+        batch = []
+        for tx in transactions:
+            batch.append((_hex(tx["hash"]), tx.get("to"), _hex(tx["input"])))
+            if len(batch) == self.batch_size:
+                self._submit_batch(batch)
+                batch = []
+        if batch:
+            self._submit_batch(batch)
+        # Write out whatever has finished without blocking
+        while self.pending and self.pending[0][0].done():
+            self._write_next()
+
+    def _submit_batch(self, batch):
+        while len(self.pending) >= self.max_pending_batches:
+            self._write_next()
+        self.pending.append((self.executor.submit(_decode_swap_batch, batch), len(batch)))
+        self.transactions_submitted += len(batch)
+        self.batches_submitted += 1
+
+    def _write_next(self):
+        # Sink stage: batches are written in submission order
+        future, batch_size = self.pending.popleft()
+        try:
+            records, errors = future.result()
+        except Exception as e:
+            # A failed batch (e.g. a crashed worker) is counted as undecodable instead of stopping the sink
+            print(f"Error decoding a batch of {batch_size} transactions: {e}")
+            records, errors = [], batch_size
+        self.sink.write(records)
+        self.batches_written += 1
+        self.records_written += len(records)
+        self.decode_errors += errors
+
+    def flush(self):
+        while self.pending:
+            self._write_next()
+
+    def close(self):
+        self.flush()
+        self.executor.shutdown()
+        self.sink.close()
+
+    def run(self, transactions):
+        # Push a finite stream of transactions (e.g. a recorded replay) through all stages and report throughput
+        start = time.perf_counter()
+        self.submit(transactions)
+        self.flush()
+        elapsed = time.perf_counter() - start
+        return {
+            "transactions": self.transactions_submitted,
+            "records": self.records_written,
+            "decode_errors": self.decode_errors,
+            "seconds": elapsed,
+            "transactions_per_second": self.transactions_submitted / elapsed if elapsed else 0.0
+        }
 
 class AlchemyTransactionMonitor:
-    def __init__(self, alchemy_http_url, uniswap_router_address, router_abi):
+    def __init__(self, alchemy_http_url, uniswap_router_address, router_abi, dedup_cache_size=100000, dedup_ttl=600):
         # Connect to Ethereum mainnet via HTTP
         self.w3 = Web3(Web3.HTTPProvider(alchemy_http_url))
         if not self.w3.is_connected():
@@ -22,9 +443,23 @@ class AlchemyTransactionMonitor:
             abi=self.uniswap_router_abi
         )
 
+        # Selector-indexed calldata decoder precompiled from the router ABI
+        self.calldata_decoder = RouterCalldataDecoder(self.uniswap_router_abi)
+
         # Alchemy HTTP URL
         self.alchemy_http_url = alchemy_http_url
 
+        # Keep-alive session for batched JSON-RPC requests
+        self.http_session = requests.Session()
+        self.http_session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=8))
+        self.http_session.mount("http://", HTTPAdapter(pool_connections=8, pool_maxsize=8))
+
+        # Hashes of pending transactions that were already processed, so each one is decoded only once
+        self.seen_transactions = SeenTransactionCache(dedup_cache_size, dedup_ttl)
+
+        # Per-transaction detection-to-decode latencies (in seconds) of the websocket ingestion mode
+        self.detection_latencies = deque(maxlen=100000)
+
     def get_pending_transactions(self, retries=5, delay=2):
         # Using eth_getBlockByNumber with the "pending" block tag
         payload = {
@@ -51,21 +486,36 @@ class AlchemyTransactionMonitor:
         print("Failed to retrieve pending transactions after multiple attempts.")
         return []
 
-    def monitor_pending_transactions(self):
+    def monitor_pending_transactions(self, pipeline=None):
+        # With a SwapDecodePipeline, new pending transactions are handed to its process pool instead of decoded inline
         print("Monitoring pending transactions on Uniswap...")
         try:
             while True:
                 # Retrieve pending transactions from Alchemy
                 pending_transactions = self.get_pending_transactions()
+
+                # Forget transactions that are no longer pending (skipped when the fetch failed and returned nothing)
+                if pending_transactions:
+                    self.seen_transactions.retain({tx_receipt["hash"] for tx_receipt in pending_transactions if "hash" in tx_receipt})
         
+                if pipeline is not None:
+                    # The pending block already holds full transactions, so no per-transaction fetch is needed
+                    pipeline.submit(tx_receipt for tx_receipt in pending_transactions
+                                    if "hash" in tx_receipt and not self.seen_transactions.seen(tx_receipt["hash"]))
+                    pending_transactions = []
+
                 for tx_receipt in pending_transactions:
                     # Check if 'transactionHash' is present
                     if "hash" in tx_receipt:
+                        tx_hash = tx_receipt["hash"]
+                        # Skip transactions already processed in a previous poll
+                        if self.seen_transactions.seen(tx_hash):
+                            continue
                         try:
-                            tx_hash = tx_receipt["hash"]
                             tx = self.w3.eth.get_transaction(tx_hash)
                             self.decode_transaction(tx)
                         except Exception as e:
+                            self.seen_transactions.discard(tx_hash)
                             print(f"Error processing transaction {tx_hash}: {e}")
                     else:
                         print("Transaction does not contain 'hash' key, skipping.")
@@ -74,6 +524,218 @@ class AlchemyTransactionMonitor:
                 time.sleep(2)
         except KeyboardInterrupt:
             print("Monitoring stopped by user.")
+            print(f"Seen-transaction cache: {self.seen_transactions.stats()}")
+            if pipeline is not None:
+                pipeline.close()
+                print(f"Swap records written: {pipeline.records_written}")
+
+    def get_blocks(self, block_numbers, retries=5, delay=2):
+        # Fetch several full blocks in one JSON-RPC batch request
+        payload = [{
+            "jsonrpc": "2.0",
+            "method": "eth_getBlockByNumber",
+            "params": [hex(block_number), True],
+            "id": block_number
+        } for block_number in block_numbers]
+
+        for attempt in range(retries):
+            try:
+                response = self.http_session.post(self.alchemy_http_url, json=payload, timeout=30)
+                response.raise_for_status()
+                reply = response.json()
+                # A provider rejecting the whole batch answers with a single error object instead of a list
+                if not isinstance(reply, list):
+                    error = reply.get("error") if isinstance(reply, dict) else reply
+                    raise ValueError(f"Batch request failed: {error}")
+                results = {item.get("id"): item.get("result") for item in reply if isinstance(item, dict)}
+                missing = [n for n in block_numbers if results.get(n) is None]
+                if missing:
+                    raise ValueError(f"Blocks {missing} missing from batch response.")
+                return [results[n] for n in block_numbers]
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"Error fetching blocks {block_numbers[0]}-{block_numbers[-1]}: {e}")
+                print(f"Retrying in {delay} seconds... (Attempt {attempt + 1}/{retries})")
+                time.sleep(delay)
+
+        raise ConnectionError(f"Failed to retrieve blocks {block_numbers[0]}-{block_numbers[-1]} after multiple attempts.")
+
+    def _save_checkpoint(self, checkpoint_path, checkpoints, key, next_block):
+        # Write the checkpoint atomically so an interrupted run resumes from the next unprocessed block
+        checkpoints[key] = next_block
+        with open(checkpoint_path + ".tmp", "w") as f:
+            json.dump(checkpoints, f)
+        os.replace(checkpoint_path + ".tmp", checkpoint_path)
+
+    def backfill(self, start_block, end_block, checkpoint_path="backfill_checkpoint.json", blocks_per_request=10,
+                 concurrent_requests=4, pipeline=None):
+        # Replay router transactions of blocks [start_block, end_block], resuming after the last checkpointed block
+        # Checkpoints are kept per (start_block, end_block) range, so different ranges never resume from each other
+        checkpoints, key = {}, f"{start_block}-{end_block}"
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                checkpoints = json.load(f)
+        first_block = max(start_block, checkpoints.get(key, start_block))
+        print(f"Backfilling blocks {first_block} to {end_block}...")
+
+        chunks = iter([list(range(n, min(n + blocks_per_request, end_block + 1)))
+                       for n in range(first_block, end_block + 1, blocks_per_request)])
+        router_address = self.uniswap_router_address.lower()
+        stats = {"blocks": 0, "transactions": 0, "router_transactions": 0}
+        start = time.perf_counter()
+
+        # Decoded chunks waiting for their pipeline batches to be written: (batches submitted so far, next block)
+        unwritten = deque()
+
+        # Batches are fetched concurrently, at most 2 * concurrent_requests ahead, but processed and checkpointed in block order
+        with ThreadPoolExecutor(max_workers=concurrent_requests) as executor:
+            prefetch = deque()
+            for block_numbers in chunks:
+                prefetch.append((block_numbers, executor.submit(self.get_blocks, block_numbers)))
+                if len(prefetch) >= 2 * concurrent_requests:
+                    break
+            while prefetch:
+                block_numbers, future = prefetch.popleft()
+                blocks = future.result()
+                next_chunk = next(chunks, None)
+                if next_chunk is not None:
+                    prefetch.append((next_chunk, executor.submit(self.get_blocks, next_chunk)))
+
+                transactions = [tx for block in blocks for tx in block["transactions"]]
+                router_transactions = [tx for tx in transactions if (tx.get("to") or "").lower() == router_address]
+                stats["blocks"] += len(blocks)
+                stats["transactions"] += len(transactions)
+                stats["router_transactions"] += len(router_transactions)
+
+                if pipeline is None:
+                    for tx in router_transactions:
+                        self.decode_transaction(dict(tx, to=Web3.to_checksum_address(tx["to"])))
+                    self._save_checkpoint(checkpoint_path, checkpoints, key, block_numbers[-1] + 1)
+                    continue
+
+                # The pipeline keeps decoding in the background; a chunk is checkpointed once all its batches are written
+                pipeline.submit(router_transactions)
+                unwritten.append((pipeline.batches_submitted, block_numbers[-1] + 1))
+                next_block = None
+                while unwritten and unwritten[0][0] <= pipeline.batches_written:
+                    next_block = unwritten.popleft()[1]
+                if next_block is not None:
+                    self._save_checkpoint(checkpoint_path, checkpoints, key, next_block)
+
+        if pipeline is not None and unwritten:
+            pipeline.flush()
+            self._save_checkpoint(checkpoint_path, checkpoints, key, unwritten[-1][1])
+
+        stats["seconds"] = time.perf_counter() - start
+        stats["blocks_per_second"] = stats["blocks"] / stats["seconds"] if stats["seconds"] else 0.0
+        print(f"Backfill finished: {stats}")
+        return stats
+
+    def _subscription_params(self, filter_to_router):
+        # Alchemy's pending-transaction subscription can filter on the router and return full transactions;
+        # the standard newPendingTransactions subscription only returns hashes
+        if filter_to_router:
+            return ["alchemy_pendingTransactions", {"toAddress": [self.uniswap_router_address], "hashesOnly": False}]
+        return ["newPendingTransactions"]
+
+    async def _ingest(self, ws_url, queue, filter_to_router, reconnect_delay):
+        # Receive subscription notifications into the bounded queue, reconnecting and resubscribing on failure
+        resume = False
+        while True:
+            try:
+                async with websockets.connect(ws_url) as websocket:
+                    await websocket.send(json.dumps({
+                        "jsonrpc": "2.0",
+                        "id": 1,
+                        "method": "eth_subscribe",
+                        "params": self._subscription_params(filter_to_router)
+                    }))
+                    try:
+                        subscription = json.loads(await websocket.recv())
+                    except ValueError as e:
+                        raise ConnectionError(f"Invalid subscription reply: {e}") from e
+                    if not isinstance(subscription, dict) or "result" not in subscription:
+                        error = subscription.get("error") if isinstance(subscription, dict) else subscription
+                        raise ConnectionError(f"Subscription failed: {error}")
+                    print(f"Subscribed to pending transactions ({subscription['result']}).")
+
+                    # After a reconnect, catch up on transactions that arrived while disconnected;
+                    # the seen-transaction cache drops the ones that were already decoded
+                    if resume:
+                        for tx in await asyncio.to_thread(self.get_pending_transactions):
+                            await queue.put((time.perf_counter(), tx))
+                    resume = True
+
+                    async for message in websocket:
+                        received_at = time.perf_counter()
+                        try:
+                            notification = json.loads(message)
+                            if notification.get("method") != "eth_subscription":
+                                continue
+                            result = notification["params"]["result"]
+                        except (ValueError, KeyError, TypeError, AttributeError) as e:
+                            # A malformed frame is skipped instead of ending the ingestion
+                            print(f"Skipping malformed websocket message: {e}")
+                            continue
+                        # Awaiting a full queue stops reading the socket, which pushes back on the provider
+                        await queue.put((received_at, result))
+            except (websockets.exceptions.WebSocketException, OSError, ConnectionError) as e:
+                print(f"Websocket connection lost: {e}. Reconnecting in {reconnect_delay} seconds...")
+            await asyncio.sleep(reconnect_delay)
+
+    async def _decode_worker(self, queue):
+        # Take notifications off the queue, fetch the transaction when only its hash was pushed, and decode it on a
+        # worker thread, so decoding never holds up the event loop and the receiver keeps reading the socket
+        while True:
+            received_at, item = await queue.get()
+            tx_hash = None
+            try:
+                tx_hash = item if isinstance(item, str) else item.get("hash")
+                if tx_hash is None or self.seen_transactions.seen(tx_hash):
+                    continue
+                if isinstance(item, str):
+                    tx = await asyncio.to_thread(self.w3.eth.get_transaction, tx_hash)
+                else:
+                    tx = dict(item, to=Web3.to_checksum_address(item["to"]) if item.get("to") else None)
+                await asyncio.to_thread(self.decode_transaction, tx)
+                self.detection_latencies.append(time.perf_counter() - received_at)
+            except Exception as e:
+                if tx_hash is not None:
+                    self.seen_transactions.discard(tx_hash)
+                print(f"Error processing transaction {item}: {e}")
+            finally:
+                queue.task_done()
+
+    async def stream_pending_transactions(self, ws_url, filter_to_router=True, workers=4, queue_size=10000,
+                                          reconnect_delay=1, duration=None):
+        # Websocket ingestion mode: one receiver feeding a bounded queue drained by decoder workers
+        queue = asyncio.Queue(maxsize=queue_size)
+        tasks = [asyncio.create_task(self._ingest(ws_url, queue, filter_to_router, reconnect_delay))]
+        tasks += [asyncio.create_task(self._decode_worker(queue)) for _ in range(workers)]
+        try:
+            # Tasks only finish on an unexpected error, which is raised here instead of leaving the others waiting
+            done, _ = await asyncio.wait(tasks, timeout=duration, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def detection_latency_percentiles(self, percentiles=(50, 90, 99)):
+        # Percentiles (in seconds) of the time from receiving a notification to having decoded the transaction
+        latencies = sorted(self.detection_latencies)
+        if not latencies:
+            return {}
+        return {f"p{p}": latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] for p in percentiles}
+
+    def monitor_pending_transactions_ws(self, ws_url, **kwargs):
+        print("Streaming pending transactions on Uniswap...")
+        try:
+            asyncio.run(self.stream_pending_transactions(ws_url, **kwargs))
+        except KeyboardInterrupt:
+            print("Monitoring stopped by user.")
+        print(f"Detection-to-decode latency: {self.detection_latency_percentiles()}")
+        print(f"Seen-transaction cache: {self.seen_transactions.stats()}")
 
     def decode_transaction(self, tx):
         try:
@@ -82,19 +744,18 @@ class AlchemyTransactionMonitor:
                 #print("Skipping non-Uniswap transaction.")
                 return
     
-            # Decode the transaction input
-            func_obj, func_params = self.uniswap_router_contract.decode_function_input(tx["input"])
-            print(f"Decoded Transaction: {func_obj.fn_name} with parameters {func_params}")
+            # Decode the transaction input, including any multicall sub-calls
+            fn_name, func_params, sub_calls = self.calldata_decoder.decode(tx["input"])
+            print(f"Decoded Transaction: {fn_name} with parameters {func_params}")
     
             # Handle multicall transactions separately
-            if func_obj.fn_name == "multicall":
-                for call_data in func_params['data']:
-                    try:
-                        sub_func_obj, sub_func_params = self.uniswap_router_contract.decode_function_input(call_data)
+            if fn_name == "multicall":
+                for sub_fn_name, sub_func_params, _ in sub_calls:
+                    if sub_fn_name is None:
+                        print("Error decoding sub-call in multicall transaction:", sub_func_params["error"])
+                    else:
                         print("Decoding multicall transaction...")
-                        print(f"  Sub-call: {sub_func_obj.fn_name} with parameters {sub_func_params}")
-                    except Exception as e:
-                        print("Error decoding sub-call in multicall transaction:", e)
+                        print(f"  Sub-call: {sub_fn_name} with parameters {sub_func_params}")
 
             else:
                 # Process other types of transactions
@@ -113,6 +774,7 @@ if __name__ == "__main__":
     uniswap_router_address = "0xE592427A0AEce92De3Edee1F18E0157C05861564"
 
     alchemy_http_url = "https://eth-mainnet.alchemyapi.io/v2/" + YOUR_ALCHEMY_API_KEY
+    alchemy_ws_url = "wss://eth-mainnet.g.alchemy.com/v2/" + YOUR_ALCHEMY_API_KEY
     ABI_URL = "https://api.etherscan.io/api?chainid=1&module=contract&action=getabi&address=" + uniswap_router_address + "&apikey=" + YOUR_ETHERSCAN_API_KEY
     
     # Load Uniswap V3 router ABI
@@ -124,7 +786,21 @@ if __name__ == "__main__":
         exit(1)
 
     monitor = AlchemyTransactionMonitor(alchemy_http_url, uniswap_router_address, router_abi)
-    monitor.monitor_pending_transactions()
+    if "--ws" in sys.argv:
+        # Subscribe to pending transactions over websocket instead of polling the pending block
+        monitor.monitor_pending_transactions_ws(alchemy_ws_url)
+    elif "--backfill" in sys.argv:
+        # Replay a historical block range: --backfill START_BLOCK END_BLOCK
+        start_block, end_block = (int(arg) for arg in sys.argv[sys.argv.index("--backfill") + 1:][:2])
+        pipeline = SwapDecodePipeline(router_abi, uniswap_router_address, NDJSONSwapSink("uniswap_swaps.ndjson"))
+        monitor.backfill(start_block, end_block, pipeline=pipeline)
+        pipeline.close()
+    elif "--pipeline" in sys.argv:
+        # Decode on a process pool and append typed swap records to a newline-delimited JSON log
+        pipeline = SwapDecodePipeline(router_abi, uniswap_router_address, NDJSONSwapSink("uniswap_swaps.ndjson"))
+        monitor.monitor_pending_transactions(pipeline)
+    else:
+        monitor.monitor_pending_transactions()
 
 
 
@@ -1,67 +1,896 @@
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # Headless backend: charts are only written to files
 import matplotlib.pyplot as plt
 import statsmodels.api as sm
 from statsmodels.tsa.stattools import acf
 from arch import arch_model
-from sklearn.decomposition import PCA
 import time
+import copy
 import datetime
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+import shutil
+import threading
+import tracemalloc
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 import yfinance as yf
 
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at `rate` tokens per second up to `capacity` tokens.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+class MarketPanel:
+    """
+    Aligned daily panel of crypto assets and the S&P 500 macro series.
+    values[field, asset, :] is one contiguous daily series, so a column is a constant-time (memory-mapped) view.
+    """
+    fields = ['price', 'volume']
+
+    def __init__(self, dates, assets, values, macro):
+        self.dates = pd.DatetimeIndex(dates, name='date')
+        self.assets = list(assets)
+        self.values = values
+        self.macro = macro
+
+    @classmethod
+    def from_frames(cls, frames, macro):
+        """
+        Align per-asset DataFrames and the macro series once, on the union of the assets' daily dates.
+        Missing asset days stay NaN; the macro series is forward-filled over non-business days.
+        """
+        dates = pd.DatetimeIndex(sorted(set().union(*(df.index for df in frames.values()))))
+        dates = pd.date_range(dates[0], dates[-1], freq='D')
+        values = np.full((len(cls.fields), len(frames), len(dates)), np.nan)
+        for j, df in enumerate(frames.values()):
+            values[:, j, :] = df[cls.fields].reindex(dates).to_numpy(dtype=float).T
+        macro = macro.reindex(macro.index.union(dates)).ffill().reindex(dates).to_numpy(dtype=float)
+        return cls(dates, frames.keys(), values, macro)
+
+    def save(self, path):
+        """
+        Write the panel as .npy arrays plus a JSON header, replacing any previous panel at `path`.
+        The new panel is written to a staging directory first and the old one is only moved aside to `path.old`
+        for the swap, so an interrupted save leaves a complete panel at `path` or `path.old` (which load falls back to).
+        """
+        staging, previous = path + ".tmp", path + ".old"
+        if os.path.exists(staging):
+            shutil.rmtree(staging)
+        os.makedirs(staging)
+        np.save(os.path.join(staging, "values.npy"), self.values)
+        np.save(os.path.join(staging, "macro.npy"), self.macro)
+        np.save(os.path.join(staging, "dates.npy"), self.dates.values.astype('datetime64[ns]').astype(np.int64))
+        with open(os.path.join(staging, "header.json"), 'w') as f:
+            json.dump({'assets': self.assets, 'fields': self.fields}, f)
+        if os.path.exists(previous):
+            shutil.rmtree(previous)
+        if os.path.exists(path):
+            os.replace(path, previous)
+        os.replace(staging, path)
+        shutil.rmtree(previous, ignore_errors=True)
+
+    @staticmethod
+    def remove(path):
+        """
+        Delete the panel at `path`, including a panel left at `path.old` by an interrupted save.
+        """
+        for directory in (path, path + ".old"):
+            shutil.rmtree(directory, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        if not os.path.exists(path) and os.path.exists(path + ".old"):
+            path = path + ".old"
+        with open(os.path.join(path, "header.json")) as f:
+            header = json.load(f)
+        dates = pd.to_datetime(np.load(os.path.join(path, "dates.npy")))
+        values = np.load(os.path.join(path, "values.npy"), mmap_mode=mmap_mode)
+        macro = np.load(os.path.join(path, "macro.npy"), mmap_mode=mmap_mode)
+        return cls(dates, header['assets'], values, macro)
+
+    def column(self, asset, field):
+        return self.values[self.fields.index(field), self.assets.index(asset)]
+
+    def frame(self, asset):
+        """
+        DataFrame of one asset over the days it has a price.
+        """
+        df = pd.DataFrame({field: self.column(asset, field) for field in self.fields}, index=self.dates)
+        return df[df['price'].notna()]
+
+class IncrementalCorrelation:
+    """
+    Correlation matrix of a stream of daily return vectors, updated in O(assets^2) per day.
+    With `window`, pairwise-complete sums over the last `window` days are kept (adding the new day and removing
+    the oldest), as pandas' rolling(window, min_periods=2).corr(); with `halflife`, pairwise-complete exponentially
+    weighted means, variances and covariances are kept instead, starting from each pair's first observation, as
+    pandas' ewm(halflife, adjust=False, ignore_na=True).corr(). Missing returns (NaN) leave the affected pairs
+    unchanged.
+    """
+    def __init__(self, n_assets, window=None, halflife=None):
+        if (window is None) == (halflife is None):
+            raise ValueError("Specify exactly one of window or halflife.")
+        self.window = window
+        if window is not None:
+            self.rows = deque()
+            self.count = np.zeros((n_assets, n_assets))
+            self.sum_x = np.zeros((n_assets, n_assets))
+            self.sum_xx = np.zeros((n_assets, n_assets))
+            self.sum_xy = np.zeros((n_assets, n_assets))
+        else:
+            # mean[i, j] and var[i, j] are asset i's over the days both i and j were observed
+            self.alpha = 1 - 0.5 ** (1 / halflife)
+            self.mean = np.zeros((n_assets, n_assets))
+            self.var = np.zeros((n_assets, n_assets))
+            self.cov = np.zeros((n_assets, n_assets))
+            self.seen = np.zeros((n_assets, n_assets), dtype=bool)
+
+    def _accumulate(self, returns, sign):
+        observed = np.isfinite(returns)
+        if observed.all():
+            # A fully observed day adds to every pair, so only the cross products need an outer product
+            self.count += sign
+            self.sum_x += sign * returns[:, None]
+            self.sum_xx += sign * (returns * returns)[:, None]
+            self.sum_xy += np.multiply.outer(sign * returns, returns)
+            return
+        x = np.where(observed, returns, 0.0)
+        o = observed.astype(float)
+        self.count += sign * np.outer(o, o)
+        self.sum_x += sign * np.outer(x, o)
+        self.sum_xx += sign * np.outer(x * x, o)
+        self.sum_xy += sign * np.outer(x, x)
+
+    def update(self, returns):
+        returns = np.asarray(returns, dtype=float)
+        if self.window is not None:
+            self._accumulate(returns, 1)
+            self.rows.append(returns)
+            if len(self.rows) > self.window:
+                self._accumulate(self.rows.popleft(), -1)
+            return
+        observed = np.isfinite(returns)
+        both = np.outer(observed, observed)
+        update = both & self.seen
+        x = np.where(observed, returns, 0.0)[:, None]
+        diff = np.where(update, x - self.mean, 0.0)
+        self.mean = np.where(update, self.mean + self.alpha * diff, np.where(both, x, self.mean))
+        self.var = np.where(update, (1 - self.alpha) * (self.var + self.alpha * diff ** 2), self.var)
+        self.cov = np.where(update, (1 - self.alpha) * (self.cov + self.alpha * diff * diff.T), self.cov)
+        self.seen |= both
+
+    def correlation(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if self.window is not None:
+                # Built in place, since this runs every day on assets x assets arrays
+                n = self.count
+                correlation = n * self.sum_xy
+                correlation -= self.sum_x * self.sum_x.T
+                variance = n * self.sum_xx
+                variance -= self.sum_x * self.sum_x
+                variance *= variance.T
+                np.sqrt(variance, out=variance)
+                correlation /= variance
+                correlation[n < 2] = np.nan
+                return correlation
+            return np.where(self.seen, self.cov / np.sqrt(self.var * self.var.T), np.nan)
+
+FACTORS = ['volatility_clustering', 'liquidity', 'macro']
+
+def _column_scale(X, mask):
+    """
+    Root-mean-square of every design column over the rows in use; regressions run on scaled columns so the
+    large liquidity values do not swamp the normal equations.
+    """
+    scale = np.sqrt((X ** 2).sum(axis=1) / np.maximum(mask.sum(axis=1), 1)[:, None])
+    scale[scale == 0] = 1.0
+    return scale
+
+def batched_ols(X, y, mask):
+    """
+    Solve a stack of least-squares regressions at once with a batched QR factorization.
+    X is (assets, dates, k), y is (assets, dates) and mask marks the rows each regression uses.
+    Returns coefficients and standard errors (assets, k), R-squared (assets,) and the rank of each design (assets,).
+    Rank-deficient designs (an all-zero or collinear factor) fall back to the minimum-norm least-squares solution
+    of that asset alone (in scaled columns), which has the same fitted values as statsmodels' pinv fit.
+    """
+    X = np.where(mask[..., None], X, 0.0)
+    y = np.where(mask, y, 0.0)
+    scale = _column_scale(X, mask)
+    scaled = X / scale[:, None, :]
+    Q, R = np.linalg.qr(scaled)
+
+    # The singular values of R are those of the scaled design; cut them off like lstsq's default rcond
+    n, k = mask.sum(axis=1), X.shape[2]
+    singular = np.linalg.svd(R, compute_uv=False)
+    rank = (singular > singular[:, :1] * max(X.shape[1], k) * np.finfo(float).eps).sum(axis=1)
+    full = rank == k
+    coef, R_inv = np.empty((len(X), k)), np.empty_like(R)
+    if full.any():
+        coef[full] = np.linalg.solve(R[full], np.einsum('atk,at->ak', Q[full], y[full])[..., None])[..., 0]
+        R_inv[full] = np.linalg.inv(R[full])
+    for j in np.flatnonzero(~full):
+        coef[j] = np.linalg.lstsq(scaled[j], y[j], rcond=None)[0]
+        R_inv[j] = np.linalg.pinv(R[j])
+    coef /= scale
+
+    residuals = np.where(mask, y - np.einsum('atk,ak->at', X, coef), 0.0)
+    rss = (residuals ** 2).sum(axis=1)
+    tss = (np.where(mask, y - (y.sum(axis=1) / n)[:, None], 0.0) ** 2).sum(axis=1)
+    covariance = (rss / (n - rank))[:, None, None] * (R_inv @ np.swapaxes(R_inv, 1, 2))
+    stderr = np.sqrt(np.diagonal(covariance, axis1=1, axis2=2)) / scale
+    return coef, stderr, 1 - rss / tss, rank
+
+def rolling_ols(X, y, mask, window=None, min_periods=None):
+    """
+    Rolling (`window` days) or expanding (window=None) coefficients for a stack of regressions.
+    The normal equations are updated with one rank-one term per day entering (and leaving) the window instead of
+    refitting every window. Returns a (dates, assets, k) array, NaN until `min_periods` rows are in the window.
+    """
+    n_assets, n_dates, k = X.shape
+    min_periods = min_periods or k + 1
+    scale = _column_scale(np.where(mask[..., None], X, 0.0), mask)
+    X = np.where(mask[..., None], X, 0.0) / scale[:, None, :]
+    y = np.where(mask, y, 0.0)
+
+    xtx = np.zeros((n_assets, k, k))
+    xty = np.zeros((n_assets, k))
+    count = np.zeros(n_assets)
+    coef = np.full((n_dates, n_assets, k), np.nan)
+    for t in range(n_dates):
+        xtx += X[:, t, :, None] * X[:, t, None, :]
+        xty += X[:, t] * y[:, t, None]
+        count += mask[:, t]
+        if window is not None and t >= window:
+            xtx -= X[:, t - window, :, None] * X[:, t - window, None, :]
+            xty -= X[:, t - window] * y[:, t - window, None]
+            count -= mask[:, t - window]
+        ready = count >= min_periods
+        if ready.any():
+            try:
+                solved = np.linalg.solve(xtx[ready], xty[ready][..., None])[..., 0]
+            except np.linalg.LinAlgError:
+                solved = (np.linalg.pinv(xtx[ready]) @ xty[ready][..., None])[..., 0]
+            coef[t, ready] = solved / scale[ready]
+    return coef
+
+class StreamingPCA:
+    """
+    PCA from running moments (row count, mean and scatter matrix) of a stream of feature rows.
+    Adding rows costs O(features^2) each; chunks are merged with Chan's parallel update and `remove` takes rows back
+    out for rolling windows. Like sklearn's PCA, features are centred but not scaled. A saved state may also carry
+    `rows`, the (asset index into `assets`, day number, features...) rows still in the moments grouped by asset, so
+    that a later run can take out the days that left the data; they are kept in a .npy file next to the JSON moments.
+    """
+    def __init__(self, n_features, n_components=None):
+        self.n_components = n_components or n_features
+        self.count = 0
+        self.mean = np.zeros(n_features)
+        self.scatter = np.zeros((n_features, n_features))
+        self.assets = []
+        self.rows = np.empty((0, 2 + n_features))
+
+    @staticmethod
+    def _moments(rows):
+        rows = np.asarray(rows, dtype=float)
+        rows = rows[np.isfinite(rows).all(axis=1)]
+        if not len(rows):
+            return 0, None, None
+        mean = rows.mean(axis=0)
+        centred = rows - mean
+        return len(rows), mean, centred.T @ centred
+
+    def partial_fit(self, rows):
+        count, mean, scatter = self._moments(rows)
+        if not count:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.scatter += scatter + np.outer(delta, delta) * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+
+    def remove(self, rows):
+        count, mean, scatter = self._moments(rows)
+        if not count:
+            return
+        remaining = self.count - count
+        if remaining <= 0:
+            self.count, self.mean, self.scatter = 0, np.zeros_like(self.mean), np.zeros_like(self.scatter)
+            return
+        remaining_mean = (self.count * self.mean - count * mean) / remaining
+        delta = mean - remaining_mean
+        self.scatter -= scatter + np.outer(delta, delta) * remaining * count / self.count
+        self.mean, self.count = remaining_mean, remaining
+
+    def _eigen(self):
+        values, vectors = np.linalg.eigh(self.scatter / (self.count - 1))
+        order = np.argsort(values)[::-1]
+        return np.clip(values[order], 0, None), vectors[:, order].T
+
+    def explained_variance_ratio(self):
+        values, _ = self._eigen()
+        return values[:self.n_components] / values.sum()
+
+    def components(self):
+        return self._eigen()[1][:self.n_components]
+
+    def to_dict(self):
+        return {'n_components': self.n_components, 'count': self.count, 'mean': self.mean.tolist(),
+                'scatter': self.scatter.tolist(), 'assets': self.assets}
+
+    @classmethod
+    def from_dict(cls, state):
+        pca = cls(len(state['mean']), state['n_components'])
+        pca.count = state['count']
+        pca.mean = np.array(state['mean'])
+        pca.scatter = np.array(state['scatter'])
+        pca.assets = state['assets']
+        return pca
+
+    @staticmethod
+    def rows_path(path):
+        return os.path.splitext(path)[0] + "_rows.npy"
+
+    def save(self, path):
+        # Write to temporary files first so an interrupted run never leaves a truncated state
+        with open(path + ".tmp", 'w') as f:
+            json.dump(self.to_dict(), f)
+        with open(self.rows_path(path) + ".tmp", 'wb') as f:
+            np.save(f, self.rows)
+        os.replace(self.rows_path(path) + ".tmp", self.rows_path(path))
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        with open(path) as f:
+            pca = cls.from_dict(json.load(f))
+        pca.rows = np.load(cls.rows_path(path), mmap_mode=mmap_mode)
+        return pca
+
+def _process_pool(workers, **kwargs):
+    """
+    Process pool whose workers come from a fork server (spawned where there is none) rather than a plain fork.
+    The pools are started from StagePipeline's threads, and forking a multi-threaded process can deadlock the child
+    on a lock another thread held. Workers import the script afresh, so it must be run as a script or importable.
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(method), **kwargs)
+
+STRESS_STATISTICS = ['mean_return', 'var', 'es', 'worst_return']
+
+_stress_panel = None
+
+def _init_stress_worker(returns, exposures, mask):
+    global _stress_panel
+    _stress_panel = (returns, exposures, mask)
+
+def _stress_chunk(shocks, alpha):
+    """
+    Stressed return distribution of every asset under a chunk of joint factor shocks.
+    Each shock (one row per scenario) moves the factors by a relative amount, shifting returns by
+    sum_f beta_f * factor_f * shock_f on every day. Returns a (scenarios, assets, statistics) array of mean return,
+    VaR and expected shortfall at `alpha` (as positive losses) and worst return over the history.
+    """
+    returns, exposures, mask = _stress_panel
+    n_assets, n_dates, n_factors = exposures.shape
+    stressed = (shocks @ exposures.reshape(-1, n_factors).T).reshape(len(shocks), n_assets, n_dates)
+    stressed += returns
+    if not mask.all():
+        stressed[:, ~mask] = np.inf  # Missing days are pushed past every order statistic
+
+    n = mask.sum(axis=1)
+    results = np.empty((len(shocks), n_assets, len(STRESS_STATISTICS)))
+    results[..., 0] = (shocks @ exposures.sum(axis=1).T + returns.sum(axis=1)) / n
+    # Only the lower tail is needed: assets with the same number of valid days are partitioned once (linear time)
+    # at the upper quantile neighbour, and just the tail in front of it is ordered further
+    for count in np.unique(n):
+        group = n == count
+        position = (count - 1) * (1 - alpha)
+        lower = int(np.floor(position))
+        upper = min(lower + 1, count - 1)
+        block = stressed if group.all() else stressed[:, group]
+        block.partition(upper, axis=2)
+        tail = np.partition(block[..., :upper + 1], sorted({0, lower}), axis=2)
+        quantile = tail[..., lower] + (position - lower) * (block[..., upper] - tail[..., lower])
+        results[:, group, 1] = -quantile
+        results[:, group, 2] = -tail[..., :lower + 1].mean(axis=2)
+        results[:, group, 3] = tail[..., 0]
+    return results
+
+def simulate_shocks(n_scenarios, volatility=(0.5, 0.5, 0.5), correlation=None, seed=None):
+    """
+    Draw joint relative shocks to the factors (volatility_clustering, liquidity, macro) from a multivariate normal
+    with the given per-factor volatilities and correlation matrix. Shocks are floored at -1 (a factor cannot fall by
+    more than 100%).
+    """
+    volatility = np.asarray(volatility, dtype=float)
+    correlation = np.eye(len(volatility)) if correlation is None else np.asarray(correlation, dtype=float)
+    covariance = correlation * np.outer(volatility, volatility)
+    shocks = np.random.default_rng(seed).multivariate_normal(np.zeros(len(volatility)), covariance, size=n_scenarios)
+    return np.maximum(shocks, -1.0)
+
+def _garch_mode(returns, cached, refit_after):
+    """
+    How _fit_garch will update an asset: 'filter' re-runs the variance recursion with the cached parameters when
+    the sample still contains the last fitted day and at most `refit_after` observations followed it; 'warm'
+    refits starting from the cached parameters; 'cold' fits from arch's default starting values.
+    """
+    if cached is None:
+        return 'cold'
+    last_fitted = pd.Timestamp(cached['last_date'])
+    if last_fitted in returns.index and (returns.index > last_fitted).sum() <= refit_after:
+        return 'filter'
+    return 'warm'
+
+def _fit_garch(asset, returns, cached, refit_after):
+    """
+    Fit (or update) a GARCH(1,1) for one asset's returns in the mode chosen by _garch_mode and report how it was done.
+    """
+    start = time.perf_counter()
+    garch_model = arch_model(returns, vol='Garch', p=1, q=1)
+    params = None if cached is None else np.asarray(cached['params'])
+    mode = _garch_mode(returns, cached, refit_after)
+    if mode == 'filter':
+        garch_fit = garch_model.fix(params)
+        converged, iterations, last_date = True, 0, cached['last_date']
+    else:
+        garch_fit = garch_model.fit(disp='off', starting_values=params)
+        converged = garch_fit.convergence_flag == 0
+        iterations = garch_fit.optimization_result.nit
+        last_date = str(returns.index[-1])
+    return {
+        'asset': asset,
+        'conditional_volatility': garch_fit.conditional_volatility,
+        'params': np.asarray(garch_fit.params).tolist(),
+        'last_date': last_date,
+        'mode': mode,
+        'converged': bool(converged),
+        'iterations': int(iterations),
+        'fit_seconds': time.perf_counter() - start
+    }
+
+# Chart content hashes of this script (each script keeps its own file)
+CHART_HASH_PATH = "chart_hashes_risk.json"
+
+def _chart_digest(plot_function, args):
+    # Content hash of a chart: its drawing code and input data
+    code = plot_function.__code__
+    digest = hashlib.sha1(code.co_code)
+    digest.update(repr([const for const in code.co_consts if not hasattr(const, "co_code")]).encode())
+    digest.update(pickle.dumps(args, protocol=4))
+    return digest.hexdigest()
+
+def _render_chart(filename, plot_function, args):
+    fig = plot_function(*args)
+    fig.savefig(filename)
+    plt.close(fig)
+
+class ChartRenderer:
+    # Deferred, headless chart rendering, kept identical in every script that draws charts.
+    # submit() only queues a chart and render() draws the queued charts on a process pool of `workers`
+    # started through _process_pool (fork server or spawn, never a plain fork).
+    # A chart whose file exists and whose content hash matches the one recorded in `hash_path` is skipped;
+    # with hash_path=None every chart is drawn and nothing is recorded.
+    def __init__(self, workers=None, hash_path=CHART_HASH_PATH):
+        self.workers = workers or os.cpu_count()
+        self.hash_path = hash_path
+        self.hashes = {}
+        if hash_path and os.path.exists(hash_path):
+            with open(hash_path) as f:
+                self.hashes = json.load(f)
+        self.jobs = []
+        self.skipped = 0
+
+    def submit(self, filename, plot_function, *args):
+        # Queue a chart unless its file exists and its drawing code and inputs are unchanged
+        key = _chart_digest(plot_function, args)
+        if self.hashes.get(filename) == key and os.path.exists(filename):
+            self.skipped += 1
+            return
+        self.jobs = [job for job in self.jobs if job[0] != filename] + [(filename, plot_function, args, key)]
+
+    def render(self):
+        jobs, self.jobs = self.jobs, []
+        start = time.perf_counter()
+        if self.workers > 1 and len(jobs) > 1:
+            with _process_pool(min(self.workers, len(jobs))) as executor:
+                list(executor.map(_render_chart, *zip(*[job[:3] for job in jobs])))
+        else:
+            for filename, plot_function, args, _ in jobs:
+                _render_chart(filename, plot_function, args)
+        if jobs and self.hash_path:
+            self.hashes.update({job[0]: job[3] for job in jobs})
+            with open(self.hash_path + ".tmp", "w") as f:
+                json.dump(self.hashes, f)
+            os.replace(self.hash_path + ".tmp", self.hash_path)
+        stats = {"rendered": len(jobs), "skipped": self.skipped, "seconds": time.perf_counter() - start}
+        self.skipped = 0
+        return stats
+
+def _plot_macro_sensitivity(asset, dates, returns, macro):
+    fig = plt.figure(figsize=(12, 8))
+    plt.plot(dates, returns, label=f'{asset} return')
+    plt.plot(dates, macro, label=f'S&P 500 return')
+    plt.xlabel('Date')
+    plt.ylabel('Return')
+    plt.title(f'Macro Sensitivity of {asset} Over Time')
+    plt.legend()
+    return fig
+
+def _plot_correlation_matrix(correlation_matrix, labels):
+    fig = plt.figure(figsize=(10, 8))
+    plt.imshow(correlation_matrix, cmap='viridis', interpolation='none')
+    plt.colorbar()
+    plt.xticks(range(len(labels)), labels, rotation=90)
+    plt.yticks(range(len(labels)), labels)
+    plt.title('Crypto Asset Correlations')
+    return fig
+
+def _plot_explained_variance(explained_variance):
+    fig = plt.figure(figsize=(10, 6))
+    plt.bar(range(1, len(explained_variance) + 1), explained_variance, tick_label=[f'PC{i}' for i in range(1, len(explained_variance) + 1)])
+    plt.xlabel('Principal Components')
+    plt.ylabel('Explained Variance Ratio')
+    plt.title('Explained Variance by Principal Components')
+    return fig
+
+def _plot_stress_test(asset, scenario, dates, returns, stressed_returns):
+    fig = plt.figure(figsize=(10, 6))
+    plt.plot(dates, returns, label='Original Returns')
+    plt.plot(dates, stressed_returns, label='Stressed Returns', linestyle='--')
+    plt.title(f'Stress Test for {asset} - Impact of {scenario}')
+    plt.xlabel('Date')
+    plt.ylabel('Return')
+    plt.legend()
+    return fig
+
+def _content_digest(value, digest):
+    # Feed a content hash of nested dicts/lists of pandas objects, arrays and plain values into `digest`
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        labels = value.columns if isinstance(value, pd.DataFrame) else [value.name]
+        digest.update(repr((type(value).__name__, list(labels), [str(d) for d in np.atleast_1d(value.dtypes)])).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(repr((value.dtype.str, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        for key in sorted(value, key=str):
+            digest.update(repr(key).encode())
+            _content_digest(value[key], digest)
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}{len(value)}".encode())
+        for item in value:
+            _content_digest(item, digest)
+    elif isinstance(value, (bytes, str, int, float, bool, type(None))):
+        digest.update(repr(value).encode())
+    else:
+        digest.update(pickle.dumps(value, protocol=4))
+
+def _code_digest(code, digest):
+    # Feed a function's bytecode, names and constants (recursing into nested functions) into `digest`, so editing
+    # e.g. rolling(window=30) to rolling(window=60) changes it; frozenset constants are sorted to be stable across runs
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            _code_digest(const, digest)
+        else:
+            digest.update(repr(sorted(const, key=repr) if isinstance(const, frozenset) else const).encode())
+
+def _files_digest(paths, digest):
+    # Feed the contents of side-input files and directories (walked in sorted order) into `digest`
+    for path in paths:
+        digest.update(repr(path).encode())
+        files = [path] if os.path.isfile(path) else sorted(
+            os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        for name in files:
+            digest.update(repr(os.path.relpath(name, path)).encode())
+            with open(name, 'rb') as f:
+                digest.update(f.read())
+
+def _source_digest():
+    # Digest of this module's source, so editing helpers outside the stage methods also invalidates cached stages
+    try:
+        with open(__file__, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except (NameError, OSError):
+        return None
+
+_SOURCE_DIGEST = _source_digest()
+
+def _resident_memory():
+    # Resident set size of this process in bytes (Linux)
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+def _timed(compute, inputs):
+    start = time.perf_counter()
+    output = compute(inputs)
+    return output, time.perf_counter() - start
+
+class StagePipeline:
+    """
+    Runs named stages as a dependency DAG: a stage starts as soon as every stage it depends on has finished, and
+    independent stages run concurrently on a thread pool of `workers`.
+    A stage is split into prepare() -> inputs and apply(output), both run on the coordinating thread, and
+    compute(inputs) -> output, which runs on the pool and must only use its inputs. Inline stages run compute() on
+    the coordinating thread as well. A cached stage's output is pickled under `cache_dir`, keyed by the content
+    hash of its inputs; on a hit compute() is skipped and the stored output applied. The contents of a stage's side
+    `files` (state it loads and rewrites, e.g. a fit cache) are part of the key too: looked up as they are before
+    the stage runs and stored as they are after it, so an unchanged rerun hits straight away.
+    Per stage, wall time, peak memory and cache hits are reported. Memory is the peak resident memory above the
+    level at the stage start, sampled while the stage runs (traced Python allocations where /proc is unavailable);
+    it includes concurrently running stages but not worker processes.
+    """
+    def __init__(self, workers=4, cache_dir="stage_cache", profile_memory=True, sample_interval=0.005):
+        self.workers = workers
+        self.cache_dir = cache_dir
+        self.profile_memory = profile_memory
+        self.sample_interval = sample_interval
+        self.stages = {}
+
+    def add(self, name, compute, depends_on=(), prepare=None, apply=None, cache=False, inline=False, files=()):
+        missing = [dependency for dependency in depends_on if dependency not in self.stages]
+        if missing:
+            raise ValueError(f"Stage {name} depends on unknown stages {missing}.")
+        self.stages[name] = {'compute': compute, 'depends_on': tuple(depends_on), 'prepare': prepare,
+                             'apply': apply, 'cache': cache, 'inline': inline, 'files': tuple(files)}
+
+    @staticmethod
+    def _key(inputs_key, files):
+        digest = hashlib.sha1(inputs_key.encode())
+        _files_digest(files, digest)
+        return digest.hexdigest()
+
+    def _cache_path(self, name, key):
+        return os.path.join(self.cache_dir, f"{name}-{key}.pkl")
+
+    def _store(self, name, key, output):
+        # Keep only the latest output of each stage; write to a temporary file first so a crash never leaves a partial entry
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._cache_path(name, key)
+        with open(path + ".tmp", 'wb') as f:
+            pickle.dump(output, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+        for entry in os.listdir(self.cache_dir):
+            if entry.startswith(f"{name}-") and entry != os.path.basename(path):
+                os.remove(os.path.join(self.cache_dir, entry))
+
+    def _sample_memory(self, memory, peaks, stop):
+        # Peak memory of every running stage, sampled while it runs
+        while not stop.wait(self.sample_interval):
+            current = memory()
+            for peak in list(peaks.values()):
+                peak[1] = max(peak[1], current)
+
+    def run(self, report_path=None):
+        """
+        Run every stage and return the report; with `report_path`, it is also written there as JSON.
+        """
+        memory, started_tracing = None, False
+        if self.profile_memory:
+            if os.path.exists("/proc/self/statm"):
+                memory = _resident_memory
+            else:
+                started_tracing = not tracemalloc.is_tracing()
+                if started_tracing:
+                    tracemalloc.start()
+                memory = lambda: tracemalloc.get_traced_memory()[0]
+        peaks, stop = {}, threading.Event()
+        if memory is not None:
+            threading.Thread(target=self._sample_memory, args=(memory, peaks, stop), daemon=True).start()
+
+        report, done, running = {}, set(), {}
+        pending = list(self.stages)
+        run_start = time.perf_counter()
+
+        def begin(name):
+            report[name] = {'started_seconds': time.perf_counter() - run_start, 'wall_seconds': 0.0, 'cache': 'off'}
+            if memory is not None:
+                current = memory()
+                peaks[name] = [current, current]
+
+        def finish(name, stage, inputs_key, output, compute_seconds, hit):
+            start = time.perf_counter()
+            if stage['apply'] is not None:
+                stage['apply'](output)
+            if stage['cache'] and not hit:
+                # Keyed on the side files the stage left behind, which the next run will find
+                self._store(name, self._key(inputs_key, stage['files']), output)
+            entry = report[name]
+            entry['wall_seconds'] += compute_seconds + time.perf_counter() - start
+            if memory is not None:
+                baseline, peak = peaks.pop(name)
+                peak = max(peak, memory())
+                entry['peak_memory_mb'] = (peak - baseline) / 1e6
+            done.add(name)
+
+        try:
+            with ThreadPoolExecutor(self.workers) as executor:
+                while pending or running:
+                    ready = [name for name in pending if set(self.stages[name]['depends_on']) <= done]
+                    for name in ready:
+                        pending.remove(name)
+                        stage = self.stages[name]
+                        begin(name)
+                        start = time.perf_counter()
+                        inputs = stage['prepare']() if stage['prepare'] is not None else None
+                        inputs_key = None
+                        if stage['cache']:
+                            digest = hashlib.sha1(name.encode())
+                            _content_digest(inputs, digest)
+                            inputs_key = digest.hexdigest()
+                            path = self._cache_path(name, self._key(inputs_key, stage['files']))
+                            report[name]['cache'] = 'miss'
+                            if os.path.exists(path):
+                                with open(path, 'rb') as f:
+                                    output = pickle.load(f)
+                                report[name]['cache'] = 'hit'
+                                finish(name, stage, inputs_key, output, time.perf_counter() - start, hit=True)
+                                continue
+                        report[name]['wall_seconds'] = time.perf_counter() - start
+                        if stage['inline']:
+                            output, seconds = _timed(stage['compute'], inputs)
+                            finish(name, stage, inputs_key, output, seconds, hit=False)
+                        else:
+                            running[executor.submit(_timed, stage['compute'], inputs)] = (name, stage, inputs_key)
+                    if ready:
+                        continue  # Finished stages may have released others
+                    if not running:
+                        raise ValueError(f"Stages {pending} can never run.")
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        name, stage, inputs_key = running.pop(future)
+                        output, seconds = future.result()
+                        finish(name, stage, inputs_key, output, seconds, hit=False)
+        finally:
+            stop.set()
+            if started_tracing:
+                tracemalloc.stop()
+
+        lookups = [entry['cache'] for entry in report.values() if entry['cache'] != 'off']
+        result = {
+            'total_seconds': time.perf_counter() - run_start,
+            'workers': self.workers,
+            'cache_hit_rate': lookups.count('hit') / len(lookups) if lookups else None,
+            'stages': report,
+        }
+        if report_path:
+            with open(report_path, 'w') as f:
+                json.dump(result, f, indent=2)
+        return result
+
 class CryptoRiskAnalysis:
-    def __init__(self, assets, start_date, end_date):
+    def __init__(self, assets, start_date, end_date, cache_dir="market_data_cache", max_workers=8,
+                 coingecko_url="https://api.coingecko.com/api/v3/coins/", coingecko_requests_per_second=0.5, chart_workers=None):
         self.assets = assets
         self.start_date = max(start_date, pd.Timestamp.now() - pd.Timedelta(days=365))
         self.end_date = min(end_date, pd.Timestamp.now())
         self.data = {}
         self.regression_coefficients = {}
-        
-    def fetch_data_to_csv(self):
+
+        # Market-data fetch layer: shared keep-alive session, per-provider rate limit and on-disk cache
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.coingecko_url = coingecko_url
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers))
+        self.session.mount("http://", HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers))
+        self.rate_limiters = {'coingecko': TokenBucket(coingecko_requests_per_second, 5)}
+
+        # Charts are queued by the plotting steps and drawn by render_charts()
+        self.charts = ChartRenderer(chart_workers)
+
+    def _fetch_coingecko(self, asset, start, end):
         """
-        Fetch historical price and volume data for the specified crypto assets using CoinGecko API.
-        Fetch daily close price of S&P 500 index from Yahoo Finance API.
+        Fetch price and volume of one asset between two timestamps, reduced to one observation per day.
         Retry failed requests up to 3 times with exponential backoff.
         """
-        base_url = "https://api.coingecko.com/api/v3/coins/"
-        data = {}
+        url = f"{self.coingecko_url}{asset}/market_chart/range"
+        params = {
+            'vs_currency': 'usd',
+            'from': int(start.timestamp()),
+            'to': int(end.timestamp())
+        }
+        for attempts in range(1, 4):
+            self.rate_limiters['coingecko'].acquire()
+            response = self.session.get(url, params=params, timeout=30)
+            if response.status_code == 200:
+                data = response.json()
+                df = pd.DataFrame(
+                    {
+                        'timestamp': [x[0] for x in data['prices']],
+                        'price': [x[1] for x in data['prices']],
+                        'volume': [x[1] for x in data['total_volumes']]
+                    }
+                )
+                df['date'] = pd.to_datetime(df['timestamp'], unit='ms')
+                # Short ranges come back hourly, so keep the first observation of each day stamped at midnight
+                # to make incremental tails line up with full daily history
+                df = df.groupby(df['date'].dt.normalize()).first().drop(columns='date')
+                df.index.name = 'date'
+                return df
+            print(f"Attempt {attempts} failed to fetch data for {asset}. Status Code: {response.status_code}. Response: {response.text}. Retrying...")
+            time.sleep(2 ** attempts)  # Exponential backoff
+        raise ConnectionError(f"Failed to fetch data for {asset} after 3 attempts.")
 
-        # Fetch crypto data
-        for asset in self.assets:
-            success = False
-            attempts = 0
-            while not success and attempts < 3:
-                url = f"{base_url}{asset}/market_chart/range"
-                params = {
-                    'vs_currency': 'usd',
-                    'from': int(self.start_date.timestamp()),
-                    'to': int(self.end_date.timestamp())
-                }
-                response = requests.get(url, params=params)
-                if response.status_code == 200:
-                    data = response.json()
-                    self.data[asset] = pd.DataFrame(
-                        {
-                            'timestamp': [x[0] for x in data['prices']],
-                            'price': [x[1] for x in data['prices']],
-                            'volume': [x[1] for x in data['total_volumes']]
-                        }
-                    )
-                    self.data[asset]['date'] = pd.to_datetime(self.data[asset]['timestamp'], unit='ms')
-                    self.data[asset].set_index('date', inplace=True)
-                    success = True
-                    # Save the DataFrame to a CSV file
-                    self.data[asset].to_csv(asset+".csv")
+    def _fetch_asset_cached(self, asset):
+        """
+        Return daily data for an asset over [start_date, end_date], downloading only the days missing from the cache.
+        """
+        cache_path = os.path.join(self.cache_dir, 'coingecko', f"{asset}.pkl")
+        meta_path = os.path.join(self.cache_dir, 'coingecko', f"{asset}.json")
+        cached = None
+        if os.path.exists(cache_path) and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            # The cache is only reusable if it starts no later than the requested range
+            if pd.Timestamp(meta['start']) <= self.start_date:
+                cached = pd.read_pickle(cache_path)
+                cached_start = pd.Timestamp(meta['start'])
 
-                else:
-                    attempts += 1
-                    print(f"Attempt {attempts} failed to fetch data for {asset}. Status Code: {response.status_code}. Response: {response.text}. Retrying...")
-                    time.sleep(2 ** attempts)  # Exponential backoff
+        if cached is None or cached.empty:
+            df = self._fetch_coingecko(asset, self.start_date, self.end_date)
+            cached_start = self.start_date
+        else:
+            # Incremental refresh: only download the days after the last cached one
+            next_day = cached.index[-1] + pd.Timedelta(days=1)
+            df = cached
+            if next_day <= self.end_date:
+                tail = self._fetch_coingecko(asset, next_day, self.end_date)
+                df = pd.concat([cached, tail[tail.index >= next_day]])
 
-            if not success:
-                print(f"Failed to fetch data for {asset} after 3 attempts.")
-                self.data[asset] = None
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        df.to_pickle(cache_path)
+        with open(meta_path, 'w') as f:
+            json.dump({'start': str(cached_start), 'end': str(self.end_date)}, f)
+        return df[(df.index >= self.start_date.normalize()) & (df.index <= self.end_date)]
+
+    def fetch_data(self):
+        """
+        Fetch historical price and volume data for the specified crypto assets using CoinGecko API.
+        Fetch daily close price of S&P 500 index from Yahoo Finance API.
+        Assets are fetched concurrently on a shared session within CoinGecko's rate limit, and only the days
+        missing from the on-disk cache are downloaded.
+        """
+        def fetch(asset):
+            try:
+                return self._fetch_asset_cached(asset)
+            except (requests.exceptions.RequestException, ConnectionError, KeyError, ValueError) as e:
+                print(e)
+                return None
+
+        # Fetch crypto data
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for asset, df in zip(self.assets, executor.map(fetch, self.assets)):
+                self.data[asset] = df
 
         # Fetch S&P 500 data from Yahoo Finance API
         # Define the indices and the ticker symbol
@@ -75,15 +904,56 @@ class CryptoRiskAnalysis:
         # Retrieve data for each index
         for index_name, ticker in indices.items():
             # Download the historical data
-            data_index = yf.download(ticker, start=self.start_date, end=end_date)
+            data_index = yf.download(ticker, start=self.start_date, end=self.end_date)
             # Extract the 'Close' column and rename it to the index name
             df_index[index_name] = data_index['Close']
-            df_index.index = [df_index.index[i].strftime('%Y-%m-%d') for i in range(len(df_index.index))]
+            df_index.index = pd.DatetimeIndex(df_index.index).normalize()
             df_index.index.name = 'date'
-        
-        # Save the DataFrame to a CSV file
+        self.data['sp500'] = df_index
+
+    def fetch_data_to_csv(self):
+        """
+        Fetch the market data and save each crypto asset and the S&P 500 to its own CSV file.
+        """
+        self.fetch_data()
+        for asset in self.assets:
+            if self.data[asset] is not None:
+                # Save the DataFrame to a CSV file
+                self.data[asset].to_csv(asset+".csv")
+        df_index = self.data['sp500'].copy()
+        df_index.index = df_index.index.strftime('%Y-%m-%d')
         df_index.to_csv('sp500.csv')
 
+    def save_panel(self, path="market_panel"):
+        """
+        Align the fetched crypto assets and the S&P 500 on one daily calendar and save them as a MarketPanel.
+        If no asset could be fetched, the panel from a previous run is removed and the run is aborted, so that
+        read_panel_data never analyses stale data.
+        """
+        frames = {asset: self.data[asset] for asset in self.assets if self.data.get(asset) is not None}
+        if not frames:
+            MarketPanel.remove(path)
+            raise RuntimeError("No crypto asset data was fetched; removed the stale market panel instead of saving it.")
+        panel = MarketPanel.from_frames(frames, self.data['sp500'].iloc[:, 0])
+        panel.save(path)
+        return panel
+
+    def read_panel_data(self, path="market_panel"):
+        """
+        Load the aligned MarketPanel (memory-mapped) into per-asset DataFrames for the analysis steps.
+        """
+        try:
+            panel = MarketPanel.load(path)
+        except FileNotFoundError:
+            print(f"Market panel not found at {path}.")
+            return None
+        for asset in self.assets:
+            self.data[asset] = panel.frame(asset) if asset in panel.assets else None
+            if self.data[asset] is None:
+                print(f"No data for {asset} in the market panel.")
+        self.data['sp500'] = pd.DataFrame({'S&P 500': panel.macro}, index=panel.dates)
+        return panel
+
     def read_csv_data(self):
         assets_to_read = self.assets + ['sp500']
         for asset in assets_to_read:
@@ -104,70 +974,147 @@ class CryptoRiskAnalysis:
                 print(f"CSV file for {asset} not found at {file_path}.")
                 self.data[asset] = None
 
-        # match the dataframe index of sp500 with the dataframe index of crypto asset
-        self.data['sp500'].index = self.data['bitcoin'].index
     
+    def _crypto_assets(self):
+        return [asset for asset in self.assets if self.data.get(asset) is not None]
+
+    def _wide(self, field):
+        """
+        Dates x assets DataFrame of one field across all available crypto assets, on the union of their (sorted) dates.
+        """
+        frames = {asset: self.data[asset] for asset in self._crypto_assets()}
+        if not frames:
+            return pd.DataFrame()
+        first = next(iter(frames.values())).index
+        dates = pd.DatetimeIndex(np.unique(np.concatenate([df.index.values for df in frames.values()])), name=first.name)
+        values = np.full((len(dates), len(frames)), np.nan)
+        for j, df in enumerate(frames.values()):
+            values[np.searchsorted(dates.values, df.index.values), j] = df[field].to_numpy(dtype=float)
+        return pd.DataFrame(values, index=dates, columns=list(frames))
+
     def preprocess_data(self):
         """
         Preprocess the collected data, handle missing values, and calculate daily returns and volatility.
+        Returns, 30-day rolling volatility and macro returns are computed for all assets at once on
+        dates x assets frames; each asset then keeps only the days where all of them are available.
         """
-        for asset, df in self.data.items():
-            if asset != 'sp500' and df is not None:
-                    df['return'] = df['price'].pct_change()
-                    df['volatility'] = df['return'].rolling(window=30).std()
-                    df['macro'] = self.data['sp500'].pct_change()
-                    df.dropna(inplace=True)
+        assets = self._crypto_assets()
+        if not assets:
+            return
+        prices = self._wide('price')
+        returns = prices.pct_change(fill_method=None)
+        volatility = returns.rolling(window=30).std()
+        macro = self.data['sp500'].iloc[:, 0].pct_change().reindex(prices.index)
+
+        valid = returns.notna() & volatility.notna() & macro.notna().to_numpy()[:, None]
+        self.returns = returns.where(valid)
+        # Every asset frame is rebuilt in one go as a float block; assigning columns one by one per asset costs far
+        # more than the panel arithmetic
+        returns_values, volatility_values, macro_values = returns.to_numpy(), volatility.to_numpy(), macro.to_numpy()
+        valid_values = valid.to_numpy()
+        for j, asset in enumerate(assets):
+            df = self.data[asset]
+            values = np.full((len(prices.index), len(df.columns) + 3), np.nan)
+            values[np.searchsorted(prices.index.values, df.index.values), :len(df.columns)] = df.to_numpy(dtype=float)
+            values[:, len(df.columns):] = np.column_stack([returns_values[:, j], volatility_values[:, j], macro_values])
+            keep = valid_values[:, j] & ~np.isnan(values).any(axis=1)
+            self.data[asset] = pd.DataFrame(values[keep], index=prices.index[keep], columns=[*df.columns, 'return', 'volatility', 'macro'])
             
     def compute_liquidity(self):
         """
         Compute market liquidity for each asset, based on trading volume.
         """
-        for asset, df in self.data.items():
-            if asset != 'sp500' and df is not None:
-                    df['liquidity'] = df['volume'] / df['price']
+        assets = self._crypto_assets()
+        if not assets:
+            return
+        liquidity = self._wide('volume') / self._wide('price')
+        values = liquidity.to_numpy()
+        for j, asset in enumerate(assets):
+            df = self.data[asset]
+            column = values[np.searchsorted(liquidity.index.values, df.index.values), j]
+            self.data[asset] = pd.DataFrame(np.column_stack([df.to_numpy(dtype=float), column]), index=df.index,
+                                            columns=[*df.columns, 'liquidity'])
                 
-    def compute_volatility_clustering(self):
+    def compute_volatility_clustering(self, workers=None, refit_after=5, cache_dir="garch_cache"):
         """
         Measure volatility clustering using GARCH model parameters for each asset.
+        Fitted parameters are cached per asset: later runs warm-start from them, or only re-filter the variance path
+        when at most `refit_after` new days arrived since the last fit. The mode is decided here, so filtered
+        assets (a few milliseconds each) run in this process and a process pool is only started for refits.
+        Per-asset fit mode, time and convergence are kept in self.garch_report.
         """
+        tasks = []
         for asset, df in self.data.items():
             if asset != 'sp500' and df is not None and 'return' in df.columns:
                 returns = df['return'].dropna()
                 if len(returns) > 1:
-                    garch_model = arch_model(returns, vol='Garch', p=1, q=1)
-                    garch_fit = garch_model.fit(disp='off')
-                    df['volatility_clustering'] = garch_fit.conditional_volatility
+                    cache_path = os.path.join(cache_dir, f"{asset}.json")
+                    cached = None
+                    if os.path.exists(cache_path):
+                        with open(cache_path) as f:
+                            cached = json.load(f)
+                    tasks.append((asset, returns, cached, refit_after))
                 else:
                     df['volatility_clustering'] = np.nan
+        if not tasks:
+            return
+
+        modes = [_garch_mode(*task[1:]) for task in tasks]
+        refits = [task for task, mode in zip(tasks, modes) if mode != 'filter']
+        results = {task[0]: _fit_garch(*task) for task, mode in zip(tasks, modes) if mode == 'filter'}
+        if workers == 1 or len(refits) <= 1:
+            results.update({task[0]: _fit_garch(*task) for task in refits})
+        elif refits:
+            with _process_pool(workers) as executor:
+                results.update({result['asset']: result for result in executor.map(_fit_garch, *zip(*refits))})
+        results = [results[task[0]] for task in tasks]
+
+        os.makedirs(cache_dir, exist_ok=True)
+        for result in results:
+            self.data[result['asset']]['volatility_clustering'] = result.pop('conditional_volatility')
+            cached = {key: result[key] for key in ('params', 'last_date')}
+            with open(os.path.join(cache_dir, f"{result['asset']}.json"), 'w') as f:
+                json.dump(cached, f)
+        self.garch_report = pd.DataFrame(results).set_index('asset')[['mode', 'converged', 'iterations', 'fit_seconds']]
+        print(f"GARCH fit report:\n{self.garch_report}")
                 
     def compute_correlations(self):
         """
         Compute correlation matrices to assess dependencies among assets.
         """
-        valid_data = [df['return'] for asset, df in self.data.items() if asset != 'sp500' and df is not None and not df['return'].empty]
-        if not valid_data:
+        returns = getattr(self, 'returns', None)
+        if returns is None or returns.empty:
+            print("No valid data available for correlation computation.")
+            return pd.DataFrame()
+        returns = returns.loc[:, returns.notna().any()]
+        if returns.empty:
             print("No valid data available for correlation computation.")
             return pd.DataFrame()
-        combined_data = pd.concat(valid_data, axis=1)
-        combined_data.columns = [asset for asset in self.assets if self.data[asset] is not None and not self.data[asset]['return'].empty]
-        correlation_matrix = combined_data.corr()
+        correlation_matrix = returns.corr()
         return correlation_matrix
 
+    def iter_rolling_correlations(self, window=None, halflife=None):
+        """
+        Yield (date, correlation matrix) for every day, over a rolling `window` or with an exponential `halflife`.
+        Each day costs O(assets^2) instead of recomputing the correlation matrix from scratch.
+        """
+        returns = getattr(self, 'returns', None)
+        if returns is None or returns.empty:
+            print("No valid data available for correlation computation.")
+            return
+        tracker = IncrementalCorrelation(returns.shape[1], window=window, halflife=halflife)
+        for date, row in zip(returns.index, returns.to_numpy()):
+            tracker.update(row)
+            yield date, tracker.correlation()
+
     def plot_macro_sensitivity(self):
         """
         Plot the macro sensitivity of each asset over time.
         """
         for asset, df in self.data.items():
             if asset != 'sp500' and df is not None:
-                plt.figure(figsize=(12, 8))
-                plt.plot(df.index, df['return'], label=f'{asset} return')
-                plt.plot(df.index, df['macro'], label=f'S&P 500 return')
-                plt.xlabel('Date')
-                plt.ylabel('Return')
-                plt.title(f'Macro Sensitivity of {asset} Over Time')
-                plt.legend()
-                plt.savefig(f"Macro Sensitivity of {asset} Over Time.png")
-                plt.show()
+                self.charts.submit(f"Macro Sensitivity of {asset} Over Time.png", _plot_macro_sensitivity,
+                                   asset, df.index.values, df['return'].to_numpy(), df['macro'].to_numpy())
     
     def plot_correlations(self):
         """
@@ -177,99 +1124,397 @@ class CryptoRiskAnalysis:
         if correlation_matrix.empty:
             print("No correlation data available to plot.")
             return
-        plt.figure(figsize=(10, 8))
-        plt.imshow(correlation_matrix, cmap='viridis', interpolation='none')
-        plt.colorbar()
-        plt.xticks(range(len(correlation_matrix.columns)), correlation_matrix.columns, rotation=90)
-        plt.yticks(range(len(correlation_matrix.columns)), correlation_matrix.columns)
-        plt.title('Crypto Asset Correlations')
-        plt.savefig("Crypto Asset Correlations.png")
-        plt.show()
+        self.charts.submit("Crypto Asset Correlations.png", _plot_correlation_matrix,
+                           correlation_matrix.to_numpy(), list(correlation_matrix.columns))
+
+    def _stacked_factors(self):
+        """
+        Stack every asset's regression inputs on a common date index.
+        Returns dates, assets, design X (assets, dates, const + factors), returns y (assets, dates) and the mask
+        of rows where all of them are available.
+        """
+        assets = [asset for asset in self._crypto_assets() if set(FACTORS + ['return']) <= set(self.data[asset].columns)]
+        if not assets:
+            return None
+        dates = self.data[assets[0]].index
+        for asset in assets[1:]:
+            dates = dates.union(self.data[asset].index)
+        X = np.ones((len(assets), len(dates), len(FACTORS) + 1))
+        y = np.empty((len(assets), len(dates)))
+        for j, asset in enumerate(assets):
+            df = self.data[asset].reindex(dates)
+            X[j, :, 1:] = df[FACTORS].to_numpy(dtype=float)
+            y[j] = df['return'].to_numpy(dtype=float)
+        mask = np.isfinite(y) & np.isfinite(X).all(axis=2)
+        return dates, assets, X, y, mask
 
-    def factor_regression_model(self):
+    def factor_regression_model(self, full_summary=False):
         """
         Implement a multivariate regression model to analyze risk factors affecting asset returns.
+        All assets are solved at once with a batched QR factorization; set full_summary to also print the
+        statsmodels summary of every asset.
         """ 
-        for asset, df in self.data.items():
-            if asset != 'sp500' and df is not None:
-                # Prepare risk factors
-                df = df.dropna(subset=['return', 'volatility_clustering', 'liquidity', 'macro'])
-                if df.empty:
-                    print(f"Not enough data for regression analysis for {asset}.")
-                    continue
-                X = df[['volatility_clustering', 'liquidity', 'macro']]
-                X = sm.add_constant(X)  # Add constant to the model
-                y = df['return']
-                
-                # Run regression model
-                model = sm.OLS(y, X).fit()
-                print(f"Regression Summary for {asset}:{model.summary()}")
-                
-                # Store the regression coefficients
-                self.regression_coefficients[asset] = model.params
+        stacked = self._stacked_factors()
+        if stacked is None:
+            print("No valid data available for regression analysis.")
+            return
+        dates, assets, X, y, mask = stacked
+        columns = ['const'] + FACTORS
+        enough = mask.sum(axis=1) > X.shape[2]
+        for asset in np.array(assets)[~enough]:
+            print(f"Not enough data for regression analysis for {asset}.")
+        if not enough.any():
+            return
+        assets, X, y, mask = [a for a, e in zip(assets, enough) if e], X[enough], y[enough], mask[enough]
+
+        # Run regression model
+        coef, stderr, r_squared, rank = batched_ols(X, y, mask)
+        for asset, asset_rank in zip(assets, rank):
+            if asset_rank < len(columns):
+                print(f"Warning: factors for {asset} are collinear or constant (rank {asset_rank} of {len(columns)}); "
+                      f"using the minimum-norm least-squares fit.")
+
+        # Calculate the proportion of variance explained by each factor
+        X, y = np.where(mask[..., None], X, 0.0), np.where(mask, y, 0.0)
+        weights = mask / np.maximum(mask.sum(axis=1, keepdims=True) - 1, 1)
+        contributions = X * coef[:, None, :]
+        contribution_mean = (contributions * mask[..., None]).sum(axis=1) / mask.sum(axis=1)[:, None]
+        contribution_var = (((contributions - contribution_mean[:, None, :]) ** 2) * weights[..., None]).sum(axis=1)
+        y_mean = y.sum(axis=1) / mask.sum(axis=1)
+        y_var = (np.where(mask, y - y_mean[:, None], 0.0) ** 2 * weights).sum(axis=1)
+
+        for j, asset in enumerate(assets):
+            # Store the regression coefficients
+            self.regression_coefficients[asset] = pd.Series(coef[j], index=columns)
+            summary = pd.DataFrame({'coef': coef[j], 'std err': stderr[j], 't': coef[j] / stderr[j]}, index=columns)
+            print(f"Regression Summary for {asset}:\n{summary}")
+            if full_summary:
+                df = self.data[asset].dropna(subset=['return'] + FACTORS)
+                print(sm.OLS(df['return'], sm.add_constant(df[FACTORS])).fit().summary())
+            print(f"R-squared: {r_squared[j]}")
+            print(f"Factor Contributions to Variance: {pd.Series(contribution_var[j] / y_var[j], index=columns)}")
+
+    def rolling_factor_regression(self, window=None, min_periods=None):
+        """
+        Time-varying factor exposures: coefficients over a rolling `window` of days, or expanding when window is None.
+        Returns (and stores in self.rolling_betas) a dates x assets DataFrame per coefficient.
+        """
+        stacked = self._stacked_factors()
+        if stacked is None:
+            print("No valid data available for regression analysis.")
+            return {}
+        dates, assets, X, y, mask = stacked
+        coef = rolling_ols(X, y, mask, window=window, min_periods=min_periods)
+        self.rolling_betas = {
+            name: pd.DataFrame(coef[:, :, i], index=dates, columns=assets)
+            for i, name in enumerate(['const'] + FACTORS)
+        }
+        return self.rolling_betas
 
-                # Calculate the proportion of variance explained by each factor
-                r_squared = model.rsquared
-                factor_contributions = (X * model.params).var() / y.var()
-                print(f"R-squared: {r_squared}")
-                print(f"Factor Contributions to Variance: {factor_contributions}")   
+    def _factor_assets(self):
+        return [asset for asset in self._crypto_assets() if set(FACTORS) <= set(self.data[asset].columns)]
 
-    def pca_analysis(self):
+    def pca_analysis(self, state_path="pca_state.json", chunk_size=10000):
         """
         Perform Principal Component Analysis (PCA) to reduce dimensionality and identify main components of risk.
+        Asset factor rows are streamed into a StreamingPCA in chunks of `chunk_size`. Its moments are saved to
+        `state_path`, with the rows they hold in a .npy file next to it, and later runs only reconcile new and expired
+        days asset by asset, reading the saved rows through a memory map: rows of new (asset, day) pairs are added
+        and rows of pairs no longer in the data are taken out, so a daily run costs O(features^2) per new or expired
+        day. Days in both are not compared: filter-mode GARCH keeps
+        its parameters and only shifts the earliest volatilities through its backcast. When GARCH refitted an asset
+        (warm or cold mode in self.garch_report), or there is no report, the volatility factor is revised throughout
+        and the PCA is refitted on the current rows. None starts afresh each run.
         """
-        valid_data = [df[['volatility_clustering', 'liquidity', 'macro']].dropna() for asset, df in self.data.items() if asset != 'sp500' and df is not None]
-        if not valid_data:
+        pca = None
+        garch_report = getattr(self, 'garch_report', None)
+        if state_path and os.path.exists(state_path):
+            if garch_report is None or not (garch_report['mode'] == 'filter').all():
+                print("GARCH was refitted, so the volatility factor was revised; refitting the PCA.")
+            else:
+                try:
+                    # The saved rows are only read one asset at a time, so they stay on disk
+                    pca = StreamingPCA.load(state_path, mmap_mode='r')
+                except (KeyError, OSError, ValueError):
+                    print(f"PCA state at {state_path} is incomplete or from an older version; starting afresh.")
+        fresh = pca is None
+        if fresh:
+            pca = StreamingPCA(len(FACTORS), n_components=3)
+
+        def stream(update, pending, force=False):
+            # Apply queued rows to the moments once they fill a chunk
+            if pending and (force or sum(map(len, pending)) >= chunk_size):
+                update(np.concatenate(pending))
+                pending.clear()
+
+        # Match saved and current rows per asset on their day numbers; assets no longer in the data expire whole
+        assets = self._factor_assets()
+        bounds = np.searchsorted(pca.rows[:, 0], np.arange(len(pca.assets) + 1))
+        saved_rows = {asset: pca.rows[bounds[i]:bounds[i + 1]] for i, asset in enumerate(pca.assets)}
+        expired, added, pieces = [], [], []
+        n_expired = n_added = 0
+        for asset in set(saved_rows) - set(assets):
+            expired.append(saved_rows[asset][:, 2:])
+            n_expired += len(saved_rows[asset])
+            stream(pca.remove, expired)
+        for j, asset in enumerate(assets):
+            values = self.data[asset][FACTORS].to_numpy(dtype=float)
+            valid = ~np.isnan(values).any(axis=1)
+            days = self.data[asset].index.values.astype('datetime64[D]').astype(np.int64)[valid]
+            saved = saved_rows.get(asset, pca.rows[:0])
+            kept = np.isin(saved[:, 1], days)
+            new = ~np.isin(days, saved[:, 1])
+            rows = np.column_stack([np.full(new.sum(), j), days[new], values[valid][new]])
+            expired.append(saved[~kept, 2:])
+            added.append(rows[:, 2:])
+            pieces.append((saved, kept, rows))
+            n_expired += len(kept) - kept.sum()
+            n_added += len(rows)
+            stream(pca.remove, expired)
+            stream(pca.partial_fit, added)
+        stream(pca.remove, expired, force=True)
+        stream(pca.partial_fit, added, force=True)
+        if not fresh:
+            print(f"PCA state: {n_added} new and {n_expired} expired asset days reconciled.")
+
+        # The rows still in the moments, grouped by their asset's position in `assets`
+        merged = np.empty((sum(kept.sum() + len(rows) for _, kept, rows in pieces), 2 + len(FACTORS)))
+        position = 0
+        for j, (saved, kept, rows) in enumerate(pieces):
+            count = kept.sum()
+            merged[position:position + count] = saved[kept]
+            merged[position:position + count, 0] = j
+            merged[position + count:position + count + len(rows)] = rows
+            position += count + len(rows)
+        # Release the memory-mapped saved rows before the state file is replaced
+        saved_rows = pieces = saved = None
+        pca.assets, pca.rows = assets, merged
+        if pca.count < 2:
             print("No valid data available for PCA analysis.")
             return
-        combined_data = pd.concat(valid_data, axis=0)
-        pca = PCA(n_components=3)
-        pca.fit(combined_data)
-        explained_variance = pca.explained_variance_ratio_
-
-        plt.figure(figsize=(10, 6))
-        plt.bar(range(1, len(explained_variance) + 1), explained_variance, tick_label=[f'PC{i}' for i in range(1, len(explained_variance) + 1)])
-        plt.xlabel('Principal Components')
-        plt.ylabel('Explained Variance Ratio')
-        plt.title('Explained Variance by Principal Components')
-        plt.savefig("Explained Variance by Principal Components.png")
-        plt.show()
+        if state_path:
+            pca.save(state_path)
+        self.pca = pca
+        explained_variance = pca.explained_variance_ratio()
+
+        self.charts.submit("Explained Variance by Principal Components.png", _plot_explained_variance, explained_variance)
 
         print(f"Explained Variance by Principal Components: {explained_variance}")
 
-    def stress_testing(self):
+    def rolling_explained_variance(self, window=90, n_components=3):
         """
-        Conduct a simple stress test to simulate how assets respond to extreme changes in risk factors.
+        Explained variance ratio of the factor PCA over a rolling window of `window` days, pooled across assets.
+        Each day's rows are added to a StreamingPCA and the day leaving the window is removed, so every day costs
+        O(assets x features^2) rather than a refit. Returns a dates x components DataFrame.
         """
-        stress_liquidity_drop = -0.5  # Simulate a 50% drop in liquidity
-        for asset, df in self.data.items():
-            if asset != 'sp500' and df is not None and not df.empty:
-                stressed_returns = df['return'] + (df['liquidity'] * self.regression_coefficients[asset]['liquidity'] * stress_liquidity_drop)
-                plt.figure(figsize=(10, 6))
-                plt.plot(df.index, df['return'], label='Original Returns')
-                plt.plot(df.index, stressed_returns, label='Stressed Returns', linestyle='--')
-                plt.title(f'Stress Test for {asset} - Impact of Stressed Liquidity Drop')
-                plt.xlabel('Date')
-                plt.ylabel('Return')
-                plt.legend()
-                plt.savefig(f"Stress Test for {asset} - Impact of Stressed Liquidity Drop.png")
-                plt.show()
-                
-    def run_analysis(self):
-        self.fetch_data_to_csv()
-        self.read_csv_data()
-        self.preprocess_data()
-        self.compute_liquidity()
-        self.compute_volatility_clustering()
-        self.plot_macro_sensitivity()
-        self.plot_correlations()
-        self.factor_regression_model()
-        self.pca_analysis()
-        self.stress_testing()
+        assets = self._factor_assets()
+        if not assets:
+            print("No valid data available for PCA analysis.")
+            return pd.DataFrame()
+        dates = self.data[assets[0]].index
+        for asset in assets[1:]:
+            dates = dates.union(self.data[asset].index)
+        cube = np.stack([self.data[asset][FACTORS].reindex(dates).to_numpy(dtype=float) for asset in assets], axis=1)
+
+        pca = StreamingPCA(len(FACTORS), n_components)
+        ratios = np.full((len(dates), n_components), np.nan)
+        for t in range(len(dates)):
+            pca.partial_fit(cube[t])
+            if t >= window:
+                pca.remove(cube[t - window])
+            if pca.count > len(FACTORS):
+                ratios[t] = pca.explained_variance_ratio()
+        return pd.DataFrame(ratios, index=dates, columns=[f'PC{i}' for i in range(1, n_components + 1)])
+
+    def stress_testing(self, scenarios=None, n_simulations=10000, shock_volatility=(0.5, 0.5, 0.5), shock_correlation=None,
+                       alpha=0.95, memory_budget_mb=256, chunk_size=None, workers=None, seed=None, plot=True):
+        """
+        Conduct a stress test to simulate how assets respond to extreme changes in risk factors.
+        `scenarios` maps names to relative factor shocks, e.g. {'Stressed Liquidity Drop': {'liquidity': -0.5}}, and
+        `n_simulations` joint shocks are added from simulate_shocks. All scenarios are applied to every asset's
+        regression exposures as one broadcasted computation, in chunks sized so that the working arrays of all
+        concurrent chunks fit in `memory_budget_mb` (or of `chunk_size` scenarios when given), optionally sharded
+        over a process pool of `workers`. Unknown factor names in `scenarios` raise ValueError. Per scenario and asset, the mean return, VaR and expected shortfall at
+        `alpha` and the worst return are kept in self.stress_results; self.stress_summary aggregates them per asset.
+        """
+        if scenarios is None:
+            scenarios = {'Stressed Liquidity Drop': {'liquidity': -0.5}}  # Simulate a 50% drop in liquidity
+        for name, shock in scenarios.items():
+            unknown = set(shock) - set(FACTORS)
+            if unknown:
+                raise ValueError(f"Scenario '{name}' shocks unknown factors {sorted(unknown)}; expected some of {FACTORS}.")
+        if not scenarios and not n_simulations:
+            print("No scenarios to stress test.")
+            return
+        stacked = self._stacked_factors()
+        if stacked is None:
+            print("No valid data available for stress testing.")
+            return
+        dates, assets, X, y, mask = stacked
+        keep = [j for j, asset in enumerate(assets) if asset in self.regression_coefficients and mask[j].any()]
+        if not keep:
+            print("No regression coefficients available for stress testing.")
+            return
+        assets = [assets[j] for j in keep]
+        betas = np.array([self.regression_coefficients[asset][FACTORS].to_numpy(dtype=float) for asset in assets])
+        mask = mask[keep]
+        exposures = np.where(mask[..., None], X[keep][:, :, 1:] * betas[:, None, :], 0.0)
+        returns = np.where(mask, y[keep], 0.0)
+
+        names = list(scenarios) + [f'simulated_{i}' for i in range(n_simulations)]
+        shocks = np.array([[scenarios[name].get(factor, 0.0) for factor in FACTORS] for name in scenarios]).reshape(-1, len(FACTORS))
+        if n_simulations:
+            shocks = np.vstack([shocks, simulate_shocks(n_simulations, shock_volatility, shock_correlation, seed)])
+        # A chunk holds its stressed returns plus up to two partitioned copies of them, 8 bytes per value
+        if chunk_size is None:
+            bytes_per_scenario = 3 * returns.size * 8
+            chunk_size = max(1, int(memory_budget_mb * 2 ** 20 / (bytes_per_scenario * max(workers or 1, 1))))
+        chunks = [shocks[start:start + chunk_size] for start in range(0, len(shocks), chunk_size)]
+
+        start = time.perf_counter()
+        if workers and workers > 1 and len(chunks) > 1:
+            with _process_pool(workers, initializer=_init_stress_worker, initargs=(returns, exposures, mask)) as executor:
+                results = list(executor.map(_stress_chunk, chunks, [alpha] * len(chunks)))
+        else:
+            _init_stress_worker(returns, exposures, mask)
+            results = [_stress_chunk(chunk, alpha) for chunk in chunks]
+        results = np.concatenate(results)
+        elapsed = time.perf_counter() - start
+
+        index = pd.MultiIndex.from_product([names, assets], names=['scenario', 'asset'])
+        self.stress_results = pd.DataFrame(results.reshape(-1, len(STRESS_STATISTICS)), index=index, columns=STRESS_STATISTICS)
+        var, es = results[..., 1], results[..., 2]
+        self.stress_summary = pd.DataFrame({
+            'median_var': np.median(var, axis=0),
+            'median_es': np.median(es, axis=0),
+            f'var_{alpha:.0%}_of_scenarios': np.quantile(var, alpha, axis=0),
+            'max_es': es.max(axis=0),
+            'worst_scenario': np.array(names)[es.argmax(axis=0)],
+        }, index=pd.Index(assets, name='asset'))
+        print(f"Stress test: {len(names)} scenarios x {len(assets)} assets in {elapsed:.2f}s")
+        print(f"Stress Test Summary (VaR/ES at {alpha:.0%}, as losses):\n{self.stress_summary}")
+        print(f"Named scenarios:\n{self.stress_results.loc[list(scenarios)]}")
+        if not plot or not scenarios:
+            return
+
+        # Plot original against stressed returns under the first named scenario
+        first = shocks[0]
+        for j, asset in enumerate(assets):
+            df = self.data[asset]
+            if not df.empty:
+                stressed_returns = df['return'] + (df[FACTORS] * betas[j] * first).sum(axis=1, min_count=1)
+                self.charts.submit(f"Stress Test for {asset} - Impact of {names[0]}.png", _plot_stress_test,
+                                   asset, names[0], df.index.values, df['return'].to_numpy(), stressed_returns.to_numpy())
+
+    def render_charts(self):
+        """
+        Draw the charts queued by the plotting steps, skipping the ones whose inputs have not changed.
+        """
+        stats = self.charts.render()
+        print(f"Charts: {stats['rendered']} rendered, {stats['skipped']} unchanged, in {stats['seconds']:.2f}s")
+        return stats
+
+    def _analysis_stage(self, method, reads=None, writes=None, results=(), uses=(), files=(), **kwargs):
+        """
+        Wrap an analysis method as (prepare, compute, apply) for the StagePipeline.
+        The method runs on a copy of the `reads` columns of every asset (all data when None) and of the attributes
+        in `uses`, so pooled stages never touch shared state and their cache key only covers what they read, plus the
+        method's code and this module's source. The side-input `files` it loads and rewrites (e.g. a fit cache) are
+        passed on to the pipeline, which adds their contents to the key.
+        apply() merges back the `writes` columns of every asset (whole frames when None), the `results` attributes
+        and the charts the method queued.
+        """
+        function = getattr(type(self), method)
+
+        def prepare():
+            if reads is None:
+                data = {name: None if df is None else df.copy() for name, df in self.data.items()}
+            else:
+                data = {asset: self.data[asset][[column for column in reads if column in self.data[asset].columns]].copy()
+                        for asset in self._crypto_assets()}
+            state = {name: copy.copy(getattr(self, name, None)) for name in uses}
+            # The method's code and arguments and the module source are part of the inputs, so changing any of
+            # them invalidates the cache
+            code = hashlib.sha1()
+            _code_digest(function.__code__, code)
+            step = (method, kwargs, code.hexdigest(), _SOURCE_DIGEST)
+            return {'data': data, 'state': state, 'step': step}
+
+        def compute(inputs):
+            scratch = copy.copy(self)
+            scratch.data = inputs['data']
+            scratch.regression_coefficients = {}
+            scratch.charts = ChartRenderer(hash_path=None)
+            for name, value in inputs['state'].items():
+                setattr(scratch, name, value)
+            getattr(scratch, method)(**kwargs)
+            frames = {}
+            for asset in scratch._crypto_assets() if writes != [] else []:
+                df = scratch.data[asset]
+                frames[asset] = df if writes is None else df[[column for column in writes if column in df.columns]]
+            return {
+                'frames': frames,
+                'results': {name: getattr(scratch, name) for name in results if hasattr(scratch, name)},
+                'charts': [job[:3] for job in scratch.charts.jobs],
+            }
+
+        def apply(output):
+            for asset, frame in output['frames'].items():
+                self.data[asset] = frame if writes is None else self.data[asset].assign(**{column: frame[column] for column in frame.columns})
+            for name, value in output['results'].items():
+                setattr(self, name, value)
+            for filename, plot_function, args in output['charts']:
+                self.charts.submit(filename, plot_function, *args)
+
+        return {'prepare': prepare, 'compute': compute, 'apply': apply, 'files': files}
+
+    def analysis_pipeline(self, workers=4, cache_dir="stage_cache", profile_memory=True):
+        """
+        Declare run_analysis as a stage DAG. Data loading and chart rendering run inline; the analysis steps run
+        on the pool, concurrently where they do not depend on each other, and the costly ones are cached.
+        """
+        pipeline = StagePipeline(workers=workers, cache_dir=cache_dir, profile_memory=profile_memory)
+        pipeline.add('fetch_data', lambda _: self.fetch_data(), inline=True)
+        pipeline.add('save_panel', lambda _: self.save_panel(), ['fetch_data'], inline=True)
+        pipeline.add('read_panel_data', lambda _: self.read_panel_data(), ['save_panel'], inline=True)
+        pipeline.add('preprocess_data', depends_on=['read_panel_data'], cache=True,
+                     **self._analysis_stage('preprocess_data', results=['returns']))
+        pipeline.add('compute_liquidity', depends_on=['preprocess_data'], cache=True,
+                     **self._analysis_stage('compute_liquidity', reads=['price', 'volume'], writes=['liquidity']))
+        pipeline.add('compute_volatility_clustering', depends_on=['preprocess_data'], cache=True,
+                     **self._analysis_stage('compute_volatility_clustering', reads=['return'], writes=['volatility_clustering'],
+                                            results=['garch_report'], files=['garch_cache']))
+        pipeline.add('plot_macro_sensitivity', depends_on=['preprocess_data'],
+                     **self._analysis_stage('plot_macro_sensitivity', reads=['return', 'macro'], writes=[]))
+        pipeline.add('plot_correlations', depends_on=['preprocess_data'],
+                     **self._analysis_stage('plot_correlations', reads=[], writes=[], uses=['returns']))
+        factors = ['compute_liquidity', 'compute_volatility_clustering']
+        pipeline.add('factor_regression_model', depends_on=factors, cache=True,
+                     **self._analysis_stage('factor_regression_model', reads=['return'] + FACTORS, writes=[],
+                                            results=['regression_coefficients']))
+        pipeline.add('pca_analysis', depends_on=factors, cache=True,
+                     **self._analysis_stage('pca_analysis', reads=FACTORS, writes=[], results=['pca'], uses=['garch_report'],
+                                            files=['pca_state.json', 'pca_state_rows.npy']))
+        pipeline.add('stress_testing', depends_on=['factor_regression_model'], cache=True,
+                     **self._analysis_stage('stress_testing', reads=['return'] + FACTORS, writes=[], results=['stress_results', 'stress_summary'],
+                                            uses=['regression_coefficients']))
+        pipeline.add('render_charts', lambda _: self.render_charts(),
+                     ['plot_macro_sensitivity', 'plot_correlations', 'pca_analysis', 'stress_testing'], inline=True)
+        return pipeline
+
+    def run_analysis(self, workers=4, cache_dir="stage_cache", report_path="run_report.json", profile_memory=True):
+        """
+        Run the full analysis as a stage DAG (see analysis_pipeline) and write the per-stage report to `report_path`.
+        """
+        report = self.analysis_pipeline(workers, cache_dir, profile_memory).run(report_path)
+        stages = pd.DataFrame(report['stages']).T.reindex(columns=['wall_seconds', 'peak_memory_mb', 'cache'])
+        print(f"Stage report ({report['total_seconds']:.2f}s total, cache hit rate {report['cache_hit_rate']}):\n{stages}")
+        return report
 
         
-assets = ['bitcoin', 'ethereum', 'solana', 'chainlink']
-start_date = pd.Timestamp.now() - pd.Timedelta(days=365)
-end_date = pd.Timestamp.now()
-analysis = CryptoRiskAnalysis(assets, start_date, end_date)
-analysis.run_analysis()
+if __name__ == "__main__":
+    assets = ['bitcoin', 'ethereum', 'solana', 'chainlink']
+    start_date = pd.Timestamp.now() - pd.Timedelta(days=365)
+    end_date = pd.Timestamp.now()
+    analysis = CryptoRiskAnalysis(assets, start_date, end_date)
+    analysis.run_analysis()
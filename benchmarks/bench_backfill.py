@@ -0,0 +1,142 @@
+"""
+Deterministic throughput benchmark of AlchemyTransactionMonitor.backfill against a local JSON-RPC stand-in.
+
+The recorded Uniswap V3 router transactions in tests/fixtures are replayed as --blocks full blocks of
+--transactions-per-block transactions each (cycling through the recording with fresh hashes), served by a local
+Ethereum node stand-in that answers every batch request after --latency-ms. The same block range is then
+backfilled with inline decoding and through a SwapDecodePipeline with each worker count in --workers, and the
+blocks and transactions per second and the swap records written are printed. Nothing is random, so runs only
+differ by machine noise.
+
+    python benchmarks/bench_backfill.py --blocks 400 --transactions-per-block 150 --latency-ms 50 --workers 1 2 4
+"""
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "2. Onchain Analytics.py")
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+
+# The script is loaded at import time so that pool workers (fork server or spawn), which re-import this file,
+# can unpickle its functions too
+_spec = importlib.util.spec_from_file_location("onchain_analytics", SCRIPT)
+onchain = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = onchain
+_spec.loader.exec_module(onchain)
+
+FIRST_BLOCK = 19_000_000
+
+def load_recording():
+    with open(os.path.join(FIXTURES, "uniswap_v3_router_abi.json")) as f:
+        router_abi = json.load(f)
+    with open(os.path.join(FIXTURES, "uniswap_v3_transactions.json")) as f:
+        recorded = json.load(f)
+    return router_abi, recorded["router"], recorded["transactions"]
+
+def replay_blocks(transactions, n_blocks, per_block):
+    """
+    Full blocks cycling through the recorded transactions, each copy with its own hash.
+    """
+    blocks = {}
+    for b in range(n_blocks):
+        block = []
+        for i in range(b * per_block, (b + 1) * per_block):
+            block.append(dict(transactions[i % len(transactions)], hash="0x%064x" % i))
+        blocks[FIRST_BLOCK + b] = {"number": hex(FIRST_BLOCK + b), "transactions": block}
+    return blocks
+
+@contextlib.contextmanager
+def ethereum_node(blocks, latency):
+    """
+    Local JSON-RPC stand-in answering eth_getBlockByNumber batches after `latency` seconds.
+    """
+    # Replies are serialised once, so the stand-in costs the same whatever is being benchmarked
+    encoded = {hex(number): json.dumps(block) for number, block in blocks.items()}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if isinstance(body, list):
+                time.sleep(latency)
+                payload = "[" + ",".join(f'{{"jsonrpc":"2.0","id":{request["id"]},"result":{encoded.get(request["params"][0], "null")}}}'
+                                         for request in body) + "]"
+            else:
+                payload = json.dumps({"jsonrpc": "2.0", "id": body["id"], "result": "0x1"})
+            payload = payload.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def run_benchmark(n_blocks=400, per_block=150, latency=0.05, worker_counts=(1, 2, 4), blocks_per_request=10,
+                  concurrent_requests=4):
+    router_abi, router, transactions = load_recording()
+    blocks = replay_blocks(transactions, n_blocks, per_block)
+    last_block = FIRST_BLOCK + n_blocks - 1
+    results = []
+    with ethereum_node(blocks, latency) as url, tempfile.TemporaryDirectory() as directory:
+        monitor = onchain.AlchemyTransactionMonitor(url, router, router_abi)
+        for workers in [0] + list(worker_counts):
+            checkpoint = os.path.join(directory, f"checkpoint_{workers}.json")
+            pipeline = None
+            if workers:
+                pipeline = onchain.SwapDecodePipeline(router_abi, router, onchain.NDJSONSwapSink(os.path.join(directory, f"swaps_{workers}.ndjson")),
+                                                      workers=workers)
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                stats = monitor.backfill(FIRST_BLOCK, last_block, checkpoint, blocks_per_request, concurrent_requests, pipeline)
+                if pipeline is not None:
+                    pipeline.close()
+            results.append({"workers": workers, "blocks": stats["blocks"], "transactions": stats["transactions"],
+                            "router_transactions": stats["router_transactions"], "seconds": stats["seconds"],
+                            "blocks_per_second": stats["blocks_per_second"],
+                            "transactions_per_second": stats["transactions"] / stats["seconds"],
+                            "records": pipeline.records_written if pipeline is not None else None})
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backfill throughput against a local JSON-RPC stand-in.")
+    parser.add_argument("--blocks", type=int, default=400)
+    parser.add_argument("--transactions-per-block", type=int, default=150)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="simulated round trip per batch request")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="pipeline worker counts; inline decoding always runs")
+    parser.add_argument("--blocks-per-request", type=int, default=10)
+    parser.add_argument("--concurrent-requests", type=int, default=4)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.blocks, args.transactions_per_block, args.latency_ms / 1000, args.workers,
+                            args.blocks_per_request, args.concurrent_requests)
+    for result in results:
+        label = f"pipeline, {result['workers']} workers" if result["workers"] else "inline decoding"
+        records = f", {result['records']} swap records" if result["records"] is not None else ""
+        print(f"{label:>22}: {result['blocks']} blocks in {result['seconds']:.2f}s, {result['blocks_per_second']:.0f} blocks/s, "
+              f"{result['transactions_per_second']:.0f} tx/s{records}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
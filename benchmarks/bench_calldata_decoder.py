@@ -0,0 +1,88 @@
+"""
+Microbenchmark of RouterCalldataDecoder against web3's decode_function_input on a router calldata corpus.
+
+The corpus is the calldata of the recorded Uniswap V3 router transactions in tests/fixtures (exactInputSingle,
+exactInput, exactOutputSingle, exactOutput and multicall), cycled up to --calls. Both decoders run over the same
+corpus --repeat times and the best time per call of each is printed with the speed-up. web3 is given a warm
+contract object, as in the original decode path, and the decoders are checked to agree on every distinct call.
+For multicall the compiled decoder also decodes the sub-calls, which web3 leaves as raw bytes.
+
+    python benchmarks/bench_calldata_decoder.py --calls 20000 --repeat 5
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+
+from web3 import Web3
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "2. Onchain Analytics.py")
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+
+_spec = importlib.util.spec_from_file_location("onchain_analytics", SCRIPT)
+onchain = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = onchain
+_spec.loader.exec_module(onchain)
+
+def load_corpus(n_calls):
+    """
+    Router ABI, router address and `n_calls` calldata strings cycling through the recorded router transactions.
+    """
+    with open(os.path.join(FIXTURES, "uniswap_v3_router_abi.json")) as f:
+        router_abi = json.load(f)
+    with open(os.path.join(FIXTURES, "uniswap_v3_transactions.json")) as f:
+        recorded = json.load(f)
+    decoder = onchain.RouterCalldataDecoder(router_abi)
+    calldata = []
+    for tx in recorded["transactions"]:
+        if tx["to"] != recorded["router"].lower():
+            continue
+        try:
+            decoder.decode(tx["input"])
+        except ValueError:
+            continue  # the recording's truncated transaction
+        calldata.append(tx["input"])
+    return router_abi, recorded["router"], [calldata[i % len(calldata)] for i in range(n_calls)]
+
+def best_seconds(decode, corpus, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for data in corpus:
+            decode(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run_benchmark(n_calls=20000, repeat=5):
+    router_abi, router, corpus = load_corpus(n_calls)
+    decoder = onchain.RouterCalldataDecoder(router_abi)
+    contract = Web3().eth.contract(address=router, abi=router_abi)
+    for data in set(corpus):
+        function, params = contract.decode_function_input(data)
+        if decoder.decode(data)[:2] != (function.fn_name, params):
+            raise AssertionError(f"Decoders disagree on {data[:10]}...")
+
+    compiled = best_seconds(decoder.decode, corpus, repeat)
+    web3 = best_seconds(contract.decode_function_input, corpus, repeat)
+    return {"calls": n_calls, "compiled_us_per_call": 1e6 * compiled / n_calls, "web3_us_per_call": 1e6 * web3 / n_calls,
+            "speedup": web3 / compiled}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RouterCalldataDecoder against web3's decode_function_input.")
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the corpus; the best one is kept")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.calls, args.repeat)
+    print(f"{result['calls']} calls: RouterCalldataDecoder {result['compiled_us_per_call']:.1f} us/call, "
+          f"web3 decode_function_input {result['web3_us_per_call']:.1f} us/call, speed-up {result['speedup']:.1f}x")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
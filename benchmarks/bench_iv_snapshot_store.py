@@ -0,0 +1,129 @@
+"""
+Benchmark of IVSnapshotStore against loading one JSON file per snapshot, at minute snapshots over --days.
+
+Every --interval-minutes a synthetic snapshot of --quotes quotes is written twice into a temporary directory:
+as an IVSnapshotStore partition and as a JSON list of iv_data records (the format the script used to dump to
+iv_data.json). Both are then loaded back into columns, once for the whole period and once for its last day,
+and the load time, peak traced memory and disk footprint of each format are printed. The loaded columns are
+checked to agree. One year of minute snapshots is --days 365 (525,600 snapshots, several GB on disk per
+format, and hours to generate), so the default is one day.
+
+    python benchmarks/bench_iv_snapshot_store.py --days 1 --quotes 700
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "1. Data Processing and Visualization.py")
+
+_spec = importlib.util.spec_from_file_location("data_processing", SCRIPT)
+data_processing = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = data_processing
+_spec.loader.exec_module(data_processing)
+
+MINUTE = 60_000
+
+def synthetic_snapshot(capture_time, n_quotes, rng):
+    """
+    iv_data records of one snapshot: a fixed chain of expiries and strikes with noisy implied volatilities.
+    """
+    expiries = (capture_time // 86_400_000 + np.arange(1, 11) * 7) * 86_400_000
+    return [{
+        "instrument_name": f"BTC-{expiries[i % 10]}-{40_000 + 1_000 * (i // 10)}-C",
+        "time_to_expiration": int(expiries[i % 10] - capture_time),
+        "strike": float(40_000 + 1_000 * (i // 10)),
+        "implied_volatility": float(50 + 5 * rng.standard_normal()),
+        "underlying_price": 75_000.0,
+    } for i in range(n_quotes)]
+
+def load_json_range(directory, start=None, end=None):
+    """
+    The JSON baseline: parse every snapshot file in [start, end] and concatenate their columns.
+    """
+    capture_times = sorted(int(name[:-len(".json")]) for name in os.listdir(directory) if name.endswith(".json"))
+    columns = {}
+    for capture_time in capture_times:
+        if (start is not None and capture_time < start) or (end is not None and capture_time > end):
+            continue
+        with open(os.path.join(directory, f"{capture_time}.json")) as f:
+            snapshot = data_processing.iv_data_to_columns(json.load(f))
+        columns.setdefault("capture_time", []).append(np.full(len(snapshot["strike"]), capture_time, dtype=np.int64))
+        for name, values in snapshot.items():
+            columns.setdefault(name, []).append(values)
+    return {name: np.concatenate(values) for name, values in columns.items()}
+
+def measure(function, *args):
+    """
+    Return (result, seconds, peak traced memory in MB); the peak comes from a second, traced call since tracing
+    slows Python code down several-fold.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return result, seconds, peak
+
+def disk_mb(directory):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names) / 2 ** 20
+
+def run_benchmark(days=1, n_quotes=700, interval_minutes=1, seed=0):
+    rng = np.random.default_rng(seed)
+    start_time = 1_735_689_600_000  # 2025-01-01
+    capture_times = start_time + np.arange(int(days * 1440 / interval_minutes)) * interval_minutes * MINUTE
+    last_day = int(capture_times[-1]) - 1440 * MINUTE
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = data_processing.IVSnapshotStore(os.path.join(directory, "iv_store"))
+        json_directory = os.path.join(directory, "json", "BTC")
+        os.makedirs(json_directory)
+        for capture_time in capture_times.tolist():
+            iv_data = synthetic_snapshot(capture_time, n_quotes, rng)
+            store.append("BTC", iv_data, capture_time)
+            with open(os.path.join(json_directory, f"{capture_time}.json"), "w") as f:
+                json.dump(iv_data, f)
+
+        result = {"snapshots": len(capture_times), "quotes_per_snapshot": n_quotes,
+                  "store_disk_mb": disk_mb(store.root), "json_disk_mb": disk_mb(json_directory)}
+        for label, start in (("full", None), ("last_day", last_day)):
+            stored, store_seconds, store_mb = measure(store.read_range, "BTC", start)
+            loaded, json_seconds, json_mb = measure(load_json_range, json_directory, start)
+            for name, values in loaded.items():
+                if not np.array_equal(stored[name], values):
+                    raise AssertionError(f"IVSnapshotStore and JSON disagree on {name} ({label})")
+            result[label] = {"rows": len(stored["strike"]), "store_seconds": store_seconds, "store_peak_mb": store_mb,
+                             "json_seconds": json_seconds, "json_peak_mb": json_mb, "speedup": json_seconds / store_seconds}
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark IVSnapshotStore against per-snapshot JSON files.")
+    parser.add_argument("--days", type=float, default=1, help="period covered by the snapshots (365 for a year)")
+    parser.add_argument("--quotes", type=int, default=700, help="quotes per snapshot (a BTC chain has several hundred)")
+    parser.add_argument("--interval-minutes", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.days, args.quotes, args.interval_minutes, args.seed)
+    print(f"{result['snapshots']} snapshots x {result['quotes_per_snapshot']} quotes: IVSnapshotStore "
+          f"{result['store_disk_mb']:.0f} MB on disk, JSON {result['json_disk_mb']:.0f} MB")
+    for label in ("full", "last_day"):
+        timing = result[label]
+        print(f"  {label} range ({timing['rows']} rows): IVSnapshotStore {timing['store_seconds']:.2f}s "
+              f"({timing['store_peak_mb']:.0f} MB peak), JSON {timing['json_seconds']:.2f}s "
+              f"({timing['json_peak_mb']:.0f} MB peak), speed-up {timing['speedup']:.1f}x")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark of build_iv_surface against the original list-based grid fill, from 10k to 1M quotes.
+
+Synthetic option chains are generated for every size in --quotes: --expiries expiries, a strike ladder wide
+enough to hold the quotes and a call and a put per (strike, expiry) cell, so half the quotes share a cell. For
+every size the time and peak traced memory of iv_data_to_columns and build_iv_surface are printed, next to the
+original fill (sorted sets, then list.index per quote into a dense grid), which is only run up to --legacy-max
+quotes since it grows with quotes x strikes. Both grids are checked to hold the same quotes.
+
+    python benchmarks/bench_iv_surface_grid.py --quotes 10000 100000 1000000 --legacy-max 100000
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "1. Data Processing and Visualization.py")
+
+_spec = importlib.util.spec_from_file_location("data_processing", SCRIPT)
+data_processing = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = data_processing
+_spec.loader.exec_module(data_processing)
+
+def synthetic_iv_data(n_quotes, n_expiries=50, seed=0):
+    """
+    iv_data records with a call and a put on every (strike, expiry) cell, in shuffled order.
+    """
+    rng = np.random.default_rng(seed)
+    n_strikes = max(1, n_quotes // (2 * n_expiries))
+    expiries = np.sort(rng.choice(np.arange(1, 3 * 365) * 86_400_000, n_expiries, replace=False))
+    strikes = 20_000.0 + 250.0 * np.arange(n_strikes)
+    cells = np.arange(n_quotes) // 2 % (n_strikes * n_expiries)
+    order = rng.permutation(n_quotes)
+    return [{
+        "instrument_name": f"BTC-{int(expiries[cells[i] % n_expiries])}-{int(strikes[cells[i] // n_expiries])}-{'CP'[i % 2]}",
+        "time_to_expiration": int(expiries[cells[i] % n_expiries]),
+        "strike": float(strikes[cells[i] // n_expiries]),
+        "implied_volatility": float(40 + 20 * rng.random()),
+    } for i in order]
+
+def legacy_grid(iv_data):
+    """
+    The original visualize_iv_surface fill: sorted axes, then a list.index lookup per quote into a dense grid.
+    """
+    expirations = sorted(list(set(data["time_to_expiration"] for data in iv_data)))
+    strikes = sorted(list(set(data["strike"] for data in iv_data)))
+    Z = np.zeros((len(strikes), len(expirations)))
+    for data in iv_data:
+        i = expirations.index(data["time_to_expiration"])
+        j = strikes.index(data["strike"])
+        Z[j, i] = data["implied_volatility"]
+    return Z
+
+def measure(function, *args):
+    """
+    Return (result, seconds, peak traced memory in MB) of one call.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return result, seconds, peak
+
+def run_benchmark(quote_counts, n_expiries=50, legacy_max=100_000, seed=0):
+    results = []
+    for n_quotes in quote_counts:
+        iv_data = synthetic_iv_data(n_quotes, n_expiries, seed)
+        columns, columns_seconds, columns_mb = measure(data_processing.iv_data_to_columns, iv_data)
+        grid, grid_seconds, grid_mb = measure(data_processing.build_iv_surface, columns)
+        result = {"quotes": n_quotes, "grid_shape": list(grid.shape), "observed_cells": len(grid.implied_volatility),
+                  "columns_seconds": columns_seconds, "columns_peak_mb": columns_mb,
+                  "grid_seconds": grid_seconds, "grid_peak_mb": grid_mb}
+        if n_quotes <= legacy_max:
+            legacy, legacy_seconds, legacy_mb = measure(legacy_grid, iv_data)
+            # The new grid leaves unquoted cells NaN where the original one left 0
+            if not np.array_equal(np.nan_to_num(grid.values), legacy):
+                raise AssertionError(f"build_iv_surface disagrees with the original fill at {n_quotes} quotes")
+            result.update({"legacy_seconds": legacy_seconds, "legacy_peak_mb": legacy_mb,
+                           "speedup": legacy_seconds / grid_seconds})
+        results.append(result)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark build_iv_surface against the original grid fill.")
+    parser.add_argument("--quotes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="quote counts to benchmark")
+    parser.add_argument("--expiries", type=int, default=50)
+    parser.add_argument("--legacy-max", type=int, default=100_000, help="largest quote count the original fill is run at")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.quotes, args.expiries, args.legacy_max, args.seed)
+    for result in results:
+        line = (f"{result['quotes']:>8} quotes on a {result['grid_shape'][0]}x{result['grid_shape'][1]} grid: "
+                f"iv_data_to_columns {result['columns_seconds']:.3f}s ({result['columns_peak_mb']:.0f} MB), "
+                f"build_iv_surface {result['grid_seconds']:.3f}s ({result['grid_peak_mb']:.0f} MB)")
+        if "legacy_seconds" in result:
+            line += f", original fill {result['legacy_seconds']:.3f}s ({result['legacy_peak_mb']:.0f} MB), speed-up {result['speedup']:.0f}x"
+        print(line)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
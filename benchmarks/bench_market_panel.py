@@ -0,0 +1,128 @@
+"""
+Benchmark of loading market data from a MarketPanel against the per-asset CSV files it replaced.
+
+For every universe size in --assets, --days of synthetic daily prices and volumes (with a few missing days per
+asset) and a business-day S&P 500 series are written into a temporary directory twice: as CSV files per asset,
+the way fetch_data_to_csv writes them, and as a MarketPanel through save_panel. Each is then loaded back through
+the analysis's own reader (read_csv_data and read_panel_data), and the panel is also loaded on its own with
+MarketPanel.load, which only memory-maps it. The load time, peak traced memory and disk footprint of each are
+printed, and the loaded prices are checked to agree.
+
+    python benchmarks/bench_market_panel.py --assets 100 500 --days 365
+"""
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "3. Risk Factor Analysis for Crypto Assets.py")
+
+_spec = importlib.util.spec_from_file_location("risk_factor_analysis", SCRIPT)
+risk = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = risk
+_spec.loader.exec_module(risk)
+
+def synthetic_market(n_assets, days, seed=0):
+    """
+    Per-asset price and volume frames with some missing days, and an S&P 500 frame on business days.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2024-01-01", periods=days, freq="D", name="date")
+    data = {}
+    for i in range(n_assets):
+        keep = rng.random(days) > 0.02
+        data[f"asset_{i}"] = pd.DataFrame({
+            'price': 100 * np.exp(np.cumsum(rng.normal(0, 0.03, days))),
+            'volume': rng.lognormal(15, 0.5, days),
+        }, index=dates)[keep]
+    business_days = pd.bdate_range(dates[0], dates[-1], name="date")
+    data['sp500'] = pd.DataFrame({'S&P 500': 4000 * np.exp(np.cumsum(rng.normal(0, 0.01, len(business_days))))}, index=business_days)
+    return data
+
+def measure(function):
+    """
+    Return (result, seconds, peak traced memory in MB); the peak comes from a second, traced call since tracing
+    slows Python code down several-fold.
+    """
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return result, seconds, peak
+
+def disk_mb(paths):
+    total = 0
+    for path in paths:
+        if os.path.isfile(path):
+            total += os.path.getsize(path)
+        else:
+            total += sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+    return total / 2 ** 20
+
+def run_benchmark(n_assets, days=365, seed=0):
+    data = synthetic_market(n_assets, days, seed)
+    assets = [asset for asset in data if asset != 'sp500']
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            writer = risk.CryptoRiskAnalysis(assets, pd.Timestamp.now(), pd.Timestamp.now())
+            writer.data = dict(data)
+            # fetch_data_to_csv with the fetch already done
+            writer.fetch_data = lambda: None
+            writer.fetch_data_to_csv()
+            writer.save_panel()
+
+            def read(method):
+                analysis = risk.CryptoRiskAnalysis(assets, pd.Timestamp.now(), pd.Timestamp.now())
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    getattr(analysis, method)()
+                return analysis.data
+
+            csv, csv_seconds, csv_mb = measure(lambda: read('read_csv_data'))
+            panel, panel_seconds, panel_mb = measure(lambda: read('read_panel_data'))
+            _, mmap_seconds, mmap_mb = measure(lambda: risk.MarketPanel.load("market_panel"))
+            # read_csv's default float parser may differ from the written value in the last digit
+            for asset in assets:
+                if not np.allclose(csv[asset]['price'].to_numpy(), panel[asset]['price'].to_numpy(), rtol=1e-14, atol=0):
+                    raise AssertionError(f"CSV and MarketPanel disagree on {asset}")
+            result = {"assets": n_assets, "days": days,
+                      "csv_disk_mb": disk_mb([f"{asset}.csv" for asset in data]), "panel_disk_mb": disk_mb(["market_panel"]),
+                      "csv_seconds": csv_seconds, "csv_peak_mb": csv_mb,
+                      "panel_seconds": panel_seconds, "panel_peak_mb": panel_mb,
+                      "mmap_seconds": mmap_seconds, "mmap_peak_mb": mmap_mb}
+        finally:
+            os.chdir(cwd)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MarketPanel loading against per-asset CSV files.")
+    parser.add_argument("--assets", type=int, nargs="+", default=[100, 500], help="universe sizes to benchmark")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = [run_benchmark(n_assets, args.days, args.seed) for n_assets in args.assets]
+    for result in results:
+        print(f"{result['assets']} assets x {result['days']} days: read_csv_data {result['csv_seconds']:.2f}s "
+              f"({result['csv_peak_mb']:.1f} MB peak, {result['csv_disk_mb']:.1f} MB on disk), read_panel_data "
+              f"{result['panel_seconds']:.2f}s ({result['panel_peak_mb']:.1f} MB peak, {result['panel_disk_mb']:.1f} MB on disk), "
+              f"MarketPanel.load {result['mmap_seconds']:.4f}s ({result['mmap_peak_mb']:.2f} MB peak)")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Wall-clock benchmark of DeribitAPI.get_order_books against the number of instruments.
+
+A local HTTP server stands in for Deribit and answers every get_order_book request after --latency-ms, like a
+round trip to the exchange. For every instrument count in --instruments the order books are fetched once
+sequentially (one worker, the old loop) and once with --workers threads on the shared keep-alive session, and
+the wall time, throughput and speed-up are printed. The token bucket is set to --requests-per-second (Deribit's
+public limit is 20/s sustained with bursts of 100), so at the default the numbers show the fan-out alone.
+
+    python benchmarks/bench_order_book_fanout.py --instruments 50 200 800 --latency-ms 20 --workers 16
+"""
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "1. Data Processing and Visualization.py")
+
+_spec = importlib.util.spec_from_file_location("data_processing", SCRIPT)
+data_processing = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = data_processing
+_spec.loader.exec_module(data_processing)
+
+@contextlib.contextmanager
+def order_book_server(latency):
+    """
+    Local JSON-RPC stand-in for Deribit's get_order_book, answering after `latency` seconds.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+            time.sleep(latency)
+            payload = json.dumps({"jsonrpc": "2.0", "result": {
+                "instrument_name": params["instrument_name"], "mark_iv": 50.0, "underlying_price": 75000.0,
+            }}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/api/v2/public"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def run_benchmark(instrument_counts, latency=0.02, workers=16, requests_per_second=1e6):
+    """
+    Time get_order_books sequentially and with `workers` threads for every instrument count.
+    """
+    results = []
+    with order_book_server(latency) as base_url:
+        for count in instrument_counts:
+            names = [f"BTC-27DEC24-{50000 + 1000 * i}-C" for i in range(count)]
+            result = {"instruments": count}
+            for label, max_workers in (("sequential", 1), ("concurrent", workers)):
+                api = data_processing.DeribitAPI(base_url=base_url, max_workers=max_workers,
+                                                 requests_per_second=requests_per_second, burst=max(100, max_workers))
+                start = time.perf_counter()
+                order_books = api.get_order_books(names)
+                result[f"{label}_seconds"] = time.perf_counter() - start
+                result[f"{label}_failed"] = sum(book is None for book in order_books.values())
+            result["speedup"] = result["sequential_seconds"] / result["concurrent_seconds"]
+            results.append(result)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark order book fan-out against the number of instruments.")
+    parser.add_argument("--instruments", type=int, nargs="+", default=[50, 200, 800], help="instrument counts to benchmark")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="simulated round trip per request")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--requests-per-second", type=float, default=1e6, help="token bucket rate (Deribit allows 20)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.instruments, args.latency_ms / 1000, args.workers, args.requests_per_second)
+    for result in results:
+        print(f"{result['instruments']:>6} instruments: sequential {result['sequential_seconds']:.2f}s "
+              f"({result['instruments'] / result['sequential_seconds']:.0f} req/s), "
+              f"{args.workers} workers {result['concurrent_seconds']:.2f}s "
+              f"({result['instruments'] / result['concurrent_seconds']:.0f} req/s), speed-up {result['speedup']:.1f}x")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
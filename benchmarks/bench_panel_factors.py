@@ -0,0 +1,150 @@
+"""
+Benchmark of the panel-wide preprocessing, liquidity and correlation steps against the original per-asset loops.
+
+A one-factor universe of --assets assets with daily prices and volumes over --days days and a forward-filled
+S&P 500 series is generated. preprocess_data, compute_liquidity and compute_correlations are then run on it, next
+to the original per-asset loops, reimplemented below (pct_change, rolling std and dropna per asset frame, then a
+concat of every return series for the correlation matrix). Rolling correlations are compared too: the --window
+day correlation matrices of the last --rolling-days days, from iter_rolling_correlations (started --window days
+earlier to fill the window) and from recomputing DataFrame.corr on every window, both pairwise-complete. The time
+and peak traced memory of each are printed, and the outputs are checked to agree. The synthetic data has no
+missing days, on which both versions are defined to agree.
+
+    python benchmarks/bench_panel_factors.py --assets 500 --days 365 --window 30 --rolling-days 300
+"""
+import argparse
+import copy
+import importlib.util
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "3. Risk Factor Analysis for Crypto Assets.py")
+
+_spec = importlib.util.spec_from_file_location("risk_factor_analysis", SCRIPT)
+risk = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = risk
+_spec.loader.exec_module(risk)
+
+def synthetic_data(n_assets, days, seed=0):
+    """
+    Per-asset price and volume frames and a daily S&P 500 frame, as read_panel_data leaves them.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2024-01-01", periods=days, freq="D", name="date")
+    market = rng.normal(0, 0.01, days)
+    data = {f"asset_{i}": pd.DataFrame({
+        'price': 100 * np.exp(np.cumsum(2 * market + rng.normal(0, 0.03, days))),
+        'volume': rng.lognormal(15, 0.5, days),
+    }, index=dates) for i in range(n_assets)}
+    data['sp500'] = pd.DataFrame({'S&P 500': 4000 * np.exp(np.cumsum(market))}, index=dates)
+    return data
+
+def legacy_factors(data):
+    """
+    The original preprocess_data, compute_liquidity and compute_correlations: one pass per asset frame.
+    """
+    data = {asset: df.copy() for asset, df in data.items()}
+    for asset, df in data.items():
+        if asset != 'sp500' and df is not None:
+            df['return'] = df['price'].pct_change()
+            df['volatility'] = df['return'].rolling(window=30).std()
+            df['macro'] = data['sp500'].iloc[:, 0].pct_change()
+            df.dropna(inplace=True)
+    for asset, df in data.items():
+        if asset != 'sp500' and df is not None:
+            df['liquidity'] = df['volume'] / df['price']
+    returns = [df['return'] for asset, df in data.items() if asset != 'sp500' and df is not None and not df['return'].empty]
+    combined = pd.concat(returns, axis=1)
+    combined.columns = [asset for asset in data if asset != 'sp500']
+    return data, combined.corr()
+
+def panel_factors(data):
+    analysis = risk.CryptoRiskAnalysis([asset for asset in data if asset != 'sp500'], pd.Timestamp.now(), pd.Timestamp.now())
+    analysis.data = {asset: df.copy() for asset, df in data.items()}
+    analysis.preprocess_data()
+    analysis.compute_liquidity()
+    return analysis, analysis.compute_correlations()
+
+def legacy_rolling(returns, window, days):
+    """
+    Recompute the correlation matrix of every window from scratch. Like incremental_rolling, only the sum of the
+    matrices and the last one are kept, so memory is not dominated by storing them.
+    """
+    total, matrix = 0.0, None
+    for t in range(len(returns) - days, len(returns)):
+        matrix = returns.iloc[max(0, t - window + 1):t + 1].corr(min_periods=2).to_numpy()
+        total = total + np.nan_to_num(matrix)
+    return total, matrix
+
+def incremental_rolling(analysis, window, days):
+    scratch = copy.copy(analysis)
+    scratch.returns = analysis.returns.iloc[-(days + window - 1):]
+    total, matrix = 0.0, None
+    for i, (_, matrix) in enumerate(scratch.iter_rolling_correlations(window=window)):
+        if i >= window - 1:
+            total = total + np.nan_to_num(matrix)
+    return total, matrix
+
+def measure(function, *args):
+    """
+    Return (result, seconds, peak traced memory in MB); the peak comes from a second, traced call since tracing
+    slows Python code down several-fold.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return result, seconds, peak
+
+def run_benchmark(n_assets=500, days=365, window=30, rolling_days=300, seed=0):
+    data = synthetic_data(n_assets, days, seed)
+    (legacy_data, legacy_corr), legacy_seconds, legacy_mb = measure(legacy_factors, data)
+    (analysis, corr), panel_seconds, panel_mb = measure(panel_factors, data)
+    for asset in legacy_corr.columns:
+        for column in ['return', 'volatility', 'macro', 'liquidity']:
+            if not np.allclose(legacy_data[asset][column], analysis.data[asset][column], rtol=1e-12, equal_nan=True):
+                raise AssertionError(f"Panel and per-asset {column} disagree on {asset}")
+    if not np.allclose(legacy_corr.to_numpy(), corr.to_numpy(), atol=1e-12):
+        raise AssertionError("Panel and per-asset correlation matrices disagree")
+
+    legacy_rolled, legacy_rolling_seconds, legacy_rolling_mb = measure(legacy_rolling, analysis.returns, window, rolling_days)
+    rolled, rolling_seconds, rolling_mb = measure(incremental_rolling, analysis, window, rolling_days)
+    if not all(np.allclose(a, b, atol=1e-6, equal_nan=True) for a, b in zip(legacy_rolled, rolled)):
+        raise AssertionError("Incremental and recomputed rolling correlations disagree")
+    return {"assets": n_assets, "days": days, "window": window, "rolling_days": rolling_days,
+            "legacy_seconds": legacy_seconds, "legacy_peak_mb": legacy_mb, "panel_seconds": panel_seconds, "panel_peak_mb": panel_mb,
+            "legacy_rolling_seconds": legacy_rolling_seconds, "legacy_rolling_peak_mb": legacy_rolling_mb,
+            "rolling_seconds": rolling_seconds, "rolling_peak_mb": rolling_mb}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the panel-wide factor steps against the original per-asset loops.")
+    parser.add_argument("--assets", type=int, default=500)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--window", type=int, default=30, help="rolling correlation window in days")
+    parser.add_argument("--rolling-days", type=int, default=300, help="last days whose rolling correlation is computed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.assets, args.days, args.window, args.rolling_days, args.seed)
+    print(f"{result['assets']} assets x {result['days']} days: returns, volatility, liquidity and correlations "
+          f"{result['panel_seconds']:.2f}s ({result['panel_peak_mb']:.0f} MB peak) on the panel, "
+          f"{result['legacy_seconds']:.2f}s ({result['legacy_peak_mb']:.0f} MB peak) per asset")
+    print(f"{result['window']}-day rolling correlations over the last {result['rolling_days']} days: incremental "
+          f"{result['rolling_seconds']:.2f}s ({result['rolling_peak_mb']:.0f} MB peak), recomputed per window "
+          f"{result['legacy_rolling_seconds']:.2f}s ({result['legacy_rolling_peak_mb']:.0f} MB peak)")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Benchmark of CryptoRiskAnalysis.pca_analysis's saved state against a full PCA refit and the previous per-day JSON
+state, at 10x the script's universe and beyond.
+
+A one-factor universe of --assets assets is generated (the script analyses four, so the default of 40 is 10x its
+data size) and --runs daily runs are replayed on a --window day window moving forward one day per run, in a
+temporary directory. Every run computes the PCA three ways: through pca_analysis (JSON moments plus a .npy of
+the rows still needed to expire days, reconciling only new and expired days), through the original refit of
+sklearn's PCA on the stacked factor frames, and through the previous reconcile, reimplemented below (every row
+kept as a dated JSON list and compared per asset and day). The GARCH report is in filter mode throughout, as on
+a normal daily run. Mean time per run, peak traced memory of a run and state size on disk are printed for each,
+and the explained variance ratios are checked to agree.
+
+    python benchmarks/bench_pca_state.py --assets 40 400 --window 365 --runs 5
+"""
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from sklearn.decomposition import PCA
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "3. Risk Factor Analysis for Crypto Assets.py")
+
+_spec = importlib.util.spec_from_file_location("risk_factor_analysis", SCRIPT)
+risk = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = risk
+_spec.loader.exec_module(risk)
+
+def synthetic_factors(n_assets, n_days, seed=0):
+    """
+    Factor frames of `n_assets` assets over `n_days` days sharing one market factor.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2024-01-01", periods=n_days, freq="D")
+    market = rng.normal(size=(n_days, 1))
+    return {f"asset_{i}": pd.DataFrame(market + rng.normal(size=(n_days, len(risk.FACTORS))), index=dates, columns=risk.FACTORS)
+            for i in range(n_assets)}
+
+def full_refit(data):
+    """
+    The original pca_analysis: stack every asset's factor rows and fit sklearn's PCA from scratch.
+    """
+    pca = PCA(n_components=3)
+    pca.fit(pd.concat([df[risk.FACTORS].dropna() for df in data.values()], axis=0))
+    return pca.explained_variance_ratio_
+
+def legacy_pca_state(data, state_path, chunk_size=10000):
+    """
+    The previous pca_analysis reconcile: the state keeps every row in a {asset: {date: row}} JSON dict, and every
+    run compares all of them with the current rows to add, remove and replace days.
+    """
+    pca = None
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+        pca = risk.StreamingPCA.from_dict(dict(state, assets=[]))
+        days = state['days']
+    if pca is None:
+        pca, days = risk.StreamingPCA(len(risk.FACTORS), n_components=3), {}
+    current = {asset: df[risk.FACTORS].dropna() for asset, df in data.items()}
+    added, removed = [], []
+    for asset in set(days) - set(current):
+        removed.extend(days.pop(asset).values())
+    for asset, rows in current.items():
+        saved = days.setdefault(asset, {})
+        rows = dict(zip(rows.index.astype(str), rows.to_numpy(dtype=float).tolist()))
+        for date in set(saved) - set(rows):
+            removed.append(saved.pop(date))
+        for date, row in rows.items():
+            if saved.get(date) != row:
+                if date in saved:
+                    removed.append(saved[date])
+                added.append(row)
+                saved[date] = row
+    for start in range(0, len(removed), chunk_size):
+        pca.remove(removed[start:start + chunk_size])
+    for start in range(0, len(added), chunk_size):
+        pca.partial_fit(added[start:start + chunk_size])
+    state = pca.to_dict()
+    del state['assets']
+    with open(state_path + ".tmp", 'w') as f:
+        json.dump(dict(state, days=days), f)
+    os.replace(state_path + ".tmp", state_path)
+    return pca
+
+def measure(function, *args, state=()):
+    """
+    Return (result, seconds, peak traced memory in MB). The peak comes from a second, traced call since tracing
+    slows Python code down several-fold; the `state` files the first call rewrites are restored before it.
+    """
+    saved = {path: open(path, 'rb').read() for path in state if os.path.exists(path)}
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+    for path, content in saved.items():
+        with open(path, 'wb') as f:
+            f.write(content)
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return result, seconds, peak
+
+def run_benchmark(n_assets=40, window=365, runs=5, seed=0):
+    factors = synthetic_factors(n_assets, window + runs, seed)
+    analysis = risk.CryptoRiskAnalysis(list(factors), pd.Timestamp.now(), pd.Timestamp.now())
+    analysis.garch_report = pd.DataFrame({'mode': 'filter'}, index=list(factors))
+    timings = {"state": [], "refit": [], "legacy": []}
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        state_path, legacy_path = os.path.join(directory, "pca_state.json"), os.path.join(directory, "pca_legacy.json")
+        # The first run builds both states from scratch; the daily runs after it are the ones timed
+        for run in range(runs + 1):
+            analysis.data = {asset: df.iloc[run:run + window] for asset, df in factors.items()}
+            _, seconds, peak = measure(analysis.pca_analysis, state_path, state=(state_path, risk.StreamingPCA.rows_path(state_path)))
+            refit, refit_seconds, refit_peak = measure(full_refit, analysis.data)
+            legacy, legacy_seconds, legacy_peak = measure(legacy_pca_state, analysis.data, legacy_path, state=(legacy_path,))
+            if run:
+                timings["state"].append((seconds, peak))
+                timings["refit"].append((refit_seconds, refit_peak))
+                timings["legacy"].append((legacy_seconds, legacy_peak))
+            for ratio in (refit, legacy.explained_variance_ratio()):
+                if not np.allclose(analysis.pca.explained_variance_ratio(), ratio, atol=1e-9):
+                    raise AssertionError(f"pca_analysis disagrees with a baseline on run {run}")
+        state_mb = (os.path.getsize(state_path) + os.path.getsize(risk.StreamingPCA.rows_path(state_path))) / 2 ** 20
+        legacy_mb = os.path.getsize(legacy_path) / 2 ** 20
+
+    result = {"assets": n_assets, "window": window, "runs": runs, "state_disk_mb": state_mb, "legacy_disk_mb": legacy_mb}
+    for label, values in timings.items():
+        result[f"{label}_seconds"] = float(np.mean([seconds for seconds, _ in values]))
+        result[f"{label}_peak_mb"] = max(peak for _, peak in values)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the saved PCA state against the previous per-day JSON state.")
+    parser.add_argument("--assets", type=int, nargs="+", default=[40], help="universe sizes (the script analyses 4)")
+    parser.add_argument("--window", type=int, default=365, help="days of factor rows in every run")
+    parser.add_argument("--runs", type=int, default=5, help="daily runs timed after the first one")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = [run_benchmark(n_assets, args.window, args.runs, args.seed) for n_assets in args.assets]
+    for result in results:
+        print(f"{result['assets']} assets x {result['window']} days, {result['runs']} daily runs: "
+              f"moments + rows {result['state_seconds']:.3f}s/run ({result['state_peak_mb']:.1f} MB peak, "
+              f"{result['state_disk_mb']:.1f} MB on disk), full refit {result['refit_seconds']:.3f}s/run "
+              f"({result['refit_peak_mb']:.1f} MB peak), per-day JSON {result['legacy_seconds']:.3f}s/run "
+              f"({result['legacy_peak_mb']:.1f} MB peak, {result['legacy_disk_mb']:.1f} MB on disk)")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
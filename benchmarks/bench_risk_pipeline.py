@@ -0,0 +1,97 @@
+"""
+Synthetic-data benchmark of the whole CryptoRiskAnalysis.run_analysis stage pipeline.
+
+Prices, volumes and S&P 500 closes are generated (no network access) for every universe size in --assets, and
+the pipeline is run --runs times in a fresh working directory: the first run is cold and every later run should
+hit every cached stage, including the GARCH and PCA stages that rewrite their state files. Per run, the total time, cache hit rate and per-stage wall time and peak memory are printed, and with
+--output all run reports are written there as JSON.
+
+    python benchmarks/bench_risk_pipeline.py --assets 4 16 64 --days 365 --workers 4 --output bench_report.json
+"""
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "3. Risk Factor Analysis for Crypto Assets.py")
+
+# The script is loaded at import time so that pool workers (fork server or spawn), which re-import this file,
+# can unpickle its functions too
+_spec = importlib.util.spec_from_file_location("risk_factor_analysis", SCRIPT)
+risk = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = risk
+_spec.loader.exec_module(risk)
+
+class SyntheticRiskAnalysis(risk.CryptoRiskAnalysis):
+    """
+    CryptoRiskAnalysis whose fetch step generates one-factor correlated random-walk prices, lognormal volumes
+    and an S&P 500 series instead of calling CoinGecko and Yahoo Finance.
+    """
+    def __init__(self, n_assets, days=365, seed=0, **kwargs):
+        end_date = pd.Timestamp.now()
+        super().__init__([f"asset_{i}" for i in range(n_assets)], end_date - pd.Timedelta(days=days), end_date, **kwargs)
+        self.days = days
+        self.seed = seed
+
+    def fetch_data(self):
+        rng = np.random.default_rng(self.seed)
+        dates = pd.date_range(end=pd.Timestamp.now().normalize(), periods=self.days, freq='D', name='date')
+        market = rng.normal(0, 0.01, self.days)
+        for asset in self.assets:
+            returns = 2 * market + rng.normal(0, 0.03, self.days)
+            self.data[asset] = pd.DataFrame({
+                'price': 100 * np.exp(np.cumsum(returns)),
+                'volume': rng.lognormal(15, 0.5, self.days),
+            }, index=dates)
+        self.data['sp500'] = pd.DataFrame({'S&P 500': 4000 * np.exp(np.cumsum(market))}, index=dates)
+
+def run_benchmark(n_assets, days=365, workers=4, runs=3, seed=0):
+    """
+    Run the pipeline `runs` times on one synthetic universe in a temporary directory and return the run reports.
+    """
+    reports = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            for run in range(runs):
+                analysis = SyntheticRiskAnalysis(n_assets, days, seed)
+                start = time.perf_counter()
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    report = analysis.run_analysis(workers=workers)
+                report.update({'assets': n_assets, 'days': days, 'run': run, 'wall_seconds': time.perf_counter() - start})
+                reports.append(report)
+        finally:
+            os.chdir(cwd)
+    return reports
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the risk analysis stage pipeline on synthetic data.")
+    parser.add_argument("--assets", type=int, nargs="+", default=[4, 16, 64], help="universe sizes to benchmark")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=3, help="runs per universe; the first one is cold")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write every run report to this JSON file")
+    args = parser.parse_args()
+
+    reports = []
+    for n_assets in args.assets:
+        for report in run_benchmark(n_assets, args.days, args.workers, args.runs, args.seed):
+            reports.append(report)
+            stages = pd.DataFrame(report['stages']).T.reindex(columns=['wall_seconds', 'peak_memory_mb', 'cache'])
+            print(f"{n_assets} assets x {args.days} days, run {report['run']}: {report['wall_seconds']:.2f}s, "
+                  f"cache hit rate {report['cache_hit_rate']}\n{stages}\n")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=2, default=str)
+
+if __name__ == "__main__":
+    main()
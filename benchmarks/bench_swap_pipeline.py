@@ -0,0 +1,97 @@
+"""
+Throughput benchmark of SwapDecodePipeline replaying recorded transactions at 1..N decode workers.
+
+The recorded Uniswap V3 router transactions (plus the unrelated transfers around them) in tests/fixtures are
+cycled up to --transactions with fresh hashes and pushed through SwapDecodePipeline.run for every worker count in
+--workers, writing to an NDJSON sink in a temporary directory. An in-process baseline decodes the same stream
+with the same decode stage and no pool. Transactions per second, swap records and decode errors are printed;
+the record counts must agree across all runs. Pool start-up (each worker imports the script and compiles its
+decoder) is timed separately from the replay.
+
+    python benchmarks/bench_swap_pipeline.py --transactions 50000 --workers 1 2 4 8 --batch-size 256
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "2. Onchain Analytics.py")
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+
+# The script is loaded at import time so that pool workers (fork server or spawn), which re-import this file,
+# can unpickle its functions too
+_spec = importlib.util.spec_from_file_location("onchain_analytics", SCRIPT)
+onchain = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = onchain
+_spec.loader.exec_module(onchain)
+
+def load_replay(n_transactions):
+    """
+    Router ABI, router address and `n_transactions` transactions cycling through the recording with fresh hashes.
+    """
+    with open(os.path.join(FIXTURES, "uniswap_v3_router_abi.json")) as f:
+        router_abi = json.load(f)
+    with open(os.path.join(FIXTURES, "uniswap_v3_transactions.json")) as f:
+        recorded = json.load(f)
+    transactions = recorded["transactions"]
+    replay = [dict(transactions[i % len(transactions)], hash="0x%064x" % i) for i in range(n_transactions)]
+    return router_abi, recorded["router"], replay
+
+def run_inline(router_abi, router, replay, batch_size):
+    """
+    Decode the replay in this process with the pipeline's decode stage, as the single-process baseline.
+    """
+    start = time.perf_counter()
+    onchain._init_decode_worker(router_abi, router)
+    records, errors = 0, 0
+    for i in range(0, len(replay), batch_size):
+        batch_records, batch_errors = onchain._decode_swap_batch(
+            [(onchain._hex(tx["hash"]), tx.get("to"), onchain._hex(tx["input"])) for tx in replay[i:i + batch_size]])
+        records += len(batch_records)
+        errors += batch_errors
+    seconds = time.perf_counter() - start
+    return {"transactions": len(replay), "records": records, "decode_errors": errors, "seconds": seconds,
+            "transactions_per_second": len(replay) / seconds, "startup_seconds": 0.0}
+
+def run_benchmark(n_transactions=50000, worker_counts=(1, 2, 4), batch_size=256):
+    router_abi, router, replay = load_replay(n_transactions)
+    results = [dict(run_inline(router_abi, router, replay, batch_size), workers=0)]
+    with tempfile.TemporaryDirectory() as directory:
+        for workers in worker_counts:
+            sink = onchain.NDJSONSwapSink(os.path.join(directory, f"swaps_{workers}.ndjson"))
+            start = time.perf_counter()
+            pipeline = onchain.SwapDecodePipeline(router_abi, router, sink, workers=workers, batch_size=batch_size)
+            # Start every worker (each imports the script and compiles its decoder) before timing the replay
+            list(pipeline.executor.map(time.sleep, [0.1] * workers))
+            startup = time.perf_counter() - start
+            report = pipeline.run(replay)
+            pipeline.close()
+            results.append(dict(report, workers=workers, startup_seconds=startup))
+    if len({result["records"] for result in results}) != 1:
+        raise AssertionError(f"Runs disagree on the number of swap records: {[result['records'] for result in results]}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SwapDecodePipeline throughput against the number of workers.")
+    parser.add_argument("--transactions", type=int, default=50000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="decode worker counts to benchmark")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.transactions, args.workers, args.batch_size)
+    for result in results:
+        label = f"{result['workers']} workers" if result["workers"] else "in-process"
+        print(f"{label:>11}: {result['transactions']} transactions in {result['seconds']:.2f}s, "
+              f"{result['transactions_per_second']:.0f} tx/s, {result['records']} swap records, "
+              f"{result['decode_errors']} decode errors, {result['startup_seconds']:.2f}s pool start-up")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
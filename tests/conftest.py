@@ -0,0 +1,132 @@
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import websockets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def load_script(filename, name):
+    # The scripts have spaces in their names, so they are loaded from their paths under an importable module name
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, filename))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[name]
+
+def load_fixture(filename):
+    with open(os.path.join(FIXTURES, filename)) as f:
+        return json.load(f)
+
+@pytest.fixture(scope="session")
+def data_processing():
+    return load_script("1. Data Processing and Visualization.py", "data_processing")
+
+@pytest.fixture(scope="session")
+def onchain_analytics():
+    return load_script("2. Onchain Analytics.py", "onchain_analytics")
+
+@pytest.fixture(scope="session")
+def risk_analysis():
+    return load_script("3. Risk Factor Analysis for Crypto Assets.py", "risk_factor_analysis")
+
+class StubServer:
+    # Local HTTP server answering GET requests with handler(path, params) -> (status, JSON body), and POST requests
+    # with handler(path, JSON request body), recording every request
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                stub.requests.append((url.path, params))
+                self.reply(*stub.handler(url.path, params))
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.requests.append((url.path, body))
+                self.reply(*stub.handler(url.path, body))
+
+            def reply(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def stub_server():
+    servers = []
+
+    def start(handler):
+        servers.append(StubServer(handler))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+
+class WebSocketServer:
+    # Local websocket server running the coroutine handler(websocket) for every connection on its own event loop
+    def __init__(self, handler):
+        self.connections = 0
+        started = threading.Event()
+
+        async def count(websocket):
+            self.connections += 1
+            await handler(websocket)
+
+        async def serve():
+            self.loop = asyncio.get_running_loop()
+            self.stopped = self.loop.create_future()
+            async with websockets.serve(count, "127.0.0.1", 0) as server:
+                self.url = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+                started.set()
+                await self.stopped
+
+        self.thread = threading.Thread(target=asyncio.run, args=(serve(),), daemon=True)
+        self.thread.start()
+        started.wait()
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.stopped.set_result, None)
+        self.thread.join()
+
+@pytest.fixture
+def websocket_server():
+    servers = []
+
+    def start(handler):
+        servers.append(WebSocketServer(handler))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
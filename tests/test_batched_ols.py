@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+import statsmodels.api as sm
+
+@pytest.fixture
+def panel():
+    # Three factors on very different scales (like volatility clustering, liquidity and macro) plus a constant,
+    # with a different set of missing days per asset
+    rng = np.random.default_rng(7)
+    n_assets, n_dates = 5, 250
+    factors = rng.normal(size=(n_assets, n_dates, 3)) * [0.02, 1e8, 0.01]
+    X = np.concatenate([np.ones((n_assets, n_dates, 1)), factors], axis=2)
+    y = X @ [0.001, 0.4, 3e-10, 1.5] + rng.normal(0, 0.02, (n_assets, n_dates))
+    mask = rng.random((n_assets, n_dates)) > 0.15
+    return X, y, mask
+
+def statsmodels_fit(X, y):
+    # Reference fit on columns scaled to unit maximum, since a 1e8-scale column alone costs statsmodels ~7 digits
+    scale = np.abs(X).max(axis=0)
+    scale[scale == 0] = 1.0
+    fit = sm.OLS(y, X / scale).fit()
+    return fit.params / scale, fit.bse / scale, fit.rsquared, fit.fittedvalues
+
+def test_batched_ols_matches_statsmodels(risk_analysis, panel):
+    X, y, mask = panel
+    coef, stderr, r_squared, rank = risk_analysis.batched_ols(X, y, mask)
+    assert (rank == X.shape[2]).all()
+    for j in range(len(X)):
+        params, bse, rsquared, _ = statsmodels_fit(X[j][mask[j]], y[j][mask[j]])
+        np.testing.assert_allclose(coef[j], params, rtol=1e-9)
+        np.testing.assert_allclose(stderr[j], bse, rtol=1e-9)
+        assert r_squared[j] == pytest.approx(rsquared, rel=1e-9)
+
+@pytest.mark.filterwarnings("ignore:The design matrix is rank-deficient")
+def test_rank_deficient_assets_fall_back_without_affecting_the_others(risk_analysis, panel):
+    X, y, mask = panel
+    X = X.copy()
+    X[1, :, 2] = 0.0               # a factor that is constant zero for one asset
+    X[2, :, 3] = 2 * X[2, :, 1]    # two collinear factors
+    coef, stderr, r_squared, rank = risk_analysis.batched_ols(X, y, mask)
+    assert rank.tolist() == [4, 3, 3, 4, 4]
+    assert np.isfinite(coef).all() and np.abs(coef[[1, 2]]).max() < 1e3
+
+    for j in range(len(X)):
+        params, _, rsquared, fitted = statsmodels_fit(X[j][mask[j]], y[j][mask[j]])
+        # Without a unique solution the coefficients can differ, but the fit itself must agree with statsmodels
+        np.testing.assert_allclose(X[j][mask[j]] @ coef[j], fitted, rtol=1e-9, atol=1e-15)
+        assert r_squared[j] == pytest.approx(rsquared, rel=1e-9)
+        if rank[j] == X.shape[2]:
+            np.testing.assert_allclose(coef[j], params, rtol=1e-9)
+
+def test_rolling_ols_matches_statsmodels_per_window(risk_analysis, panel):
+    X, y, mask = panel
+    window = 60
+    coef = risk_analysis.rolling_ols(X, y, mask, window=window)
+    for t in (window - 1, 120, X.shape[1] - 1):
+        rows = slice(t - window + 1, t + 1)
+        for j in range(len(X)):
+            used = mask[j, rows]
+            params, _, _, _ = statsmodels_fit(X[j, rows][used], y[j, rows][used])
+            np.testing.assert_allclose(coef[t, j], params, rtol=1e-6)
@@ -0,0 +1,62 @@
+import eth_abi
+import pytest
+from web3 import Web3
+
+from conftest import load_fixture
+
+@pytest.fixture(scope="module")
+def router():
+    recorded = load_fixture("uniswap_v3_transactions.json")
+    router_abi = load_fixture("uniswap_v3_router_abi.json")
+    calldata = [tx["input"] for tx in recorded["transactions"] if tx["to"] == recorded["router"].lower()]
+    return router_abi, Web3().eth.contract(address=recorded["router"], abi=router_abi), calldata
+
+def test_decoder_matches_web3_on_recorded_calldata(onchain_analytics, router):
+    router_abi, contract, calldata = router
+    decoder = onchain_analytics.RouterCalldataDecoder(router_abi)
+    for data in calldata[:-1]:
+        function, params = contract.decode_function_input(data)
+        fn_name, decoded, _ = decoder.decode(data)
+        assert (fn_name, decoded) == (function.fn_name, params)
+    # The recording ends with a truncated transaction, which both reject
+    with pytest.raises(ValueError):
+        decoder.decode(calldata[-1])
+
+def set_word(data, index, value):
+    # Overwrite the index-th 32-byte argument word of hex calldata
+    raw = bytearray.fromhex(data[2:])
+    raw[4 + 32 * index:4 + 32 * (index + 1)] = value.to_bytes(32, "big")
+    return "0x" + raw.hex()
+
+def test_dirty_padding_and_out_of_range_words_are_rejected(onchain_analytics, router):
+    router_abi, contract, _ = router
+    decoder = onchain_analytics.RouterCalldataDecoder(router_abi)
+    weth, usdc = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2", "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
+    data = contract.encode_abi("exactInputSingle", args=[(weth, usdc, 500, weth, 1700000000, 10 ** 18, 1, 0)])
+    assert decoder.decode(data)[1]["params"]["fee"] == 500
+
+    # exactInputSingle's words: tokenIn, tokenOut, fee (uint24), recipient, deadline, amountIn, amountOutMinimum, sqrtPriceLimitX96 (uint160)
+    for index, value in [(2, (1 << 200) | 500), (2, 1 << 24), (0, (1 << 160) | int(weth, 16)), (7, 1 << 160)]:
+        with pytest.raises(ValueError):
+            decoder.decode(set_word(data, index, value))
+
+def test_signed_fixed_bytes_bool_and_dynamic_bytes_are_range_checked(onchain_analytics):
+    abi = [{"type": "function", "name": "probe", "stateMutability": "nonpayable", "outputs": [], "inputs": [
+        {"name": "tick", "type": "int24"}, {"name": "tag", "type": "bytes4"}, {"name": "flag", "type": "bool"}, {"name": "blob", "type": "bytes"},
+    ]}]
+    decoder = onchain_analytics.RouterCalldataDecoder(abi)
+    selector = Web3.keccak(text="probe(int24,bytes4,bool,bytes)")[:4].hex()
+    data = "0x" + selector + eth_abi.encode(["int24", "bytes4", "bool", "bytes"], [-887272, b"\x01\x02\x03\x04", True, b"\xaa\xbb"]).hex()
+    assert decoder.decode(data)[1] == {"tick": -887272, "tag": b"\x01\x02\x03\x04", "flag": True, "blob": b"\xaa\xbb"}
+
+    blob_padding = bytearray.fromhex(data[2:])
+    blob_padding[4 + 32 * 5 + 2] = 0xff
+    for dirty in [
+        set_word(data, 0, 1 << 23),                          # int24 above its maximum
+        set_word(data, 0, (1 << 256) - (1 << 23) - 1),       # int24 below its minimum
+        set_word(data, 1, int.from_bytes(b"\x01\x02\x03\x04\x05", "big") << 216),  # bytes4 with a fifth byte
+        set_word(data, 2, 2),                                # bool that is neither 0 nor 1
+        "0x" + blob_padding.hex(),                           # bytes with non-zero padding after its content
+    ]:
+        with pytest.raises(ValueError):
+            decoder.decode(dirty)
@@ -0,0 +1,60 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytestmark = pytest.mark.filterwarnings("ignore::arch.utility.exceptions.DataScaleWarning")
+
+@pytest.fixture
+def analysis_factory(risk_analysis, tmp_path):
+    # Analyses over the same four assets' GARCH-like returns, ending `days` days into the sample
+    rng = np.random.default_rng(3)
+    dates = pd.date_range("2024-01-01", periods=400, freq="D")
+    returns = {f"asset_{i}": rng.standard_t(5, len(dates)) * 0.02 for i in range(4)}
+
+    def make(days):
+        analysis = risk_analysis.CryptoRiskAnalysis(list(returns), dates[0], dates[-1], cache_dir=str(tmp_path / "market"))
+        analysis.data = {asset: pd.DataFrame({"return": values[:days]}, index=dates[:days]) for asset, values in returns.items()}
+        return analysis
+    return make, str(tmp_path / "garch_cache")
+
+@pytest.fixture
+def pools(risk_analysis, monkeypatch):
+    # Record every process pool requested, running it on threads instead
+    requested = []
+
+    def process_pool(workers, **kwargs):
+        requested.append(workers)
+        return ThreadPoolExecutor(workers, **kwargs)
+    monkeypatch.setattr(risk_analysis, "_process_pool", process_pool)
+    return requested
+
+def test_filter_mode_assets_never_start_a_pool(analysis_factory, pools):
+    make, cache_dir = analysis_factory
+    first = make(300)
+    first.compute_volatility_clustering(workers=4, cache_dir=cache_dir)
+    assert (first.garch_report["mode"] == "cold").all()
+    assert pools == [4]
+
+    # Two new days per asset are within refit_after, so every asset is filtered in this process
+    second = make(302)
+    second.compute_volatility_clustering(workers=4, cache_dir=cache_dir)
+    assert (second.garch_report["mode"] == "filter").all()
+    assert pools == [4]
+    for asset, df in second.data.items():
+        # Same parameters, so the variance path only differs by its backcast start-up over the first days
+        assert df["volatility_clustering"].notna().all()
+        np.testing.assert_allclose(df["volatility_clustering"].iloc[50:300], first.data[asset]["volatility_clustering"].iloc[50:], rtol=1e-4)
+
+def test_only_refits_go_to_the_pool(analysis_factory, pools):
+    make, cache_dir = analysis_factory
+    make(300).compute_volatility_clustering(workers=1, cache_dir=cache_dir)
+    assert pools == []
+
+    # Twenty new days force a warm refit of every asset except the one whose sample stayed short
+    analysis = make(320)
+    analysis.data["asset_3"] = analysis.data["asset_3"].iloc[:301]
+    analysis.compute_volatility_clustering(workers=4, cache_dir=cache_dir)
+    assert analysis.garch_report["mode"].to_dict() == {"asset_0": "warm", "asset_1": "warm", "asset_2": "warm", "asset_3": "filter"}
+    assert pools == [4]
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+@pytest.fixture
+def returns():
+    # Correlated returns of five assets with scattered missing days and one asset listed late
+    rng = np.random.default_rng(5)
+    values = rng.normal(size=(300, 1)) + rng.normal(size=(300, 5)) * [0.5, 1, 2, 1, 0.8]
+    values = values * 0.02
+    values[rng.random(values.shape) < 0.05] = np.nan
+    values[:40, 4] = np.nan
+    return pd.DataFrame(values, index=pd.date_range("2024-01-01", periods=300, freq="D"))
+
+def stream(risk_analysis, returns, **kwargs):
+    tracker = risk_analysis.IncrementalCorrelation(returns.shape[1], **kwargs)
+    matrices = []
+    for row in returns.to_numpy():
+        tracker.update(row)
+        matrices.append(tracker.correlation())
+    return np.array(matrices)
+
+@pytest.mark.parametrize("window", [2, 30, 90])
+def test_rolling_window_matches_pandas_rolling_corr(risk_analysis, returns, window):
+    expected = returns.rolling(window, min_periods=2).corr().to_numpy().reshape(len(returns), 5, 5)
+    np.testing.assert_allclose(stream(risk_analysis, returns, window=window), expected, atol=1e-8)
+
+@pytest.mark.parametrize("halflife", [5, 30])
+def test_halflife_matches_pandas_ewm_corr(risk_analysis, returns, halflife):
+    expected = returns.ewm(halflife=halflife, adjust=False, ignore_na=True).corr().to_numpy().reshape(len(returns), 5, 5)
+    np.testing.assert_allclose(stream(risk_analysis, returns, halflife=halflife), expected, atol=1e-8)
+
+def test_requires_exactly_one_of_window_and_halflife(risk_analysis):
+    with pytest.raises(ValueError):
+        risk_analysis.IncrementalCorrelation(3)
+    with pytest.raises(ValueError):
+        risk_analysis.IncrementalCorrelation(3, window=30, halflife=10)
@@ -0,0 +1,71 @@
+import pytest
+
+from conftest import load_fixture
+
+@pytest.fixture
+def deribit(stub_server, data_processing, monkeypatch):
+    # Deribit stub replaying the recorded responses, with the clock frozen at the capture time
+    fixture = load_fixture("deribit_btc_options.json")
+
+    def handler(path, params):
+        method = path.rsplit("/", 1)[-1]
+        if method == "get_order_book":
+            book = fixture["get_order_book"].get(params["instrument_name"])
+            if book is None:
+                return 400, {"error": {"message": "instrument not found"}}
+            return 200, {"jsonrpc": "2.0", "result": book}
+        return 200, {"jsonrpc": "2.0", "result": fixture[method]}
+
+    server = stub_server(handler)
+    monkeypatch.setattr(data_processing.time, "time", lambda: fixture["capture_time"] / 1000)
+    api = data_processing.DeribitAPI(base_url=f"{server.url}/api/v2/public", retries=1)
+    return fixture, server, api
+
+def methods(server):
+    return [path.rsplit("/", 1)[-1] for path, _ in server.requests]
+
+def test_bulk_and_per_instrument_paths_give_the_same_iv_data(deribit, data_processing):
+    fixture, server, api = deribit
+    instruments = api.get_instruments(fixture["currency"])
+
+    server.requests.clear()
+    per_instrument = data_processing.get_implied_volatilities(instruments, api)
+    assert methods(server).count("get_order_book") == len(instruments)
+
+    server.requests.clear()
+    bulk = data_processing.get_implied_volatilities_bulk(instruments, fixture["currency"], api)
+    assert bulk == per_instrument
+    assert len(bulk) == len(instruments)
+
+    # One summary request, plus an order book only for the instrument missing from the summary
+    summarised = {summary["instrument_name"] for summary in fixture["get_book_summary_by_currency"]}
+    missing = [instrument["instrument_name"] for instrument in instruments if instrument["instrument_name"] not in summarised]
+    assert methods(server) == ["get_book_summary_by_currency"] + ["get_order_book"] * len(missing)
+    assert [params["instrument_name"] for _, params in server.requests[1:]] == missing
+
+def test_bulk_path_leaves_out_instruments_missing_from_both_paths(deribit, data_processing):
+    fixture, server, api = deribit
+    instruments = api.get_instruments(fixture["currency"])
+    unknown = dict(instruments[0], instrument_name="BTC-8NOV24-1000-C", strike=1000.0)
+
+    bulk = data_processing.get_implied_volatilities_bulk(instruments + [unknown], fixture["currency"], api)
+    assert [data["instrument_name"] for data in bulk] == [instrument["instrument_name"] for instrument in instruments]
+
+def test_failing_instrument_is_retried_then_dropped_without_aborting_the_fetch(deribit, data_processing, monkeypatch):
+    fixture, server, _ = deribit
+    names = list(fixture["get_order_book"])
+    failing = names[3]
+    backoffs = []
+    monkeypatch.setattr(data_processing.time, "sleep", backoffs.append)
+
+    # The stub answers 500 for one instrument and the recorded book for every other one
+    handler = server.handler
+    server.handler = lambda path, params: (500, {"error": {"message": "internal error"}}) if params.get("instrument_name") == failing else handler(path, params)
+    api = data_processing.DeribitAPI(base_url=f"{server.url}/api/v2/public", max_workers=4, retries=3)
+    order_books = api.get_order_books(names)
+
+    assert list(order_books) == names
+    assert order_books[failing] is None
+    assert all(order_books[name] == fixture["get_order_book"][name] for name in names if name != failing)
+    assert [params["instrument_name"] for _, params in server.requests].count(failing) == 3
+    assert backoffs == [0.5, 1.0]
@@ -0,0 +1,92 @@
+import json
+import time
+
+import numpy as np
+import pytest
+
+from conftest import load_fixture
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+@pytest.fixture
+def snapshot():
+    # The recorded snapshot, with expiries measured from now so the stream treats them as live
+    fixture = load_fixture("deribit_btc_options.json")
+    books = fixture["get_order_book"]
+    return [{
+        "instrument_name": instrument["instrument_name"],
+        "time_to_expiration": instrument["expiration_timestamp"] - fixture["capture_time"],
+        "strike": instrument["strike"],
+        "implied_volatility": books[instrument["instrument_name"]]["mark_iv"],
+        "underlying_price": books[instrument["instrument_name"]]["underlying_price"],
+    } for instrument in fixture["get_instruments"]]
+
+def markprice_notifications(quotes, batch_size=2):
+    # Deribit markprice.options notifications (iv as a fraction), a few instruments per message
+    for start in range(0, len(quotes), batch_size):
+        yield json.dumps({"jsonrpc": "2.0", "method": "subscription", "params": {
+            "channel": "markprice.options.btc_usd",
+            "data": [{"instrument_name": name, "iv": iv / 100, "mark_price": 0.01, "timestamp": 0} for name, iv in quotes[start:start + batch_size]],
+        }})
+
+def test_stream_applies_replayed_updates_and_reports_metrics(data_processing, snapshot, websocket_server):
+    # Raise the implied volatility of the longest expiry by 10 vol points, replaying the update after a bad frame
+    longest = max(data["time_to_expiration"] for data in snapshot)
+    updated = [(data["instrument_name"], data["implied_volatility"] + 10) for data in snapshot if data["time_to_expiration"] == longest]
+    subscriptions = []
+
+    async def replay(websocket):
+        request = json.loads(await websocket.recv())
+        subscriptions.append(request["params"]["channels"])
+        await websocket.send(json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": request["params"]["channels"]}))
+        await websocket.send("not json")
+        for message in markprice_notifications(updated):
+            await websocket.send(message)
+        await websocket.wait_closed()
+
+    server = websocket_server(replay)
+    stream = data_processing.IVSurfaceStream(snapshot, ws_url=server.url, refit_interval=0.05, capture_time=int(time.time() * 1000))
+    strikes = np.array([data["strike"] for data in snapshot if data["time_to_expiration"] == longest])
+    before = stream.query(strikes, longest)
+    stream.start()
+    try:
+        wait_for(lambda: stream.quotes_updated == len(updated) and not stream.dirty_expiries and stream.publish_latencies)
+        after = stream.query(strikes, longest)
+        metrics = stream.metrics()
+    finally:
+        stream.stop()
+
+    assert subscriptions == [["markprice.options.btc_usd"]]
+    assert np.mean(after - before) == pytest.approx(10, abs=2)
+    assert metrics["messages_received"] == len(list(markprice_notifications(updated)))
+    assert metrics["quotes_updated"] == len(updated)
+    assert metrics["malformed_messages"] == 1
+    assert metrics["refit_errors"] == 0
+    assert set(metrics["update_latency"]) == {"p50", "p90", "p99", "max"}
+    assert 0 < metrics["update_latency"]["p50"] < 0.1
+    assert 0 < metrics["publish_latency"]["max"] < 5
+
+def test_stream_reconnects_and_resubscribes_after_a_disconnect(data_processing, snapshot, websocket_server):
+    first = snapshot[0]
+
+    async def replay(websocket):
+        request = json.loads(await websocket.recv())
+        await websocket.send(json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": request["params"]["channels"]}))
+        await websocket.send(next(markprice_notifications([(first["instrument_name"], 70.0)])))
+        if server.connections == 1:
+            return  # Drop the first connection after one update
+        await websocket.wait_closed()
+
+    server = websocket_server(replay)
+    stream = data_processing.IVSurfaceStream(snapshot, ws_url=server.url, capture_time=int(time.time() * 1000))
+    stream.start()
+    try:
+        wait_for(lambda: stream.messages_received == 2, timeout=15)
+    finally:
+        stream.stop()
+    assert server.connections == 2
+    assert stream.columns["implied_volatility"][0] == 70.0
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from conftest import load_fixture
+
+@pytest.fixture
+def columns(data_processing):
+    # Columnar iv_data of the recorded Deribit snapshot, measured from its capture time
+    fixture = load_fixture("deribit_btc_options.json")
+    books = fixture["get_order_book"]
+    iv_data = [{
+        "instrument_name": instrument["instrument_name"],
+        "time_to_expiration": instrument["expiration_timestamp"] - fixture["capture_time"],
+        "strike": instrument["strike"],
+        "implied_volatility": books[instrument["instrument_name"]]["mark_iv"],
+        "underlying_price": books[instrument["instrument_name"]]["underlying_price"],
+    } for instrument in fixture["get_instruments"]]
+    return data_processing.iv_data_to_columns(iv_data)
+
+def slices(data_processing, columns):
+    # (year fraction, log-moneyness, total variance) of every quoted expiry
+    for expiration in np.unique(columns["time_to_expiration"]):
+        quoted = columns["time_to_expiration"] == expiration
+        t = expiration / data_processing.MILLISECONDS_PER_YEAR
+        k, w, _ = data_processing._svi_slice_inputs(columns["strike"][quoted], columns["implied_volatility"][quoted],
+                                                     columns["underlying_price"][quoted], t)
+        yield quoted, t, k, w
+
+def test_surface_stays_close_to_the_quotes(data_processing, columns):
+    surface = data_processing.fit_iv_surface(columns, use_cache=False)
+    fitted = surface.evaluate(columns["strike"], columns["time_to_expiration"])
+    for quoted, t, k, w in slices(data_processing, columns):
+        error = np.abs(fitted[quoted] - columns["implied_volatility"][quoted])
+        # Each slice fitted alone, for comparison: chaining the calendar check must not cost much accuracy
+        alone = data_processing.fit_svi_slice(k, w)
+        alone_error = np.abs(100 * np.sqrt(data_processing.svi_total_variance(alone, k) / t) - columns["implied_volatility"][quoted])
+        assert error.mean() < 2.0
+        assert error.max() < max(5.0, 2 * alone_error.max())
+
+def test_adjacent_slices_do_not_cross_where_both_are_quoted(data_processing, columns):
+    surface = data_processing.fit_iv_surface(columns, use_cache=False)
+    ranges = [(k.min(), k.max()) for _, _, k, _ in slices(data_processing, columns)]
+    for i in range(1, len(surface.params)):
+        low, high = max(ranges[i][0], ranges[i - 1][0]), min(ranges[i][1], ranges[i - 1][1])
+        k = np.linspace(low, high, 1001)
+        difference = data_processing.svi_total_variance(surface.params[i], k) - data_processing.svi_total_variance(surface.params[i - 1], k)
+        assert difference.min() > -1e-6
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+DAY = 86400
+
+def coingecko(path, params):
+    # CoinGecko market_chart/range stub: daily points for long ranges and hourly ones for short ranges, like the API;
+    # values only depend on the asset and timestamp so overlapping downloads agree
+    asset = path.split("/")[-3]
+    start, end = int(params["from"]), int(params["to"])
+    step = DAY if end - start > 90 * DAY else 3600
+    timestamps = np.arange(-(-start // step) * step, end + 1, step)
+    offset = 100.0 * (len(asset) + 1)
+    return 200, {
+        "prices": [[int(t) * 1000, offset + np.sin(t / DAY / 7)] for t in timestamps],
+        "total_volumes": [[int(t) * 1000, 1e6 + offset * np.cos(t / DAY / 3)] for t in timestamps],
+    }
+
+@pytest.fixture
+def analysis_factory(stub_server, risk_analysis, tmp_path, monkeypatch):
+    server = stub_server(coingecko)
+    downloads = []
+
+    def download(ticker, start, end):
+        downloads.append((ticker, start, end))
+        dates = pd.date_range(start.normalize(), end.normalize(), freq="B")
+        return pd.DataFrame({"Close": np.linspace(4000, 4100, len(dates))}, index=dates)
+
+    monkeypatch.setattr(risk_analysis.yf, "download", download)
+
+    def make(assets, start_date, end_date):
+        return risk_analysis.CryptoRiskAnalysis(assets, start_date, end_date, cache_dir=str(tmp_path / "cache"),
+                                                coingecko_url=f"{server.url}/api/v3/coins/", coingecko_requests_per_second=1000)
+    return make, server, downloads
+
+def test_fetch_downloads_every_asset_once_and_uses_the_instance_end_date(analysis_factory):
+    make, server, downloads = analysis_factory
+    assets = ["bitcoin", "ethereum", "solana", "chainlink"]
+    end = pd.Timestamp.now() - pd.Timedelta(days=20)
+    analysis = make(assets, end - pd.Timedelta(days=200), end)
+    analysis.fetch_data()
+
+    assert sorted(path.split("/")[-3] for path, _ in server.requests) == sorted(assets)
+    for asset in assets:
+        df = analysis.data[asset]
+        assert {"price", "volume"} <= set(df.columns)
+        assert df.index.is_unique and (df.index == df.index.normalize()).all()
+        assert df.index[-1] <= end
+    assert downloads == [("^GSPC", analysis.start_date, analysis.end_date)]
+
+def test_cached_assets_only_download_the_missing_tail(analysis_factory):
+    make, server, _ = analysis_factory
+    now = pd.Timestamp.now()
+    start = now - pd.Timedelta(days=200)
+    make(["bitcoin"], start, now - pd.Timedelta(days=10)).fetch_data()
+    cached_until = pd.Timestamp(now - pd.Timedelta(days=10)).normalize()
+
+    server.requests.clear()
+    refreshed = make(["bitcoin"], start, now)
+    refreshed.fetch_data()
+    assert len(server.requests) == 1
+    assert pd.Timestamp(int(server.requests[0][1]["from"]), unit="s") == cached_until + pd.Timedelta(days=1)
+
+    # The cached history plus the tail matches a full download, and a rerun needs no request at all
+    server.requests.clear()
+    make(["bitcoin"], start, now).fetch_data()
+    assert server.requests == []
+    full = refreshed._fetch_coingecko("bitcoin", refreshed.start_date, refreshed.end_date)
+    full = full[full.index >= refreshed.start_date.normalize()]
+    pd.testing.assert_frame_equal(refreshed.data["bitcoin"][["price", "volume"]], full[["price", "volume"]], check_freq=False)
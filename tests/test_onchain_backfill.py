@@ -0,0 +1,99 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import load_fixture
+
+FIRST_BLOCK = 19_000_000
+TRANSACTIONS_PER_BLOCK = 6
+
+def blocks_of(transactions):
+    # Recorded transactions packed into consecutive full blocks
+    return {FIRST_BLOCK + i // TRANSACTIONS_PER_BLOCK: {
+        "number": hex(FIRST_BLOCK + i // TRANSACTIONS_PER_BLOCK),
+        "transactions": transactions[i:i + TRANSACTIONS_PER_BLOCK],
+    } for i in range(0, len(transactions), TRANSACTIONS_PER_BLOCK)}
+
+@pytest.fixture
+def node(stub_server):
+    # JSON-RPC stand-in for an Ethereum node answering single and batched requests from the recorded blocks
+    recorded = load_fixture("uniswap_v3_transactions.json")
+    blocks = blocks_of(recorded["transactions"])
+
+    def answer(request):
+        if request["method"] == "eth_getBlockByNumber":
+            result = blocks.get(int(request["params"][0], 16))
+        else:
+            result = {"web3_clientVersion": "stub", "eth_chainId": "0x1"}.get(request["method"])
+        return {"jsonrpc": "2.0", "id": request["id"], "result": result}
+
+    def handler(path, body):
+        if server.fail_next:
+            server.fail_next -= 1
+            return 200, {"jsonrpc": "2.0", "id": None, "error": {"code": -32005, "message": "batch rate limited"}}
+        return 200, [answer(request) for request in body] if isinstance(body, list) else answer(body)
+
+    server = stub_server(handler)
+    server.fail_next = 0
+    return recorded, blocks, server
+
+@pytest.fixture
+def monitor(node, onchain_analytics, monkeypatch):
+    recorded, _, server = node
+    monkeypatch.setattr(onchain_analytics.time, "sleep", lambda seconds: None)
+    return onchain_analytics.AlchemyTransactionMonitor(server.url, recorded["router"], load_fixture("uniswap_v3_router_abi.json"))
+
+def batched_blocks(server):
+    return [int(request["params"][0], 16) for _, body in server.requests if isinstance(body, list) for request in body]
+
+def test_backfill_checkpoints_each_range_and_resumes_after_it(node, monitor, tmp_path):
+    _, blocks, server = node
+    checkpoint = str(tmp_path / "checkpoint.json")
+    stats = monitor.backfill(FIRST_BLOCK + 10, FIRST_BLOCK + 39, checkpoint_path=checkpoint, blocks_per_request=4)
+    assert stats["blocks"] == 30
+    assert sorted(batched_blocks(server)) == list(range(FIRST_BLOCK + 10, FIRST_BLOCK + 40))
+    with open(checkpoint) as f:
+        assert json.load(f) == {f"{FIRST_BLOCK + 10}-{FIRST_BLOCK + 39}": FIRST_BLOCK + 40}
+
+    # A finished range fetches nothing again, and an overlapping range keeps its own checkpoint
+    server.requests.clear()
+    assert monitor.backfill(FIRST_BLOCK + 10, FIRST_BLOCK + 39, checkpoint_path=checkpoint)["blocks"] == 0
+    assert monitor.backfill(FIRST_BLOCK, FIRST_BLOCK + 19, checkpoint_path=checkpoint)["blocks"] == 20
+    assert sorted(batched_blocks(server)) == list(range(FIRST_BLOCK, FIRST_BLOCK + 20))
+
+def test_backfill_through_the_pipeline_writes_every_swap(node, monitor, onchain_analytics, tmp_path):
+    recorded, blocks, _ = node
+    router_abi = load_fixture("uniswap_v3_router_abi.json")
+    last_block = max(blocks)
+    output = tmp_path / "swaps.ndjson"
+    pipeline = onchain_analytics.SwapDecodePipeline(router_abi, recorded["router"], onchain_analytics.NDJSONSwapSink(str(output)),
+                                                    workers=2, batch_size=16)
+    # The pool's workers re-import the script from __main__, which under pytest is not the script, so the same
+    # decode stage runs on threads here; benchmarks/bench_backfill.py runs it on the process pool
+    pipeline.executor.shutdown()
+    pipeline.executor = ThreadPoolExecutor(2, initializer=onchain_analytics._init_decode_worker, initargs=(router_abi, recorded["router"]))
+
+    checkpoint = str(tmp_path / "checkpoint.json")
+    stats = monitor.backfill(FIRST_BLOCK, last_block, checkpoint_path=checkpoint, blocks_per_request=5, pipeline=pipeline)
+    pipeline.close()
+
+    # Every router transaction is decoded in block order, except the truncated one
+    onchain_analytics._init_decode_worker(router_abi, recorded["router"])
+    expected, errors = onchain_analytics._decode_swap_batch([(tx["hash"], tx["to"], tx["input"]) for tx in recorded["transactions"]])
+    assert errors == 1
+    assert stats["router_transactions"] == sum(tx["to"] == recorded["router"].lower() for tx in recorded["transactions"])
+    assert [json.loads(line)["tx_hash"] for line in output.read_text().splitlines()] == [record.tx_hash for record in expected]
+    assert pipeline.decode_errors == 1
+    with open(checkpoint) as f:
+        assert json.load(f) == {f"{FIRST_BLOCK}-{last_block}": last_block + 1}
+
+def test_get_blocks_retries_a_rejected_batch(node, monitor):
+    _, blocks, server = node
+    server.fail_next = 2
+    assert monitor.get_blocks([FIRST_BLOCK, FIRST_BLOCK + 1]) == [blocks[FIRST_BLOCK], blocks[FIRST_BLOCK + 1]]
+    assert len(batched_blocks(server)) == 6
+
+    server.fail_next = 5
+    with pytest.raises(ConnectionError):
+        monitor.get_blocks([FIRST_BLOCK], retries=5)
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from conftest import load_fixture
+
+@pytest.fixture
+def recorded():
+    fixture = load_fixture("uniswap_v3_transactions.json")
+    router_transactions = [tx for tx in fixture["transactions"] if tx["to"] == fixture["router"].lower()]
+    return fixture["router"], router_transactions[:40]
+
+@pytest.fixture
+def monitor_factory(stub_server, onchain_analytics, recorded):
+    # HTTP JSON-RPC stand-in serving the pending block the monitor catches up from after a reconnect
+    router, transactions = recorded
+    pending = []
+
+    def answer(request):
+        result = {"number": None, "transactions": list(pending)} if request["method"] == "eth_getBlockByNumber" else "0x1"
+        return {"jsonrpc": "2.0", "id": request["id"], "result": result}
+
+    server = stub_server(lambda path, body: (200, [answer(request) for request in body] if isinstance(body, list) else answer(body)))
+
+    def make():
+        return onchain_analytics.AlchemyTransactionMonitor(server.url, router, load_fixture("uniswap_v3_router_abi.json"))
+    return make, pending
+
+def notification(tx):
+    return json.dumps({"jsonrpc": "2.0", "method": "eth_subscription", "params": {"subscription": "0x9ce5", "result": tx}})
+
+def test_stream_subscribes_reconnects_and_decodes_every_transaction_once(monitor_factory, recorded, websocket_server):
+    router, transactions = recorded
+    make, pending = monitor_factory
+    first, missed, second = transactions[:15], transactions[15:25], transactions[25:]
+    subscriptions = []
+
+    async def node(websocket):
+        request = json.loads(await websocket.recv())
+        subscriptions.append(request["params"])
+        await websocket.send(json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": "0x9ce5"}))
+        if server.connections == 1:
+            # Drop the connection; the transactions sent meanwhile are only in the pending block
+            for tx in first:
+                await websocket.send(notification(tx))
+            await websocket.send("not json")
+            return
+        for tx in first[-5:] + second:
+            await websocket.send(notification(tx))
+        await websocket.wait_closed()
+
+    server = websocket_server(node)
+    pending.extend(first + missed)
+    monitor = make()
+    decoded = []
+    decode_transaction = monitor.decode_transaction
+
+    def record(tx):
+        decoded.append((tx["hash"], threading.get_ident()))
+        decode_transaction(tx)
+    monitor.decode_transaction = record
+
+    asyncio.run(monitor.stream_pending_transactions(server.url, workers=2, reconnect_delay=0.1, duration=2))
+
+    assert server.connections == 2
+    assert subscriptions == [["alchemy_pendingTransactions", {"toAddress": [router], "hashesOnly": False}]] * 2
+    # Resent and caught-up transactions are dropped by the seen-transaction cache, and decoding runs off the event loop
+    assert sorted(tx_hash for tx_hash, _ in decoded) == sorted(tx["hash"] for tx in transactions)
+    assert threading.get_ident() not in {thread for _, thread in decoded}
+
+    latencies = monitor.detection_latency_percentiles()
+    assert len(monitor.detection_latencies) == len(transactions)
+    assert set(latencies) == {"p50", "p90", "p99"}
+    assert 0 < latencies["p50"] <= latencies["p90"] <= latencies["p99"] < 1
+
+def test_stream_fetches_transactions_pushed_as_hashes(monitor_factory, recorded, websocket_server, onchain_analytics):
+    _, transactions = recorded
+    make, _ = monitor_factory
+
+    async def node(websocket):
+        request = json.loads(await websocket.recv())
+        assert request["params"] == ["newPendingTransactions"]
+        await websocket.send(json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": "0x9ce5"}))
+        for tx in transactions[:5]:
+            await websocket.send(notification(tx["hash"]))
+        await websocket.wait_closed()
+
+    server = websocket_server(node)
+    monitor = make()
+    by_hash = {tx["hash"]: tx for tx in transactions}
+    fetched = []
+
+    def get_transaction(tx_hash):
+        fetched.append(tx_hash)
+        tx = by_hash[tx_hash]
+        return dict(tx, to=onchain_analytics.Web3.to_checksum_address(tx["to"]))
+    monitor.w3.eth.get_transaction = get_transaction
+
+    asyncio.run(monitor.stream_pending_transactions(server.url, filter_to_router=False, duration=1))
+    assert sorted(fetched) == sorted(tx["hash"] for tx in transactions[:5])
+    assert len(monitor.detection_latencies) == 5
@@ -0,0 +1,75 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+@pytest.fixture
+def factors(risk_analysis):
+    # Correlated factor rows for four assets over 500 days
+    rng = np.random.default_rng(11)
+    dates = pd.date_range("2024-01-01", periods=500, freq="D")
+    return {asset: pd.DataFrame(rng.normal(size=(500, 3)) * [1, 2, 3] + rng.normal(size=(500, 1)), index=dates, columns=risk_analysis.FACTORS)
+            for asset in ["bitcoin", "ethereum", "solana", "chainlink"]}
+
+@pytest.fixture
+def run_pca(risk_analysis, factors, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    def run(first, last, assets=tuple(factors), mode="filter", revise=None):
+        analysis = risk_analysis.CryptoRiskAnalysis(list(assets), pd.Timestamp.now(), pd.Timestamp.now())
+        analysis.data = {asset: factors[asset].iloc[first:last] for asset in assets}
+        if revise is not None:
+            analysis.data[revise] = analysis.data[revise] * 1.1
+        analysis.garch_report = pd.DataFrame({"mode": mode}, index=list(assets))
+        analysis.pca_analysis()
+        return analysis
+    return run
+
+def batch_ratio(analysis):
+    rows = np.concatenate([df.to_numpy() for df in analysis.data.values()])
+    values = np.linalg.eigvalsh(np.cov(rows.T))[::-1]
+    return values[:3] / values.sum()
+
+def test_daily_runs_only_reconcile_new_and_expired_days(run_pca, capsys):
+    run_pca(0, 365, mode="cold")
+    for day in range(1, 4):
+        analysis = run_pca(day, 365 + day)
+        assert "4 new and 4 expired asset days reconciled" in capsys.readouterr().out
+        np.testing.assert_allclose(analysis.pca.explained_variance_ratio(), batch_ratio(analysis), atol=1e-12)
+
+    # An asset leaving the data takes all its days out with it, and one joining adds all of its days
+    analysis = run_pca(3, 368, assets=("bitcoin", "ethereum", "solana"))
+    assert analysis.pca.count == 3 * 365
+    np.testing.assert_allclose(analysis.pca.explained_variance_ratio(), batch_ratio(analysis), atol=1e-12)
+    analysis = run_pca(4, 369)
+    assert "368 new and 3 expired" in capsys.readouterr().out
+    np.testing.assert_allclose(analysis.pca.explained_variance_ratio(), batch_ratio(analysis), atol=1e-12)
+
+def test_state_keeps_only_moments_in_json_and_rows_in_npy(run_pca, risk_analysis):
+    analysis = run_pca(0, 365)
+    with open("pca_state.json") as f:
+        state = json.load(f)
+    assert set(state) == {"n_components", "count", "mean", "scatter", "assets"}
+    rows = np.load("pca_state_rows.npy")
+    assert rows.shape == (4 * 365, 2 + len(risk_analysis.FACTORS)) and rows.dtype == np.float64
+    loaded = risk_analysis.StreamingPCA.load("pca_state.json")
+    np.testing.assert_array_equal(loaded.scatter, analysis.pca.scatter)
+
+def test_garch_refits_refit_the_pca_and_filter_runs_keep_the_saved_rows(run_pca, capsys):
+    run_pca(0, 365, mode="cold")
+    # Rows revised under filter mode are not compared, so the saved ones stay in the moments
+    filtered = run_pca(0, 365, revise="solana")
+    assert "0 new and 0 expired" in capsys.readouterr().out
+    assert np.abs(filtered.pca.explained_variance_ratio() - batch_ratio(filtered)).max() > 1e-6
+
+    refitted = run_pca(0, 365, mode="warm", revise="solana")
+    assert "refitting the PCA" in capsys.readouterr().out
+    np.testing.assert_allclose(refitted.pca.explained_variance_ratio(), batch_ratio(refitted), atol=1e-12)
+
+def test_a_state_in_the_old_format_starts_afresh(run_pca, capsys):
+    with open("pca_state.json", "w") as f:
+        json.dump({"n_components": 3, "count": 1, "mean": [0, 0, 0], "scatter": [[0] * 3] * 3, "days": {}}, f)
+    analysis = run_pca(0, 365)
+    assert "starting afresh" in capsys.readouterr().out
+    np.testing.assert_allclose(analysis.pca.explained_variance_ratio(), batch_ratio(analysis), atol=1e-12)
@@ -0,0 +1,42 @@
+import json
+import os
+
+import pytest
+
+@pytest.fixture
+def run_stages(risk_analysis, tmp_path, monkeypatch):
+    # A stage that loads and rewrites its own state file, as the GARCH and PCA stages do, and counts its computes
+    monkeypatch.chdir(tmp_path)
+    computed = []
+
+    def compute(inputs):
+        computed.append(inputs)
+        seen = []
+        if os.path.exists("state.json"):
+            with open("state.json") as f:
+                seen = json.load(f)["seen"]
+        with open("state.json", "w") as f:
+            json.dump({"seen": sorted(set(seen) | set(inputs))}, f)
+        return sum(inputs)
+
+    def run(inputs):
+        pipeline = risk_analysis.StagePipeline(workers=2, profile_memory=False)
+        pipeline.add("stateful", compute, prepare=lambda: inputs, cache=True, files=["state.json"])
+        return pipeline.run()["stages"]["stateful"]["cache"]
+    return run, computed
+
+def test_an_unchanged_rerun_hits_although_the_stage_rewrote_its_state(run_stages):
+    run, computed = run_stages
+    assert run([1, 2, 3]) == "miss"
+    assert run([1, 2, 3]) == "hit"
+    assert run([1, 2, 3]) == "hit"
+    assert len(computed) == 1
+
+def test_changed_inputs_or_state_files_miss(run_stages):
+    run, computed = run_stages
+    run([1, 2, 3])
+    assert run([1, 2, 4]) == "miss"
+    with open("state.json", "w") as f:
+        json.dump({"seen": [0]}, f)
+    assert run([1, 2, 4]) == "miss"
+    assert len(computed) == 3